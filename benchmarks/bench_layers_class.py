@@ -0,0 +1,59 @@
+"""
+Loads a thousand copies of the `custom_v4` test project (with a custom layer each), with and without
+reusing the generated ExtendedLayers dataclasses.
+
+Usage:
+
+    PYTHONPATH=src python3 benchmarks/bench_layers_class.py [num_projects]
+
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# measure the class creation, not the snapshot cache
+os.environ["DTPROJECT_DISABLE_CACHE"] = "1"
+
+from dtproject import DTProject
+from dtproject.dtproject import DTProjectV4, LazyLayer
+
+PROJECT_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "dtproject_tests", "assets", "projects",
+                           "custom_v4")
+
+
+def _load_all(pdirs, reuse: bool) -> float:
+    stime: float = time.perf_counter()
+    for pdir in pdirs:
+        if not reuse:
+            DTProjectV4._extended_layers_classes.clear()
+            LazyLayer._classes.clear()
+        p = DTProject(pdir)
+        # touch the custom layer and a known one
+        _ = p.layers.web, p.name
+    return time.perf_counter() - stime
+
+
+def main():
+    num: int = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdirs = []
+        for i in range(num):
+            pdir: str = os.path.join(tmpdir, f"project_{i}")
+            shutil.copytree(PROJECT_DIR, pdir)
+            with open(os.path.join(pdir, "dtproject", "web.yaml"), "wt") as fout:
+                fout.write(f"url: example.com/{i}\n")
+            pdirs.append(pdir)
+        # warm up the OS page cache
+        _load_all(pdirs[:10], reuse=True)
+        before: float = _load_all(pdirs, reuse=False)
+        after: float = _load_all(pdirs, reuse=True)
+    print(f"projects: {num}")
+    print(f"new class per project:   {before:.3f}s ({before / num * 1e3:.3f}ms per project)")
+    print(f"shared class:            {after:.3f}s ({after / num * 1e3:.3f}ms per project)")
+    print(f"speedup:                 {before / after:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Per-layer parse time of the test projects, pure-Python PyYAML loader vs the loader used by dtproject.
+
+Usage:
+
+    PYTHONPATH=src python3 benchmarks/bench_yaml.py [repetitions]
+
+"""
+import glob
+import os
+import sys
+import time
+
+import yaml
+
+from dtproject.utils.yaml_loader import safe_load, SafeLoader, LIBYAML
+
+PROJECTS_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "dtproject_tests", "assets", "projects")
+
+
+def _timeit(fpath: str, loader, repetitions: int) -> float:
+    with open(fpath, "rt") as fin:
+        content: str = fin.read()
+    stime: float = time.perf_counter()
+    for _ in range(repetitions):
+        safe_load(content, loader=loader)
+    return (time.perf_counter() - stime) / repetitions
+
+
+def main():
+    repetitions: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    fpaths = sorted(
+        glob.glob(os.path.join(PROJECTS_DIR, "*", "dtproject", "*.yaml")) +
+        glob.glob(os.path.join(PROJECTS_DIR, "*", "configurations.yaml"))
+    )
+    print(f"libyaml available: {LIBYAML}, repetitions: {repetitions}\n")
+    print(f"{'file':60s} {'before (us)':>12s} {'after (us)':>12s} {'speedup':>8s}")
+    total_before, total_after = 0.0, 0.0
+    for fpath in fpaths:
+        before: float = _timeit(fpath, yaml.SafeLoader, repetitions)
+        after: float = _timeit(fpath, SafeLoader, repetitions)
+        total_before += before
+        total_after += after
+        name: str = os.path.relpath(fpath, PROJECTS_DIR)
+        print(f"{name:60s} {before * 1e6:12.1f} {after * 1e6:12.1f} {before / after:7.1f}x")
+    print(f"\n{'total':60s} {total_before * 1e6:12.1f} {total_after * 1e6:12.1f} "
+          f"{total_before / total_after:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import os
 from typing import Dict, Callable, Tuple
 
 ProjectName = str
@@ -37,6 +38,8 @@ CANONICAL_ARCH = {
     "aarch64": "arm64v8",
 }
 
+DUCKIETOWN_HOME = os.environ.get("DUCKIETOWN_HOME", os.path.expanduser("~/.duckietown"))
+
 DEFAULT_GIT_PROVIDER = "github.com"
 DEFAULT_DOCKER_REGISTRY = "docker.io"
 DEFAULT_PROJECT_ICON = "square"
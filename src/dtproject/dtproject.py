@@ -1,24 +1,28 @@
+import asyncio
 import copy
 import dataclasses
+import functools
 import glob
 import os
 import re
+import threading
 import traceback
 from abc import abstractmethod
+from collections import OrderedDict
 from pathlib import Path
-from subprocess import CalledProcessError
-from types import SimpleNamespace
-from typing import Optional, List, Union, Set, cast, Any, Dict
+from typing import Optional, List, Union, Set, cast, Any, Dict, Iterable, Iterator, Tuple, Type, \
+    FrozenSet
 
 import requests
-import yaml
 from requests import Response
 
 from dockertown import Image
 
 from dockertown.exceptions import NoSuchImage
 
+from . import __version__
 from .configurations import parse_configurations
+from .sources import ProjectSource, FilesystemSource, GitRevisionSource
 from .exceptions import \
     RecipeProjectNotFound, \
     DTProjectNotFound, \
@@ -30,10 +34,89 @@ from .exceptions import \
 from .constants import *
 from .types import ContainerConfiguration, DevContainerConfiguration, LayerSelf, LayerTemplate, LayerDistro, LayerBase, LayerRecipes, LayerOptions, Recipe, \
     Layer, LayerFormat, LayerContainers, LayerDevContainers, LayerHooks
+from .utils.cache import PickleFileCache, cache_enabled, Fingerprint, stat_signature, is_racy
 from .utils.docker import docker_client
-from .utils.misc import run_cmd, git_remote_url_to_https, assert_canonical_arch, DEPRECATED, \
-    load_dependencies_file, safe_name
-from .recipe import get_recipe_project_dir, update_recipe, clone_recipe
+from .utils.git import get_repo_info, RepositoryInfo, RevisionInfo, GitRepository, READER_ERRORS
+from .utils.misc import assert_canonical_arch, DEPRECATED, parse_dependencies, safe_name
+from .utils.yaml_loader import safe_load
+from .recipe import get_recipe_project_dir, update_recipe, clone_recipe, recipe_project_exists
+
+
+class LazyLayer:
+    """
+    Stands in for a field of a Layers dataclass, the layer is parsed the first time it is accessed and
+    then stored on the instance, where it takes precedence over this (non-data) descriptor.
+    """
+
+    # parsed layers, across processes
+    _cache: PickleFileCache = PickleFileCache("layers", max_entries=2048)
+    # lazy version of each Layers dataclass
+    _classes: Dict[type, type] = {}
+    _classes_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, field: dataclasses.Field):
+        self._field: dataclasses.Field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        name: str = self._field.name
+        loader: Optional[Callable[[], Any]] = instance.__dict__["_loaders"].get(name, None)
+        if loader is not None:
+            value = loader()
+        elif self._field.default is not dataclasses.MISSING:
+            value = self._field.default
+        else:
+            value = self._field.default_factory()
+        return instance.__dict__.setdefault(name, value)
+
+    @staticmethod
+    def loader(source: ProjectSource, fpath: str, layer_class: Optional[Type[Layer]]) -> Callable[[], Any]:
+        """
+        Returns:
+            A function parsing the given layer file, custom layers (no layer class) are parsed into dictionaries.
+            Parsed layers are stored in the snapshot cache and reused for as long as the file does not change.
+        """
+        kind: str = layer_class.__qualname__ if layer_class is not None else "dict"
+
+        def _parse() -> Any:
+            content: str = source.read_text(fpath)
+            if layer_class is None:
+                return safe_load(content) or {}
+            return layer_class.from_yaml(content)
+
+        def _load() -> Any:
+            try:
+                cache_key = source.cache_key(fpath) if cache_enabled() else None
+                if cache_key is None:
+                    return _parse()
+                key: str = f"{kind}:{__version__}:{cache_key[0]}"
+                layer = LazyLayer._cache.get(key, cache_key[1])
+                if layer is None:
+                    layer = _parse()
+                    LazyLayer._cache.put(key, cache_key[1], layer)
+                return layer
+            except Exception as e:
+                raise MalformedDTProject(f"The file '{source.join(fpath)}' could not be parsed: {e}") from e
+
+        return _load
+
+    @staticmethod
+    def instantiate(layers_class: type, loaders: Dict[str, Callable[[], Any]]):
+        """
+        Returns:
+            An instance of a subclass of the given Layers dataclass whose fields are loaded on first access.
+        """
+        with LazyLayer._classes_lock:
+            lazy_class: Optional[type] = LazyLayer._classes.get(layers_class, None)
+            if lazy_class is None:
+                lazy_class = type(layers_class.__name__, (layers_class,), {
+                    field.name: LazyLayer(field) for field in dataclasses.fields(layers_class)
+                })
+                LazyLayer._classes[layers_class] = lazy_class
+        layers = lazy_class.__new__(lazy_class)
+        layers._loaders = loaders
+        return layers
 
 
 class DTProject:
@@ -57,6 +140,35 @@ class DTProject:
         def as_dict(self) -> Dict[str, dict]:
             return dataclasses.asdict(self)
 
+        def is_loaded(self, layer: str) -> bool:
+            """
+            Returns:
+                Whether the given layer was already parsed (layers are parsed on first access).
+            """
+            return layer in self.__dict__
+
+    @dataclasses.dataclass
+    class Changes:
+        """
+        What changed in a project, see `DTProject.refresh`.
+
+        Attributes:
+            layers: names of the layers that were added, removed or modified ('.dtproject' for projects v1 to v3)
+            repository: names of the fields of the repository information whose value changed (e.g., 'sha')
+            recipe: whether the recipe project changed, or a different recipe project is selected now
+        """
+        layers: Set[str] = dataclasses.field(default_factory=set)
+        repository: Set[str] = dataclasses.field(default_factory=set)
+        recipe: bool = False
+
+        def __bool__(self) -> bool:
+            return bool(self.layers or self.repository or self.recipe)
+
+    # size of the process-wide registry of projects, see `DTProject.open`
+    REGISTRY_SIZE: int = 128
+    _registry: 'OrderedDict[Tuple[str, Optional[str]], Tuple[Fingerprint, DTProject]]' = OrderedDict()
+    _registry_lock: threading.Lock = threading.Lock()
+
     REQUIRED_LAYERS = {"format": LayerFormat, "self": LayerSelf, "distro": LayerDistro, "base": LayerBase}
     OPTIONAL_LAYERS = {
         "template": LayerTemplate,
@@ -69,44 +181,184 @@ class DTProject:
     KNOWN_LAYERS = {**REQUIRED_LAYERS, **OPTIONAL_LAYERS}
 
     def __init__(self, path: str, recipe: Optional[str] = None):
+        self._setup(FilesystemSource(path), recipe=recipe)
+
+    @classmethod
+    def open(cls, path: str, recipe: Optional[str] = None) -> 'DTProject':
+        """
+        Returns a process-wide shared instance of the project at the given path. The instance is reused for as
+        long as the fingerprint of the project does not change (see `DTProject.fingerprint_of`), the least
+        recently used projects are dropped once there are more than REGISTRY_SIZE of them. Editing a file does
+        not change the fingerprint, the state of the git index of a reused instance is computed again.
+
+        Shared instances should not be modified (e.g., with `set_recipe_dir`), use the constructor to get
+        a private instance instead.
+        """
+        path = os.path.abspath(path)
+        key: Tuple[str, Optional[str]] = (path, recipe)
+        fingerprint: Fingerprint = DTProject.fingerprint_of(path)
+        with DTProject._registry_lock:
+            entry = DTProject._registry.pop(key, None)
+            hit: bool = entry is not None and entry[0] == fingerprint
+            if hit:
+                DTProject._registry[key] = entry
+        if hit:
+            project: DTProject = entry[1]
+            if project._repository is not None:
+                # the state of the index is never cached
+                project._repository.refresh()
+            return project
+        # not there or outdated, we do not hold the lock while building the project
+        project = DTProject(path, recipe=recipe)
+        # files that changed too recently might change again without changing the fingerprint
+        if not is_racy(fingerprint):
+            with DTProject._registry_lock:
+                DTProject._registry.pop(key, None)
+                DTProject._registry[key] = (fingerprint, project)
+                while len(DTProject._registry) > DTProject.REGISTRY_SIZE:
+                    DTProject._registry.popitem(last=False)
+        return project
+
+    @staticmethod
+    def clear_registry():
+        with DTProject._registry_lock:
+            DTProject._registry.clear()
+
+    @staticmethod
+    def fingerprint_of(path: str) -> Fingerprint:
+        """
+        Returns:
+            The stat signature of the files describing the project at the given path, i.e., the layer files,
+            `.dtproject`, and the state of the git repository (see `GitRepository.state_paths`).
+        """
+        fpaths: List[str] = [os.path.join(path, ".dtproject")]
+        layers_dir: str = os.path.join(path, "dtproject")
+        try:
+            with os.scandir(layers_dir) as it:
+                layers: List[str] = sorted(e.path for e in it if e.name.endswith(".yaml"))
+            # adding or removing a layer changes the mtime of the directory
+            fpaths += [layers_dir] + layers
+        except OSError:
+            pass
+        try:
+            # '.git' might also be a file pointing somewhere else (e.g., in linked worktrees)
+            fpaths += GitRepository(path).state_paths()
+        except READER_ERRORS:
+            pass
+        return stat_signature(fpaths, root=path)
+
+    @classmethod
+    def at_revision(cls, path: str, revision: str, recipe: Optional[str] = None) -> 'DTProject':
+        """
+        Loads the project at the given path as it is at the given git revision (e.g., a tag, a branch, a SHA).
+        Files are read directly from the git objects, the worktree is not touched.
+        """
+        project: DTProject = DTProject.__new__(DTProject)
+        project._setup(GitRevisionSource(path, revision), recipe=recipe)
+        return project
+
+    @classmethod
+    def iter_revisions(cls, path: str, revisions: Iterable[str], recipe: Optional[str] = None) \
+            -> Iterator[Tuple[str, 'DTProject']]:
+        """
+        Loads the project at the given path at each of the given revisions, one at a time.
+        All revisions are read through the same `git cat-file` session.
+        """
+        for revision in revisions:
+            yield revision, cls.at_revision(path, revision, recipe=recipe)
+
+    @classmethod
+    async def load_async(cls, path: str, recipe: Optional[str] = None) -> 'DTProject':
+        """
+        Same as `DTProject(path, recipe)` followed by `preload()`, for asyncio.
+
+        File I/O runs in the default executor, git commands run as asyncio subprocesses. The git commands of
+        one project run concurrently, and so do those of many projects loaded with `asyncio.gather`.
+        """
+        loop = asyncio.get_running_loop()
+        project: DTProject = await loop.run_in_executor(None, functools.partial(DTProject, path, recipe=recipe))
+        jobs: list = [loop.run_in_executor(None, project._preload_files)]
+        if project._repository is not None:
+            jobs.append(project._repository.load_async())
+        await asyncio.gather(*jobs)
+        return project
+
+    def _setup(self, source: ProjectSource, recipe: Optional[str] = None):
         self._adapters = []
         self._repository = None
+        self._source: ProjectSource = source
         # use `fs` adapter by default
-        self._path = os.path.abspath(path)
+        self._path = source.path
         self._adapters.append("fs")
         # recipe info
         self._custom_recipe_dir: Optional[str] = None
         self._recipe_version: Optional[str] = None
+        # recipe project, built on first access
+        self._recipe: Optional[DTProject] = None
+        self._recipe_loads: int = 0
         # use `git` adapter if available
-        if os.path.isdir(os.path.join(self._path, ".git")):
-            repo_info = self._get_repo_info(self._path)
-            self._repository = SimpleNamespace(
-                name=repo_info["REPOSITORY"],
-                sha=repo_info["SHA"],
-                detached=repo_info["BRANCH"] == "HEAD",
-                branch=repo_info["BRANCH"],
-                head_version=repo_info["VERSION.HEAD"],
-                closest_version=repo_info["VERSION.CLOSEST"],
-                repository_url=repo_info["ORIGIN.URL"],
-                repository_page=repo_info["ORIGIN.HTTPS.URL"],
-                index_nmodified=repo_info["INDEX_NUM_MODIFIED"],
-                index_nadded=repo_info["INDEX_NUM_ADDED"],
-            )
+        if isinstance(source, GitRevisionSource):
+            self._repository = RevisionInfo(source.toplevel, source.sha, source.branch)
+            self._adapters.append("git")
+        elif os.path.isdir(os.path.join(self._path, ".git")):
+            # repository information is computed lazily, on first access
+            self._repository = RepositoryInfo(self._path)
             self._adapters.append("git")
         # at this point we initialize the proper subclass
-        for DTProjectSubClass in [DTProjectV1, DTProjectV2, DTProjectV3, DTProjectV4]:
-            if DTProjectSubClass.is_instance_of(path):
-                self.__class__ = DTProjectSubClass
-                # noinspection PyTypeChecker
-                DTProjectSubClass.__init__(self, path, recipe=recipe)
-                return
-        # if we are here, it means that this candidate project did not match any project version
-        raise DTProjectNotFound(f"No valid DTProject found at '{path}'")
+        DTProjectSubClass, project_info = self._detect_format(source)
+        if DTProjectSubClass is None:
+            # this candidate project did not match any project version
+            raise DTProjectNotFound(f"No valid DTProject found at '{source.join('')}'")
+        self.__class__ = DTProjectSubClass
+        extra: dict = {"project_info": project_info} if project_info is not None else {}
+        # noinspection PyTypeChecker,PyArgumentList
+        DTProjectSubClass.__init__(self, self._path, recipe=recipe, **extra)
+
+    @staticmethod
+    def _detect_format(source: ProjectSource) -> Tuple[Optional[Type['DTProject']], Optional[dict]]:
+        """
+        Chooses the project version from a single listing of the project root, this is equivalent to trying
+        `is_instance_of` on DTProjectV1, V2, V3 and V4 in this order.
+
+        Returns:
+            The class of the project (None if no version matches) and the parsed content of
+            `.dtproject` (for projects V1 to V3).
+        """
+        try:
+            # entry name -> is directory
+            entries: Dict[str, bool] = source.listdir("")
+        except OSError:
+            return None, None
+        # V1 to V3 are described by a valid '.dtproject' file
+        if entries.get(".dtproject", None) is False:
+            try:
+                project_info: dict = DTProjectV1to3._parse_project_info(
+                    source.read_text(".dtproject"), source.join(".dtproject"), source.path
+                )
+            except Exception:
+                pass
+            else:
+                if entries.get("launch.sh", None) is False and entries.get("code", None) is True:
+                    return DTProjectV1, project_info
+                if entries.get("dependencies-py3.dt.txt", None) is False:
+                    return DTProjectV3, project_info
+                return DTProjectV2, project_info
+        # V4 is described by the directory 'dtproject'
+        if entries.get("dtproject", None) is True:
+            return DTProjectV4, None
+        return None, None
 
     @property
     def path(self) -> str:
         return self._path
 
+    @property
+    def revision(self) -> Optional[str]:
+        """
+        The git revision this project was loaded from, None if it was loaded from the worktree.
+        """
+        return self._source.revision
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -280,8 +532,21 @@ class DTProject:
 
     @property
     def recipe(self) -> Optional["DTProject"]:
-        # load recipe project
-        return DTProject(self.recipe_dir) if self.needs_recipe else None
+        if not self.needs_recipe:
+            return None
+        # load recipe project (only once, until the selection changes)
+        recipe_dir: str = os.path.abspath(self.recipe_dir)
+        if self._recipe is None or self._recipe.path != recipe_dir:
+            self._recipe = DTProject(recipe_dir)
+            self._recipe_loads += 1
+        return self._recipe
+
+    @property
+    def recipe_loads(self) -> int:
+        """
+        Number of times the recipe project was (re)built for this project.
+        """
+        return self._recipe_loads
 
     @property
     def dockerfile(self) -> str:
@@ -355,16 +620,22 @@ class DTProject:
         return launchers
 
     def set_recipe_dir(self, path: str):
+        if path != self._custom_recipe_dir:
+            self._recipe = None
         self._custom_recipe_dir = path
 
     def set_recipe_version(self, branch: str):
+        if branch != self._recipe_version:
+            self._recipe = None
         self._recipe_version = branch
 
     def ensure_recipe_exists(self):
         if not self.needs_recipe:
             return
         # clone the project specified recipe (if necessary)
-        if not os.path.exists(self.recipe_dir):
+        missing: bool = not os.path.exists(self.recipe_dir) if self._custom_recipe_dir \
+            else not recipe_project_exists(self.recipe_info)
+        if missing:
             cloned: bool = clone_recipe(self.recipe_info)
             if not cloned:
                 raise RecipeProjectNotFound(f"Recipe repository could not be downloaded.")
@@ -372,13 +643,18 @@ class DTProject:
         if not os.path.exists(self.recipe_dir):
             raise RecipeProjectNotFound(f"Recipe not found at '{self.recipe_dir}'")
 
-    def ensure_recipe_updated(self) -> bool:
-        return self.update_cached_recipe()
+    def ensure_recipe_updated(self, background: Optional[bool] = None) -> bool:
+        return self.update_cached_recipe(background)
 
-    def update_cached_recipe(self) -> bool:
-        """Update recipe if not using custom given recipe"""
+    def update_cached_recipe(self, background: Optional[bool] = None) -> bool:
+        """Update recipe if not using custom given recipe, see `update_recipe` for the background mode"""
         if self.needs_recipe and not self._custom_recipe_dir:
-            return update_recipe(self.recipe_info)  # raises: UserError if the recipe has not been cloned
+            # raises: UserError if the recipe has not been cloned
+            updated: bool = update_recipe(self.recipe_info, background=background)
+            if updated:
+                # the recipe changed on disk
+                self._recipe = None
+            return updated
         return False
 
     def is_release(self):
@@ -734,16 +1010,13 @@ class DTProject:
             response.raise_for_status()
 
     def apt_dependencies(self, comments: bool = False) -> List[str]:
-        dependencies_fpath: str = os.path.join(self.path, "dependencies-apt.txt")
-        return load_dependencies_file(dependencies_fpath, comments=comments)
+        return self._load_dependencies("dependencies-apt.txt", comments=comments)
 
     def py3_dependencies(self, comments: bool = False, ) -> List[str]:
-        dependencies_fpath: str = os.path.join(self.path, "dependencies-py3.txt")
-        return load_dependencies_file(dependencies_fpath, comments=comments)
+        return self._load_dependencies("dependencies-py3.txt", comments=comments)
 
     def py3_dependencies_dt(self, comments: bool = False, ) -> List[str]:
-        dependencies_fpath: str = os.path.join(self.path, "dependencies-py3.dt.txt")
-        return load_dependencies_file(dependencies_fpath, comments=comments)
+        return self._load_dependencies("dependencies-py3.dt.txt", comments=comments)
     
     @abstractmethod
     def get_devcontainer(self, config_name: str) -> ContainerConfiguration:
@@ -752,102 +1025,83 @@ class DTProject:
         """
         pass
 
+    def _load_dependencies(self, fname: str, comments: bool = False) -> List[str]:
+        # no deps file => no deps
+        if not self._source.isfile(fname):
+            return []
+        return parse_dependencies(self._source.read_text(fname), comments=comments)
+
+    def refresh(self) -> 'DTProject.Changes':
+        """
+        Picks up the changes made to the project since it was loaded (or last refreshed). Only what changed is
+        loaded again: the layers whose files changed, the fields of the repository information that were
+        already computed, and the recipe project (if it was already built).
+
+        Returns:
+            A summary of what changed.
+        """
+        changes: DTProject.Changes = DTProject.Changes(layers=self._refresh_layers())
+        if self._repository is not None:
+            changes.repository = self._repository.refresh()
+        if self._recipe is not None:
+            recipe_dir: Optional[str] = os.path.abspath(self.recipe_dir) if self.needs_recipe else None
+            if self._recipe.path != recipe_dir:
+                # a different recipe is selected now, it is built on next access
+                self._recipe = None
+                changes.recipe = True
+            else:
+                try:
+                    changes.recipe = bool(self._recipe.refresh())
+                except DTProjectNotFound:
+                    # the recipe is gone
+                    self._recipe = None
+                    changes.recipe = True
+        return changes
+
+    @abstractmethod
+    def _refresh_layers(self) -> Set[str]:
+        """
+        Loads again the layers whose files changed.
+
+        Returns:
+            The names of the layers that changed.
+        """
+        pass
+
+    def preload(self):
+        """
+        Computes right away everything that is otherwise computed on first access
+        (e.g., repository information, layers).
+        """
+        if self._repository is not None:
+            self._repository.as_dict()
+        self._preload_files()
+
+    def _preload_files(self):
+        pass
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            What was computed so far about this project that the on-disk caches do not keep (e.g., the state
+            of the git index), as plain values that can travel across processes, see `restore`.
+        """
+        return {"repository": self._repository.snapshot() if self._repository is not None else {}}
+
+    def restore(self, snapshot: dict):
+        """
+        Reuses what was computed by another instance of this project, see `snapshot`.
+        """
+        if self._repository is not None:
+            self._repository.restore(snapshot.get("repository", {}))
+
     @staticmethod
     def _get_repo_info(path):
-        # get current SHA
-        try:
-            # TODO: this command can return the following error (which is for now just printed to screen)
-            #      .
-            #      .
-            #         fatal: ambiguous argument 'HEAD': unknown revision or path not in the working tree.
-            #         Use '--' to separate paths from revisions, like this:
-            #         'git <command> [<revision>...] -- [<file>...]'
-            #      .
-            #      .
-            #   This happens when the repository has no commits yet, so no HEAD.
-            #   We need to catch it and gracefully handle the case, warn the user that there are no commits
-            #   and revert to non-repository behavior.
-            #
-            sha = run_cmd(["git", "-C", f'"{path}"', "rev-parse", "HEAD"])[0]
-        except CalledProcessError as e:
-            if e.returncode == 128:
-                # no commits yet
-                sha = "ND"
-            else:
-                raise e
-        # get branch name
-        try:
-            branch: str = run_cmd(["git", "-C", f'"{path}"', "branch", "--show-current"])[0]
-        except CalledProcessError:
-            # try an older syntax (e.g., Macs are still using an old version of 'git')
-            try:
-                branch: str = run_cmd(["git", "-C", f'"{path}"', "rev-parse", "--abbrev-ref", "HEAD"])[0]
-            except CalledProcessError:
-                raise RuntimeError("We could not retrieve the name of the branch for the repository at "
-                                   f"'{path}'")
-        # head tag
-        try:
-            head_tag = run_cmd(
-                [
-                    "git",
-                    "-C",
-                    f'"{path}"',
-                    "describe",
-                    "--exact-match",
-                    "--tags",
-                    "HEAD",
-                    "2>/dev/null",
-                    "||",
-                    ":",
-                ]
-            )
-        except CalledProcessError as e:
-            if sha == "ND":
-                # there is no HEAD
-                head_tag = None
-            else:
-                raise e
-        head_tag = head_tag[0] if head_tag else "ND"
-        closest_tag = run_cmd(["git", "-C", f'"{path}"', "tag"])
-        closest_tag = closest_tag[-1] if closest_tag else "ND"
-        repo = None
-        # get the origin url
-        try:
-            origin_url = run_cmd(["git", "-C", f'"{path}"', "config", "--get", "remote.origin.url"])[0]
-            if origin_url.endswith(".git"):
-                origin_url = origin_url[:-4]
-            if origin_url.endswith("/"):
-                origin_url = origin_url[:-1]
-            repo = origin_url.split("/")[-1]
-        except CalledProcessError as e:
-            if e.returncode == 1:
-                origin_url = None
-            else:
-                raise e
-        # get info about current git INDEX
-        porcelain = ["git", "-C", f'"{path}"', "status", "--porcelain"]
-        modified = run_cmd(porcelain + ["--untracked-files=no"])
-        nmodified = len(modified)
-        added = run_cmd(porcelain)
-        # we are not counting files with .resolved extension
-        added = list(filter(lambda f: not f.endswith(".resolved"), added))
-        nadded = len(added)
-        # return info
-        return {
-            "REPOSITORY": repo,
-            "SHA": sha,
-            "BRANCH": branch,
-            "VERSION.HEAD": head_tag,
-            "VERSION.CLOSEST": closest_tag,
-            "ORIGIN.URL": origin_url or "ND",
-            "ORIGIN.HTTPS.URL": git_remote_url_to_https(origin_url) if origin_url else None,
-            "INDEX_NUM_MODIFIED": nmodified,
-            "INDEX_NUM_ADDED": nadded,
-        }
+        return get_repo_info(path)
 
     @classmethod
     @abstractmethod
-    def is_instance_of(cls, path: str) -> bool:
+    def is_instance_of(cls, path: Union[str, ProjectSource]) -> bool:
         pass
 
 
@@ -856,30 +1110,19 @@ class DTProjectV4(DTProject):
     Class representing a DTProject on disk.
     """
 
+    # ExtendedLayers dataclasses, by set of custom layers
+    _extended_layers_classes: Dict[FrozenSet[str], Type[DTProject.Layers]] = {}
+    _extended_layers_lock: threading.Lock = threading.Lock()
+
     # noinspection PyMissingConstructor
     def __init__(self, path: str, recipe: Optional[str] = None):
+        # state of the layer files, before we read them (see `refresh`)
+        self._signature: Dict[str, Optional[Tuple[str, Fingerprint]]] = self._layers_signature(self._source)
         # use `dtproject` adapter (required)
-        self._layers: DTProject.Layers = self._load_layers(path)
+        self._layers: DTProject.Layers = self._load_layers(self._source)
         self._adapters.append("dtproject")
         # consistency checks
-        # - we need recipes but none are given
-        if self.needs_recipe and self._layers.recipes.is_empty:
-            raise InconsistentDTProject("The project is set to need a recipe (options.needs_recipe=True) but "
-                                        "no recipes are defined in the recipes layer.")
-        # - we don't need recipes but some are given
-        if not self.needs_recipe and not self._layers.recipes.is_empty:
-            raise InconsistentDTProject("The project is set NOT to need a recipe "
-                                        f"(options.needs_recipe=False) but {len(self._layers.recipes)} "
-                                        f"recipes are defined in the recipes layer.")
-        # - choose a recipe when the project does not need it
-        if not self.needs_recipe and recipe is not None:
-            raise ValueError(f"Cannot select recipe '{recipe}' on a project that is set NOT to need a recipe "
-                             "(options.needs_recipe=False)")
-        # - (named) recipe selector
-        self._selected_recipe: Optional[str] = None if not self.needs_recipe else (recipe or "default")
-        if self._selected_recipe and not self._layers.recipes.has(self._selected_recipe):
-            raise ValueError(f"Recipe '{self._selected_recipe}' not defined in this project. Available "
-                             f"recipes are: {list(self.recipes.keys())}")
+        self._selected_recipe: Optional[str] = self._check_layers(self._layers, recipe)
 
     @property
     def name(self) -> str:
@@ -1004,6 +1247,33 @@ class DTProjectV4(DTProject):
             recipe.branch = self._recipe_version
         return recipe
 
+    def _preload_files(self):
+        self._layers.as_dict()
+
+    def _refresh_layers(self) -> Set[str]:
+        signature: Dict[str, Optional[Tuple[str, Fingerprint]]] = self._layers_signature(self._source)
+        names: Set[str] = set(signature) | set(self._signature)
+        changed: Set[str] = {name for name in names if signature.get(name) != self._signature.get(name)}
+        # files changed too recently might have changed again without changing their signature
+        racy: Set[str] = {
+            name for name in names - changed if signature.get(name) is not None and is_racy(signature[name][1])
+        }
+        if not changed and not racy:
+            return set()
+        layers: DTProject.Layers = self._load_layers(self._source)
+        # parsed layers that did not change are carried over
+        for name in names - changed - racy:
+            if self._layers.is_loaded(name):
+                layers.__dict__[name] = self._layers.__dict__[name]
+        for name in racy:
+            if self._layers.is_loaded(name) and getattr(layers, name) != getattr(self._layers, name):
+                changed.add(name)
+        # the new layers must be consistent before they replace the old ones
+        recipe: Optional[str] = self._selected_recipe if layers.options.needs_recipe else None
+        self._selected_recipe = self._check_layers(layers, recipe)
+        self._layers, self._signature = layers, signature
+        return changed
+
     def get_devcontainer(self, config_name: str) -> ContainerConfiguration:
         container_configuration : ContainerConfiguration = self.containers[config_name]
         # If the '__extend__' key is present, the container configuration is extended from the one specified in the '__extend__' key
@@ -1023,78 +1293,133 @@ class DTProjectV4(DTProject):
         return container_configuration
 
     @staticmethod
-    def _load_layers(path: str) -> 'DTProject.Layers':
-        if not os.path.exists(path):
-            msg = f"The project path {path!r} does not exist."
+    def _load_layers(source: Union[str, ProjectSource]) -> 'DTProject.Layers':
+        if isinstance(source, str):
+            source = FilesystemSource(source)
+        if not source.isdir(""):
+            msg = f"The project path {source.join('')!r} does not exist."
             raise DTProjectNotFound(msg)
-        layers_dir: str = os.path.join(path, "dtproject")
+        layers_dir: str = "dtproject"
         # if the directory 'dtproject' is missing
-        if not os.path.exists(layers_dir):
-            msg = f"The path '{path}' does not appear to be a Duckietown project."
+        if not source.exists(layers_dir):
+            msg = f"The path '{source.join('')}' does not appear to be a Duckietown project."
             raise DTProjectNotFound(msg)
         # if 'dtproject' is not a directory
-        if not os.path.isdir(layers_dir):
-            msg = f"The path '{layers_dir}' must be a directory."
+        if not source.isdir(layers_dir):
+            msg = f"The path '{source.join(layers_dir)}' must be a directory."
             raise MalformedDTProject(msg)
 
-        layers: Dict[str, Union[Layer, dict]] = {}
+        # layers are only parsed when they are first accessed, here we only collect their loaders
+        loaders: Dict[str, Callable[[], Union[Layer, dict]]] = {}
+        layer_files: Dict[str, bool] = source.listdir(layers_dir)
 
-        # load required layers
+        # required layers
         for layer_name, layer_class in DTProject.REQUIRED_LAYERS.items():
             # make sure the <layer>.yaml file is there
             layer_fpath: str = os.path.join(layers_dir, f"{layer_name}.yaml")
-            if not os.path.exists(layer_fpath) or not os.path.isfile(layer_fpath):
-                msg = f"The file '{layer_fpath}' is missing."
+            if layer_files.get(f"{layer_name}.yaml", True) or not source.isfile(layer_fpath):
+                msg = f"The file '{source.join(layer_fpath)}' is missing."
                 raise MalformedDTProject(msg)
-            layers[layer_name] = layer_class.from_yaml_file(layer_fpath)
+            loaders[layer_name] = LazyLayer.loader(source, layer_fpath, layer_class)
 
-        # load optional (but known) layers
+        # optional (but known) layers
         for layer_name, layer_class in DTProject.OPTIONAL_LAYERS.items():
             # load the <layer>.yaml file if it is there
             layer_fpath: str = os.path.join(layers_dir, f"{layer_name}.yaml")
-            if not os.path.exists(layer_fpath):
+            if f"{layer_name}.yaml" not in layer_files:
                 continue
-            if not os.path.isfile(layer_fpath):
-                msg = f"The path '{layer_fpath}' must be a regular file."
+            if layer_files[f"{layer_name}.yaml"] or not source.isfile(layer_fpath):
+                msg = f"The path '{source.join(layer_fpath)}' must be a regular file."
                 raise MalformedDTProject(msg)
-            layers[layer_name] = layer_class.from_yaml_file(layer_fpath)
+            loaders[layer_name] = LazyLayer.loader(source, layer_fpath, layer_class)
 
-        # load custom layers
+        # custom layers
         custom_layers: Set[str] = set()
-        layer_pattern = os.path.join(path, "dtproject", "*.yaml")
-        for layer_fpath in glob.glob(layer_pattern):
-            layer_name: str = Path(layer_fpath).stem
+        for layer_fname, is_dir in sorted(layer_files.items()):
+            if is_dir or layer_fname.startswith(".") or not layer_fname.endswith(".yaml"):
+                continue
+            layer_name: str = Path(layer_fname).stem
             if layer_name not in DTProject.KNOWN_LAYERS:
-                with open(layer_fpath, "rt") as fin:
-                    layer_content: dict = yaml.safe_load(fin) or {}
-                    layers[layer_name] = layer_content
-                    custom_layers.add(layer_name)
+                layer_fpath: str = os.path.join(layers_dir, layer_fname)
+                loaders[layer_name] = LazyLayer.loader(source, layer_fpath, None)
+                custom_layers.add(layer_name)
 
         # extend layers class
-        Layers = dataclasses.make_dataclass(
-            'ExtendedLayers',
-            fields=[
-                (layer, dict, cast(dataclasses.Field, dataclasses.field(default_factory=dict)))
-                for layer in custom_layers
-            ],
-            bases=(DTProject.Layers,)
-        )
+        Layers = DTProjectV4._extended_layers_class(frozenset(custom_layers))
         # ---
-        return Layers(**layers)
+        return LazyLayer.instantiate(Layers, loaders)
+
+    @staticmethod
+    def _layers_signature(source: ProjectSource) -> Dict[str, Optional[Tuple[str, Fingerprint]]]:
+        """
+        Returns:
+            The cache key of each layer file (see `ProjectSource.cache_key`), by layer name.
+        """
+        try:
+            layer_files: Dict[str, bool] = source.listdir("dtproject")
+        except OSError:
+            return {}
+        return {
+            Path(layer_fname).stem: source.cache_key(os.path.join("dtproject", layer_fname))
+            for layer_fname, is_dir in layer_files.items()
+            if not is_dir and not layer_fname.startswith(".") and layer_fname.endswith(".yaml")
+        }
+
+    @staticmethod
+    def _check_layers(layers: 'DTProject.Layers', recipe: Optional[str]) -> Optional[str]:
+        """
+        Checks that the given layers are consistent with each other and with the given recipe.
+
+        Returns:
+            The name of the selected recipe, None if the project does not need a recipe.
+        """
+        needs_recipe: bool = layers.options.needs_recipe
+        # - we need recipes but none are given
+        if needs_recipe and layers.recipes.is_empty:
+            raise InconsistentDTProject("The project is set to need a recipe (options.needs_recipe=True) but "
+                                        "no recipes are defined in the recipes layer.")
+        # - we don't need recipes but some are given
+        if not needs_recipe and not layers.recipes.is_empty:
+            raise InconsistentDTProject("The project is set NOT to need a recipe "
+                                        f"(options.needs_recipe=False) but {len(layers.recipes)} "
+                                        f"recipes are defined in the recipes layer.")
+        # - choose a recipe when the project does not need it
+        if not needs_recipe and recipe is not None:
+            raise ValueError(f"Cannot select recipe '{recipe}' on a project that is set NOT to need a recipe "
+                             "(options.needs_recipe=False)")
+        # - (named) recipe selector
+        selected_recipe: Optional[str] = None if not needs_recipe else (recipe or "default")
+        if selected_recipe and not layers.recipes.has(selected_recipe):
+            raise ValueError(f"Recipe '{selected_recipe}' not defined in this project. Available "
+                             f"recipes are: {list(layers.recipes.keys())}")
+        return selected_recipe
+
+    @staticmethod
+    def _extended_layers_class(custom_layers: FrozenSet[str]) -> Type['DTProject.Layers']:
+        """
+        Returns:
+            The Layers dataclass extended with the given custom layers, projects with the same
+            custom layers share the same class.
+        """
+        with DTProjectV4._extended_layers_lock:
+            Layers = DTProjectV4._extended_layers_classes.get(custom_layers, None)
+            if Layers is None:
+                Layers = dataclasses.make_dataclass(
+                    'ExtendedLayers',
+                    fields=[
+                        (layer, dict, cast(dataclasses.Field, dataclasses.field(default_factory=dict)))
+                        for layer in sorted(custom_layers)
+                    ],
+                    bases=(DTProject.Layers,)
+                )
+                DTProjectV4._extended_layers_classes[custom_layers] = Layers
+            return Layers
 
     @classmethod
-    def is_instance_of(cls, path: str) -> bool:
-        if not os.path.exists(path):
-            return False
-        layers_dir: str = os.path.join(path, "dtproject")
-        # if the directory 'dtproject' is missing
-        if not os.path.exists(layers_dir):
-            return False
-        # if 'dtproject' is not a directory
-        if not os.path.isdir(layers_dir):
-            return False
-        # ---
-        return True
+    def is_instance_of(cls, path: Union[str, ProjectSource]) -> bool:
+        source: ProjectSource = FilesystemSource(path) if isinstance(path, str) else path
+        # the directory 'dtproject' must exist (this also covers a missing project path)
+        return source.isdir("dtproject")
 
 class DTProjectV1to3(DTProject):
     """
@@ -1102,9 +1427,11 @@ class DTProjectV1to3(DTProject):
     """
 
     # noinspection PyMissingConstructor
-    def __init__(self, path: str, **_):
+    def __init__(self, path: str, project_info: Optional[dict] = None, **_):
+        # state of the descriptor file (see `refresh`)
+        self._signature: Optional[Tuple[str, Fingerprint]] = self._source.cache_key(".dtproject")
         # use `dtproject` adapter (required)
-        self._project_info = self._get_project_info(path)
+        self._project_info = project_info if project_info is not None else self._get_project_info(self._source)
         self._type = self._project_info["TYPE"]
         self._type_version = self._project_info["TYPE_VERSION"]
         self._version = self._project_info["VERSION"]
@@ -1205,20 +1532,41 @@ class DTProjectV1to3(DTProject):
     def get_devcontainer(self, config_name: str) -> ContainerConfiguration:
         raise NotImplementedError(f"Field 'devcontainers' not implemented in DTProject v{self.type_version}")
 
+    def _refresh_layers(self) -> Set[str]:
+        signature: Optional[Tuple[str, Fingerprint]] = self._source.cache_key(".dtproject")
+        # files changed too recently might have changed again without changing their signature
+        if signature == self._signature and not (signature is not None and is_racy(signature[1])):
+            return set()
+        project_info: dict = self._get_project_info(self._source)
+        self._signature = signature
+        if project_info == self._project_info:
+            return set()
+        self._project_info = project_info
+        self._type = project_info["TYPE"]
+        self._type_version = project_info["TYPE_VERSION"]
+        self._version = project_info["VERSION"]
+        return {".dtproject"}
+
     @staticmethod
-    def _get_project_info(path: str):
-        if not os.path.exists(path):
-            msg = f"The project path {path!r} does not exist."
+    def _get_project_info(source: Union[str, ProjectSource]):
+        if isinstance(source, str):
+            source = FilesystemSource(source)
+        path: str = source.path
+        if not source.isdir(""):
+            msg = f"The project path {source.join('')!r} does not exist."
             raise OSError(msg)
 
-        metafile = os.path.join(path, ".dtproject")
+        metafile = source.join(".dtproject")
         # if the file '.dtproject' is missing
-        if not os.path.exists(metafile):
-            msg = f"The path '{path}' does not appear to be a Duckietown project."
+        if not source.isfile(".dtproject"):
+            msg = f"The path '{source.join('')}' does not appear to be a Duckietown project."
             raise DTProjectNotFound(msg)
         # load '.dtproject'
-        with open(metafile, "rt") as metastream:
-            lines: List[str] = metastream.readlines()
+        return DTProjectV1to3._parse_project_info(source.read_text(".dtproject"), metafile, path)
+
+    @staticmethod
+    def _parse_project_info(content: str, metafile: str, path: str) -> dict:
+        lines: List[str] = content.splitlines()
         # empty metadata?
         if not lines:
             msg = f"The metadata file '{metafile}' is empty."
@@ -1255,7 +1603,7 @@ class DTProjectV1to3(DTProject):
         return metadata
 
     @classmethod
-    def is_instance_of(cls, path: str) -> bool:
+    def is_instance_of(cls, path: Union[str, ProjectSource]) -> bool:
         try:
             cls._get_project_info(path)
         except Exception:
@@ -1271,12 +1619,13 @@ class DTProjectV1(DTProjectV1to3):
         return LayerFormat(version=1)
 
     @classmethod
-    def is_instance_of(cls, path: str) -> bool:
+    def is_instance_of(cls, path: Union[str, ProjectSource]) -> bool:
+        source: ProjectSource = FilesystemSource(path) if isinstance(path, str) else path
         try:
-            DTProjectV1to3._get_project_info(path)
+            DTProjectV1to3._get_project_info(source)
         except Exception:
             return False
-        return os.path.isfile(os.path.join(path, "launch.sh")) and os.path.isdir(os.path.join(path, "code"))
+        return source.isfile("launch.sh") and source.isdir("code")
 
 
 # noinspection PyAbstractClass
@@ -1287,13 +1636,13 @@ class DTProjectV2(DTProjectV1to3):
         return LayerFormat(version=2)
 
     @classmethod
-    def is_instance_of(cls, path: str) -> bool:
+    def is_instance_of(cls, path: Union[str, ProjectSource]) -> bool:
+        source: ProjectSource = FilesystemSource(path) if isinstance(path, str) else path
         try:
-            DTProjectV1to3._get_project_info(path)
+            DTProjectV1to3._get_project_info(source)
         except Exception:
             return False
-        return os.path.isfile(os.path.join(path, ".dtproject")) and \
-               not os.path.isfile(os.path.join(path, "dependencies-py3.dt.txt"))
+        return source.isfile(".dtproject") and not source.isfile("dependencies-py3.dt.txt")
 
 
 # noinspection PyAbstractClass
@@ -1304,10 +1653,10 @@ class DTProjectV3(DTProjectV1to3):
         return LayerFormat(version=3)
 
     @classmethod
-    def is_instance_of(cls, path: str) -> bool:
+    def is_instance_of(cls, path: Union[str, ProjectSource]) -> bool:
+        source: ProjectSource = FilesystemSource(path) if isinstance(path, str) else path
         try:
-            DTProjectV1to3._get_project_info(path)
+            DTProjectV1to3._get_project_info(source)
         except Exception:
             return False
-        return os.path.isfile(os.path.join(path, ".dtproject")) and \
-               os.path.isfile(os.path.join(path, "dependencies-py3.dt.txt"))
+        return source.isfile(".dtproject") and source.isfile("dependencies-py3.dt.txt")
@@ -0,0 +1,213 @@
+import dataclasses
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, \
+    FIRST_COMPLETED
+from typing import Optional, Iterator, List, Dict, Union, Iterable, Set
+
+from .dtproject import DTProject, DTProjectV4
+from .sources import FilesystemSource
+from .utils.cache import cache_enabled
+
+
+@dataclasses.dataclass
+class FleetResult:
+    path: str
+    project: Optional[DTProject] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# directories that never contain projects, i.e., version control, tooling and the documentation that
+# projects build (hidden directories are never looked into either)
+PRUNED_DIRS: Set[str] = {
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", "html", "pdf",
+    "venv", ".venv", ".tox", ".idea", ".vscode",
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class ProjectHandle:
+    """
+    A project found on disk that was not loaded yet.
+
+    Attributes:
+        path: absolute path to the project
+        marker: what makes this directory a project, i.e., 'dtproject' (v4) or '.dtproject' (v1 to v3)
+    """
+    path: str
+    marker: str
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def load(self, recipe: Optional[str] = None) -> DTProject:
+        return DTProject(self.path, recipe=recipe)
+
+
+def iter_projects(root: str, prune: Iterable[str] = PRUNED_DIRS, follow_symlinks: bool = False) \
+        -> Iterator[ProjectHandle]:
+    """
+    Yields the projects found under the given root (root included) as they are found, in lexicographic order.
+
+    A directory is a project if it contains a directory 'dtproject' (v4) or a file '.dtproject' (v1 to v3),
+    this is a cheap check, a project might still fail to load. We do not look for projects inside projects,
+    inside hidden directories or inside directories whose name is in `prune`.
+    """
+    prune = set(prune)
+    stack: List[str] = [os.path.abspath(root)]
+    while stack:
+        path: str = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries: List[os.DirEntry] = list(it)
+        except OSError:
+            # e.g., permission denied, or the directory disappeared while we were looking
+            continue
+        subdirs: List[str] = []
+        markers: Set[str] = set()
+        for entry in entries:
+            try:
+                if entry.name == "dtproject" and entry.is_dir():
+                    markers.add(entry.name)
+                elif entry.name == ".dtproject" and entry.is_file():
+                    markers.add(entry.name)
+                elif entry.is_dir(follow_symlinks=follow_symlinks) and \
+                        not entry.name.startswith(".") and entry.name not in prune:
+                    subdirs.append(entry.name)
+            except OSError:
+                continue
+        if markers:
+            marker: str = markers.pop()
+            if markers:
+                # both are there, the project is whatever DTProject would load
+                cls, _ = DTProject._detect_format(FilesystemSource(path))
+                marker = "dtproject" if cls is DTProjectV4 else ".dtproject"
+            yield ProjectHandle(path, marker)
+            continue
+        # the stack is LIFO
+        stack.extend(os.path.join(path, d) for d in sorted(subdirs, reverse=True))
+
+
+def find_projects(root: str) -> Iterator[str]:
+    """
+    Yields the paths to the projects found under the given root, see `iter_projects`.
+    """
+    for handle in iter_projects(root):
+        yield handle.path
+
+
+class FleetLoader:
+    """
+    Loads many projects concurrently.
+
+    Projects are yielded as soon as they are loaded, failures are collected in `errors` instead of
+    interrupting the scan.
+
+    Args:
+        root: a directory to look for projects in, or an explicit list of project paths
+        workers: size of the pool (defaults to the default of the pool executor)
+        processes: use a pool of processes instead of a pool of threads
+        preload: compute right away everything that is otherwise computed on first access
+            (e.g., repository information, layers)
+        recipe: name of the recipe to select on every project that needs one
+
+    With a pool of processes, workers do the expensive part (e.g., parsing layers, running git) and store
+    the results in the on-disk caches, projects are then rebuilt from the caches in this process together
+    with what the caches do not keep (e.g., the state of the git index, see `DTProject.snapshot`).
+    Rebuilding projects needs the caches, when they are disabled (DTPROJECT_DISABLE_CACHE) a pool of threads
+    is used instead.
+    """
+
+    def __init__(self, root: Union[str, Iterable[str]], *, workers: Optional[int] = None,
+                 processes: bool = False, preload: bool = True, recipe: Optional[str] = None):
+        self._root: Union[str, Iterable[str]] = root
+        self._workers: Optional[int] = workers
+        # without the caches, whatever a process computes would be computed again here
+        self._processes: bool = processes and cache_enabled()
+        self._preload: bool = preload
+        self._recipe: Optional[str] = recipe
+        self.errors: Dict[str, BaseException] = {}
+
+    def paths(self) -> Iterator[str]:
+        if isinstance(self._root, str):
+            return find_projects(self._root)
+        return iter(self._root)
+
+    def results(self) -> Iterator[FleetResult]:
+        """
+        Yields one result per project, in order of completion. Projects are loaded as they are found,
+        at most `window` of them are in flight at any time.
+        """
+        self.errors = {}
+        executor: Executor = (ProcessPoolExecutor if self._processes else ThreadPoolExecutor)(self._workers)
+        load = _load_in_process if self._processes else _load
+        paths: Iterator[str] = self.paths()
+        futures: Dict[Future, str] = {}
+        found_all: bool = False
+        with executor:
+            try:
+                while True:
+                    # keep the pool busy while we look for more projects
+                    while not found_all and len(futures) < self.window:
+                        path: Optional[str] = next(paths, None)
+                        if path is None:
+                            found_all = True
+                            break
+                        futures[executor.submit(load, path, self._recipe, self._preload)] = path
+                    if not futures:
+                        break
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield self._result(futures.pop(future), future)
+            finally:
+                # the consumer might stop early
+                for future in futures:
+                    future.cancel()
+
+    @property
+    def window(self) -> int:
+        # enough to never leave a worker idle
+        return 2 * (self._workers or os.cpu_count() or 1)
+
+    def _result(self, path: str, future: Future) -> FleetResult:
+        try:
+            loaded: Union[DTProject, dict] = future.result()
+            if isinstance(loaded, dict):
+                # loaded in another process, rebuild it from the caches
+                project: DTProject = _load(path, self._recipe, False)
+                project.restore(loaded)
+            else:
+                project = loaded
+        except Exception as e:
+            self.errors[path] = e
+            return FleetResult(path, error=e)
+        return FleetResult(path, project=project)
+
+    def __iter__(self) -> Iterator[DTProject]:
+        for result in self.results():
+            if result.ok:
+                yield result.project
+
+
+def load_projects(root: Union[str, Iterable[str]], **kwargs) -> List[FleetResult]:
+    """
+    Loads all the projects under the given root, see FleetLoader for the arguments.
+    """
+    return list(FleetLoader(root, **kwargs).results())
+
+
+def _load(path: str, recipe: Optional[str], preload: bool) -> DTProject:
+    project: DTProject = DTProject(path, recipe=recipe)
+    if preload:
+        project.preload()
+    return project
+
+
+def _load_in_process(path: str, recipe: Optional[str], preload: bool) -> dict:
+    # projects do not travel across processes, what we computed here is either in the on-disk caches now
+    # or in the snapshot
+    return _load(path, recipe, preload).snapshot()
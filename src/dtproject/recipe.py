@@ -1,19 +1,87 @@
+import dataclasses
 import json
 import os
+import subprocess
+import sys
 import time
+from typing import Optional, List, Dict
 
 import requests
 from dtproject.types import Recipe
 
 from . import logger
+from .constants import DUCKIETOWN_HOME
 from .exceptions import RecipeProjectNotFound, DTProjectError
+from .utils.cache import atomic_write_json
+from .utils.git import GitRepository, READER_ERRORS, git
+from .utils.lock import FileLock
 from .utils.misc import run_cmd
 
 RECIPE_STAGE_NAME = "recipe"
 MEAT_STAGE_NAME = "meat"
 CHECK_RECIPE_UPDATE_MINS = 5
+# seconds we wait for the remote when checking for updates
+CHECK_RECIPE_UPDATE_TIMEOUT_SECS = 10
 
-DUCKIETOWN_HOME = os.environ.get("DUCKIETOWN_HOME", os.path.expanduser("~/.duckietown"))
+
+@dataclasses.dataclass(frozen=True)
+class CloneStrategy:
+    """
+    How much of a recipes repository is downloaded.
+
+    Attributes:
+        depth: number of commits to download, None for the whole history
+        filter: partial clone filter (e.g., 'blob:none'), file contents not matching it are downloaded
+            only when needed
+        single_branch: only download the branch of the recipe
+        submodule_jobs: number of submodules to download in parallel
+    """
+    depth: Optional[int] = 1
+    filter: Optional[str] = None
+    single_branch: bool = True
+    submodule_jobs: int = 4
+
+    def clone_args(self) -> List[str]:
+        # submodules are checked out per branch, see `submodule_args`
+        args: List[str] = []
+        if self.depth is not None:
+            args += ["--depth", str(self.depth)]
+        if self.filter is not None:
+            args += [f"--filter={self.filter}"]
+        return args + (["--single-branch"] if self.single_branch else ["--no-single-branch"])
+
+    def fetch_args(self, shallow: bool) -> List[str]:
+        # a shallow repository stays shallow, with the same depth
+        return ["--depth", str(self.depth or 1)] if shallow else []
+
+    def submodule_args(self, shallow: bool) -> List[str]:
+        args: List[str] = ["--init", "--recursive", "--jobs", str(self.submodule_jobs)]
+        return args + (["--depth", str(self.depth or 1)] if shallow else [])
+
+
+# recipes are only ever checked out, by default we download the last commit of the recipe branch only
+DEFAULT_CLONE_STRATEGY: str = "shallow"
+CLONE_STRATEGIES: Dict[str, CloneStrategy] = {
+    # the files of the last commit of the recipe branch
+    "shallow": CloneStrategy(depth=1),
+    # the whole history of the recipe branch, file contents are downloaded when they are checked out
+    "partial": CloneStrategy(depth=None, filter="blob:none"),
+    # everything, as a plain `git clone` would do
+    "full": CloneStrategy(depth=None, single_branch=False),
+}
+
+
+def get_clone_strategy() -> CloneStrategy:
+    """
+    Returns:
+        The clone strategy selected through the environment variable DTPROJECT_RECIPES_CLONE
+        (one of the keys of CLONE_STRATEGIES), DEFAULT_CLONE_STRATEGY if not set.
+    """
+    name: str = os.environ.get("DTPROJECT_RECIPES_CLONE", DEFAULT_CLONE_STRATEGY)
+    if name not in CLONE_STRATEGIES:
+        raise ValueError(f"Unknown recipes clone strategy '{name}', "
+                         f"valid strategies are: {list(CLONE_STRATEGIES)}")
+    return CLONE_STRATEGIES[name]
 
 
 def get_recipes_dir() -> str:
@@ -26,53 +94,147 @@ def get_recipe_repo_dir(recipe: Recipe) -> str:
     return os.path.join(get_recipes_dir(), repository, branch)
 
 
+def get_recipe_store_dir(recipe: Recipe) -> str:
+    # one bare repository per recipes repository, shared by the worktrees of all its branches
+    return os.path.join(get_recipes_dir(), recipe.repository, ".store.git")
+
+
+def get_recipe_lock(recipe: Recipe, timeout: Optional[float] = None) -> FileLock:
+    """
+    Returns:
+        The lock serializing downloads and updates of the given recipe across processes. There is one per
+        recipes repository, all its branches share the same store.
+    """
+    return FileLock(os.path.join(get_recipes_dir(), recipe.repository, ".lock"), timeout=timeout)
+
+
 def get_recipe_project_dir(recipe: Recipe) -> str:
     repository, location = recipe.repository, recipe.location
-    return os.path.join(get_recipe_repo_dir(recipe), location.strip("/"))
+    # recipes without a location are at the root of the repository
+    return os.path.join(get_recipe_repo_dir(recipe), (location or "").strip("/"))
+
+
+def get_recipe_remote_url(recipe: Recipe) -> str:
+    organization, repository, provider = recipe.organization, recipe.repository, recipe.provider
+    # providers can also be given as URLs (e.g., 'file:///srv/git' for a local mirror)
+    if "://" in provider:
+        return f"{provider.rstrip('/')}/{organization}/{repository}"
+    return f"https://{provider}/{organization}/{repository}"
+
+
+def get_recipe_sparse_paths(recipe: Recipe) -> List[str]:
+    """
+    Returns:
+        The paths inside the recipes repository needed by the given recipe, i.e., its location and the
+        shared paths it declares. Empty if the recipe needs the whole repository.
+    """
+    location: str = (recipe.location or "").strip("/")
+    if not location:
+        return []
+    return [location] + [path.strip("/") for path in (recipe.shared or []) if path.strip("/")]
 
 
 def recipe_project_exists(recipe: Recipe) -> bool:
     recipe_dir: str = get_recipe_project_dir(recipe)
-    return os.path.exists(recipe_dir) and os.path.isdir(recipe_dir)
+    if not (os.path.exists(recipe_dir) and os.path.isdir(recipe_dir)):
+        return False
+    if not get_recipe_sparse_paths(recipe):
+        # recipes without a location need the whole repository, other recipes might have checked out
+        # only part of it
+        repo_dir: str = get_recipe_repo_dir(recipe)
+        return not os.path.exists(os.path.join(repo_dir, ".git")) or get_sparse_checkout(repo_dir) is None
+    return True
 
 
-def clone_recipe(recipe: Recipe) -> bool:
+def clone_recipe(recipe: Recipe, strategy: Optional[CloneStrategy] = None) -> bool:
     """
     Args:
         recipe: the recipe to clone
+        strategy: how much of the recipes repository to download, see `get_clone_strategy` for the default
     """
-    repository, organization, branch, provider = recipe.repository, recipe.organization, recipe.branch, recipe.provider
     recipe_dir: str = get_recipe_project_dir(recipe)
     if recipe_project_exists(recipe):
         raise DTProjectError(f"Recipe already exists at '{recipe_dir}'")
+    strategy = strategy or get_clone_strategy()
+    # only one process downloads the recipe, the others wait and use it
+    with get_recipe_lock(recipe) as lock:
+        if lock.wait > 1:
+            logger.debug(f"Waited {lock.wait:.1f}s for another process to download recipes.")
+        if recipe_project_exists(recipe):
+            logger.info(f"Recipe downloaded by another process!")
+            return True
+        return _clone_recipe(recipe, strategy)
+
+
+def _clone_recipe(recipe: Recipe, strategy: CloneStrategy) -> bool:
+    repository, branch = recipe.repository, recipe.branch
+    recipe_dir: str = get_recipe_project_dir(recipe)
+    # only the recipe location (and what it shares) is checked out
+    paths: List[str] = get_recipe_sparse_paths(recipe)
 
     # Clone recipes repo into dt-shell root
+    repo_dir: str = get_recipe_repo_dir(recipe)
     try:
-        repo_dir: str = get_recipe_repo_dir(recipe)
+        if not paths and os.path.exists(os.path.join(repo_dir, ".git")):
+            # the branch was already (partially) checked out for another recipe, we need all of it
+            logger.info(f"Downloading recipe...")
+            logger.debug(f"Checking out the whole repository in '{repo_dir}' ...")
+            run_cmd(["git", "-C", repo_dir, "sparse-checkout", "disable"])
+            _update_submodules(repo_dir, strategy, None)
+            logger.info(f"Recipe downloaded!")
+            return True
+        if paths and os.path.exists(os.path.join(repo_dir, ".git")):
+            # the branch was already checked out for another recipe
+            if get_sparse_checkout(repo_dir) is None:
+                logger.error(f"Recipe not found at '{recipe_dir}'")
+                return False
+            logger.info(f"Downloading recipe...")
+            logger.debug(f"Adding {paths} to the recipes in '{repo_dir}' ...")
+            run_cmd(["git", "-C", repo_dir, "sparse-checkout", "add", *paths])
+            _update_submodules(repo_dir, strategy, paths)
+            logger.info(f"Recipe downloaded!")
+            return True
         logger.info(f"Downloading recipes...")
         logger.debug(f"Downloading recipes into '{repo_dir}' ...")
-        remote_url: str = f"https://{provider}/{organization}/{repository}"
-        run_cmd(["git", "clone", "-b", branch, "--recurse-submodules", remote_url, repo_dir])
-        logger.info(f"Recipes downloaded!")
-        return True
+        # branches are worktrees of the same bare repository, objects are downloaded and stored only once
+        store_dir: str = get_recipe_store_dir(recipe)
+        if not os.path.isdir(store_dir):
+            remote_url: str = get_recipe_remote_url(recipe)
+            run_cmd(["git", "clone", "--bare", "-b", branch, *strategy.clone_args(), remote_url, store_dir])
+        else:
+            # worktrees whose directory is gone are still registered (and their branches checked out)
+            run_cmd(["git", "-C", store_dir, "worktree", "prune"])
+            # only what we do not have yet is downloaded
+            shallow: bool = os.path.isfile(os.path.join(store_dir, "shallow"))
+            run_cmd(["git", "-C", store_dir, "fetch", *strategy.fetch_args(shallow), "origin",
+                     f"+refs/heads/{branch}:refs/heads/{branch}"])
+        run_cmd(["git", "-C", store_dir, "worktree", "add", "--no-checkout", repo_dir, branch])
     except Exception as e:
         # Excepts as InvalidRemote
         logger.error(f"Unable to clone the repo '{repository}'. {str(e)}.")
         return False
+    try:
+        if paths:
+            run_cmd(["git", "-C", repo_dir, "sparse-checkout", "set", "--cone", *paths])
+        run_cmd(["git", "-C", repo_dir, "checkout", "-q", branch])
+        _update_submodules(repo_dir, strategy, paths or None)
+    except Exception as e:
+        logger.error(f"Unable to check out the branch '{branch}' of the repo '{repository}'. {str(e)}.")
+        # do not leave a half-populated worktree behind
+        git(store_dir, "worktree", "remove", "--force", repo_dir)
+        return False
+    logger.info(f"Recipes downloaded!")
+    return True
 
 
 def recipe_needs_update(recipe: Recipe) -> bool:
-    organization, repository, branch = recipe.organization, recipe.repository, recipe.branch
     recipe_dir: str = get_recipe_project_dir(recipe)
-    need_update = False
     # Get the current repo info
     commands_update_check_flag = os.path.join(recipe_dir, ".updates-check")
 
     # Check if it's time to check for an update
     if os.path.exists(commands_update_check_flag) and os.path.isfile(commands_update_check_flag):
-        now = time.time()
-        last_time_checked = os.path.getmtime(commands_update_check_flag)
-        use_cached_recipe = now - last_time_checked < CHECK_RECIPE_UPDATE_MINS * 60
+        use_cached_recipe = not recipe_update_check_due(recipe)
     else:  # Save the initial .update flag
         local_sha: str = run_cmd(["git", "-C", recipe_dir, "rev-parse", "HEAD"])[0]
         # noinspection PyTypeChecker
@@ -82,37 +244,73 @@ def recipe_needs_update(recipe: Recipe) -> bool:
 
     # Check for an updated remote
     if not use_cached_recipe:
-        # Get the local sha from file (ok if oos from manual pull)
-        with open(commands_update_check_flag, "r") as fp:
-            try:
-                cached_check = json.load(fp)
-            except ValueError:
-                return False
-            local_sha = cached_check["remote"]
+        return _remote_has_updates(recipe)
+    return False
 
-        # Get the remote sha from GitHub
-        logger.info("Fetching remote SHA from github.com ...")
-        # TODO: this should be conditioned on the provider, we have github hard-coded instead
-        remote_url: str = f"https://api.github.com/repos/{organization}/{repository}/branches/{branch}"
-        try:
-            data: dict = requests.get(remote_url).json()
-            remote_sha = data["commit"]["sha"]
-        except Exception as e:
-            logger.error(str(e))
-            return False
 
-        # check if we need to update
-        need_update = local_sha != remote_sha
-        # touch flag to reset update check time
-        touch_update_check_flag(recipe_dir)
+def recipe_update_check_due(recipe: Recipe) -> bool:
+    """
+    Returns:
+        Whether the last check for updates of the given recipe is older than CHECK_RECIPE_UPDATE_MINS.
+    """
+    commands_update_check_flag = os.path.join(get_recipe_project_dir(recipe), ".updates-check")
+    try:
+        last_time_checked = os.path.getmtime(commands_update_check_flag)
+    except OSError:
+        return True
+    return time.time() - last_time_checked >= CHECK_RECIPE_UPDATE_MINS * 60
 
+
+def _remote_has_updates(recipe: Recipe) -> bool:
+    organization, repository, branch = recipe.organization, recipe.repository, recipe.branch
+    recipe_dir: str = get_recipe_project_dir(recipe)
+    # Get the local sha from file (ok if oos from manual pull)
+    local_sha: Optional[str] = read_update_check_flag(recipe_dir).get("remote")
+    if local_sha is None:
+        return False
+
+    # Get the remote sha from GitHub
+    logger.info("Fetching remote SHA from github.com ...")
+    # TODO: this should be conditioned on the provider, we have github hard-coded instead
+    remote_url: str = f"https://api.github.com/repos/{organization}/{repository}/branches/{branch}"
+    try:
+        data: dict = requests.get(remote_url, timeout=CHECK_RECIPE_UPDATE_TIMEOUT_SECS).json()
+        remote_sha = data["commit"]["sha"]
+    except Exception as e:
+        logger.error(str(e))
+        return False
+
+    # check if we need to update
+    need_update = local_sha != remote_sha
+    # touch flag to reset update check time
+    touch_update_check_flag(recipe_dir)
     return need_update
 
 
-def save_update_check_flag(recipe_dir: str, sha: str) -> None:
+def read_update_check_flag(recipe_dir: str) -> dict:
+    """
+    Returns:
+        The content of the update check flag of the given recipe, an empty dictionary if there is none.
+    """
+    commands_update_check_flag = os.path.join(recipe_dir, ".updates-check")
+    try:
+        with open(commands_update_check_flag, "r") as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_update_check_flag(recipe_dir: str, sha: str, **extra) -> None:
+    """
+    Args:
+        recipe_dir: the recipe project directory
+        sha: the last known commit of the remote branch
+        extra: additional results of the last check (e.g., a commit fetched but not checked out yet)
+    """
     commands_update_check_flag = os.path.join(recipe_dir, ".updates-check")
-    with open(commands_update_check_flag, "w") as fp:
-        json.dump({"remote": sha}, fp)
+    # concurrent readers never see a partial file
+    atomic_write_json(commands_update_check_flag, {"remote": sha, **extra})
 
 
 def touch_update_check_flag(recipe_dir: str) -> None:
@@ -121,12 +319,234 @@ def touch_update_check_flag(recipe_dir: str) -> None:
         os.utime(commands_update_check_flag, None)
 
 
-def update_recipe(recipe: Recipe) -> bool:
-    branch: str = recipe.branch
+def pull_recipe(recipe: Recipe, strategy: Optional[CloneStrategy] = None):
+    """
+    Brings an existing recipe up to date with its remote branch, only new commits are downloaded and
+    shallow clones stay shallow. Local commits in the recipe repository are not kept.
+
+    Raises:
+        subprocess.CalledProcessError: if any of the git commands fails
+    """
+    strategy = strategy or get_clone_strategy()
+    sha: str = fetch_recipe(recipe, strategy)
+    checkout_recipe(recipe, sha, strategy)
+
+
+def fetch_recipe(recipe: Recipe, strategy: Optional[CloneStrategy] = None) -> str:
+    """
+    Downloads the new commits of the remote branch of an existing recipe, the checkout is left untouched.
+
+    Returns:
+        The commit at the tip of the remote branch.
+
+    Raises:
+        subprocess.CalledProcessError: if any of the git commands fails
+    """
+    strategy = strategy or get_clone_strategy()
+    repo_dir: str = get_recipe_repo_dir(recipe)
+    run_cmd(["git", "-C", repo_dir, "fetch", *strategy.fetch_args(_is_shallow(repo_dir)), "origin", recipe.branch])
+    return run_cmd(["git", "-C", repo_dir, "rev-parse", "FETCH_HEAD"])[0].strip()
+
+
+def checkout_recipe(recipe: Recipe, sha: str, strategy: Optional[CloneStrategy] = None, offline: bool = False):
+    """
+    Moves an existing recipe to the given (already downloaded) commit.
+
+    Args:
+        recipe: the recipe to move
+        sha: the commit to check out
+        strategy: how submodules are downloaded
+        offline: only use submodule commits that were already downloaded
+
+    Raises:
+        subprocess.CalledProcessError: if any of the git commands fails
+    """
+    strategy = strategy or get_clone_strategy()
+    repo_dir: str = get_recipe_repo_dir(recipe)
+    # a shallow history cannot be merged, move the branch instead (local changes are kept, if possible)
+    run_cmd(["git", "-C", repo_dir, "reset", "--keep", sha])
+    # submodules outside of the sparse checkout are not needed by any recipe
+    _update_submodules(repo_dir, strategy, get_sparse_checkout(repo_dir), _is_shallow(repo_dir), offline)
+
+
+def _is_shallow(repo_dir: str) -> bool:
+    try:
+        return os.path.isfile(os.path.join(GitRepository(repo_dir).commondir, "shallow"))
+    except READER_ERRORS:
+        return False
+
+
+def get_sparse_checkout(repo_dir: str) -> Optional[List[str]]:
+    """
+    Returns:
+        The directories checked out in the given (sparse) repository, None if the whole repository is.
+    """
+    # some versions of git list nothing (and succeed) on a repository that is not sparse
+    sparse = git(repo_dir, "config", "--bool", "core.sparseCheckout")
+    if not sparse.ok or sparse.stdout.strip() != "true":
+        return None
+    res = git(repo_dir, "sparse-checkout", "list")
+    return res.lines if res.ok else None
+
+
+def _update_submodules(repo_dir: str, strategy: CloneStrategy, paths: Optional[List[str]],
+                       shallow: Optional[bool] = None, offline: bool = False):
+    if paths is not None and not paths:
+        # nothing checked out, nothing to update
+        return
+    shallow = strategy.depth is not None if shallow is None else shallow
+    pathspec: List[str] = ["--", *paths] if paths else []
+    cmd: List[str] = ["git", "-C", repo_dir, "submodule", "update", *strategy.submodule_args(shallow)]
+    if offline:
+        try:
+            run_cmd(cmd + ["--no-fetch", *pathspec])
+            return
+        except subprocess.CalledProcessError:
+            # the new submodule commits were never downloaded
+            logger.debug(f"Submodules of '{repo_dir}' need to be downloaded.")
+    run_cmd(cmd + pathspec)
+
+
+def background_updates_enabled() -> bool:
+    return os.environ.get("DTPROJECT_RECIPES_BACKGROUND_UPDATE", "0").lower() in ["1", "true", "yes"]
+
+
+def update_recipe(recipe: Recipe, background: Optional[bool] = None) -> bool:
+    """
+    Brings the given recipe up to date with its remote branch.
+
+    In background mode, the recipe is never updated from the network while we wait. Updates downloaded by
+    a previous check are checked out (if nobody else is updating the recipe) and, when it is time to check
+    again, the check and the download happen in a detached process, see `revalidate_recipe`.
+
+    Args:
+        recipe: the recipe to update
+        background: use the background mode, as set by DTPROJECT_RECIPES_BACKGROUND_UPDATE if None
+
+    Returns:
+        Whether the recipe changed.
+    """
     recipe_dir: str = get_recipe_project_dir(recipe)
     if not recipe_project_exists(recipe):
         raise RecipeProjectNotFound(f"There is no existing recipe in '{recipe_dir}'.")
+    if background is None:
+        background = background_updates_enabled()
+    if background:
+        return _update_recipe_in_background(recipe)
+    sha: Optional[str] = _get_recipe_sha(recipe)
+    # only one process updates the recipe, the others wait and find it up-to-date
+    with get_recipe_lock(recipe) as lock:
+        if lock.wait > 1:
+            logger.debug(f"Waited {lock.wait:.1f}s for another process to update recipes.")
+        updated: bool = _update_recipe(recipe)
+    # the recipe might have been updated by another process while we were waiting
+    return updated or _get_recipe_sha(recipe) != sha
+
+
+def revalidate_recipe(recipe: Recipe) -> bool:
+    """
+    Checks the remote branch of the given recipe for new commits and downloads them, the checkout is left
+    untouched. The outcome is recorded in the update check flag, the next `update_recipe` in background
+    mode checks the new commits out.
+
+    Returns:
+        Whether new commits were downloaded.
+    """
+    recipe_dir: str = get_recipe_project_dir(recipe)
+    with get_recipe_lock(recipe):
+        try:
+            if not _remote_has_updates(recipe):
+                return False
+            sha: str = fetch_recipe(recipe)
+        except Exception as e:
+            # nobody is waiting for us, leave a note for the next invocation (updates downloaded before are kept)
+            previous: dict = read_update_check_flag(recipe_dir)
+            pending: dict = {"fetched": previous["fetched"]} if previous.get("fetched") else {}
+            save_update_check_flag(recipe_dir, previous.get("remote", ""), error=str(e), **pending)
+            return False
+        save_update_check_flag(recipe_dir, sha, fetched=sha)
+    return True
+
+
+def _update_recipe_in_background(recipe: Recipe) -> bool:
+    recipe_dir: str = get_recipe_project_dir(recipe)
+    updated: bool = False
+    check: dict = read_update_check_flag(recipe_dir)
+    if check.get("error"):
+        logger.debug(f"The last background check for recipe updates failed: {check['error']}")
+    if check.get("fetched"):
+        try:
+            # never wait for the lock, the updates will be checked out next time
+            with get_recipe_lock(recipe, timeout=0):
+                updated = _checkout_fetched_update(recipe)
+        except TimeoutError:
+            logger.debug("Recipes are being updated by another process, using the cached recipe.")
+            return False
+    if not os.path.isfile(os.path.join(recipe_dir, ".updates-check")):
+        # first check, records the current commit
+        recipe_needs_update(recipe)
+    elif recipe_update_check_due(recipe):
+        # claim the check, the invocations that follow do not start one of their own
+        touch_update_check_flag(recipe_dir)
+        _spawn_revalidation(recipe)
+    return updated
+
 
+def _checkout_fetched_update(recipe: Recipe) -> bool:
+    recipe_dir: str = get_recipe_project_dir(recipe)
+    # the flag might have changed while we were waiting for the lock
+    check: dict = read_update_check_flag(recipe_dir)
+    sha: Optional[str] = check.get("fetched")
+    if not sha:
+        return False
+    updated: bool = False
+    if sha != _get_recipe_sha(recipe):
+        logger.info("Checking out the recipe updates downloaded in the background...")
+        try:
+            checkout_recipe(recipe, sha, offline=True)
+            updated = True
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Unable to check out the recipe updates. {str(e)}.")
+            # we are still at our commit, the next (regular) check sees the remote ahead and tries again,
+            # the failure might persist (e.g., local changes), we do not retry any sooner than that
+            save_update_check_flag(recipe_dir, _get_recipe_sha(recipe) or "", error=str(e))
+            return False
+    save_update_check_flag(recipe_dir, sha)
+    return updated
+
+
+def _spawn_revalidation(recipe: Recipe):
+    # the check runs in its own session, it is not killed with (nor waited for by) the current command
+    code: str = "import json, sys\n" \
+                "from dtproject.recipe import revalidate_recipe\n" \
+                "from dtproject.types import Recipe\n" \
+                "revalidate_recipe(Recipe(**json.loads(sys.argv[1])))\n"
+    # the child imports this very copy of the library
+    env: Dict[str, str] = dict(os.environ)
+    path: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [path, env.get("PYTHONPATH")]))
+    logger.debug(f"Checking for updates of recipe '{recipe.repository}:{recipe.branch}' in the background...")
+    subprocess.Popen(
+        [sys.executable, "-c", code, json.dumps(dataclasses.asdict(recipe))],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=env,
+        start_new_session=True,
+    )
+
+
+def _get_recipe_sha(recipe: Recipe) -> Optional[str]:
+    repo_dir: str = get_recipe_repo_dir(recipe)
+    try:
+        return GitRepository(repo_dir).head()[0]
+    except READER_ERRORS:
+        res = git(repo_dir, "rev-parse", "HEAD")
+        return res.stdout.strip() if res.ok else None
+
+
+def _update_recipe(recipe: Recipe) -> bool:
+    recipe_dir: str = get_recipe_project_dir(recipe)
     # Check for recipe repo updates
     logger.info("Checking if the project's recipe needs to be updated...")
     if recipe_needs_update(recipe):
@@ -134,13 +554,17 @@ def update_recipe(recipe: Recipe) -> bool:
         logger.debug(f"Updating recipe '{recipe_dir}'...")
         wait_on_retry_secs = 4
         th = {2: "nd", 3: "rd", 4: "th"}
-        for trial in range(3):
+        num_trials = 3
+        for trial in range(num_trials):
             try:
-                run_cmd(["git", "-C", recipe_dir, "pull", "--recurse-submodules", "origin", branch])
+                pull_recipe(recipe)
                 logger.debug(f"Updated recipe in '{recipe_dir}'.")
                 logger.info(f"Recipe successfully updated!")
-            except RuntimeError as e:
+            except subprocess.CalledProcessError as e:
                 logger.error(str(e))
+                if trial == num_trials - 1:
+                    # the recipe was not updated, the update check flag is left as it is
+                    raise
                 logger.warning(
                     "An error occurred while pulling the updated commands. Retrying for "
                     f"the {trial + 2}-{th[trial + 2]} in {wait_on_retry_secs} seconds."
@@ -148,7 +572,6 @@ def update_recipe(recipe: Recipe) -> bool:
                 time.sleep(wait_on_retry_secs)
             else:
                 break
-        run_cmd(["git", "-C", recipe_dir, "submodule", "update"])
 
         # Get HEAD sha after update and save
         current_sha: str = run_cmd(["git", "-C", recipe_dir, "rev-parse", "HEAD"])
@@ -0,0 +1,220 @@
+import os
+import posixpath
+from abc import abstractmethod
+from typing import Optional, Dict, Tuple
+
+from .exceptions import DTProjectNotFound
+from .utils.cache import Fingerprint, stat_signature
+from .utils.git import GitSession, GitReaderError
+
+# git tree entry modes
+GIT_MODE_TREE = "40000"
+GIT_MODE_FILE_PREFIX = "100"
+
+
+class ProjectSource:
+    """
+    Read-only access to the files of a project. Paths are relative to the root of the project.
+    """
+
+    @property
+    @abstractmethod
+    def path(self) -> str:
+        """
+        Absolute path to the project on disk.
+        """
+        pass
+
+    @property
+    def revision(self) -> Optional[str]:
+        """
+        Git revision the files are read from, None when reading from the working tree.
+        """
+        return None
+
+    @abstractmethod
+    def isfile(self, rel: str) -> bool:
+        pass
+
+    @abstractmethod
+    def isdir(self, rel: str) -> bool:
+        pass
+
+    def exists(self, rel: str) -> bool:
+        return self.isfile(rel) or self.isdir(rel)
+
+    @abstractmethod
+    def listdir(self, rel: str = "") -> Dict[str, bool]:
+        """
+        Returns:
+            A dictionary mapping the names of the entries of the given directory to whether they are directories.
+        """
+        pass
+
+    @abstractmethod
+    def read_text(self, rel: str) -> str:
+        pass
+
+    @abstractmethod
+    def join(self, rel: str) -> str:
+        """
+        Returns:
+            A human-readable location for the given file (e.g., to be used in error messages).
+        """
+        pass
+
+    def cache_key(self, rel: str) -> Optional[Tuple[str, Fingerprint]]:
+        """
+        Returns:
+            A key identifying the given file and the fingerprint of its content, to be used with the
+            caches in `dtproject.utils.cache`. None if the file cannot be cached.
+        """
+        return None
+
+
+class FilesystemSource(ProjectSource):
+    """
+    Files of a project as they are on disk.
+    """
+
+    def __init__(self, path: str):
+        self._path: str = os.path.abspath(path)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def isfile(self, rel: str) -> bool:
+        return os.path.isfile(self.join(rel))
+
+    def isdir(self, rel: str) -> bool:
+        return os.path.isdir(self.join(rel))
+
+    def exists(self, rel: str) -> bool:
+        return os.path.exists(self.join(rel))
+
+    def listdir(self, rel: str = "") -> Dict[str, bool]:
+        with os.scandir(self.join(rel)) as it:
+            return {entry.name: entry.is_dir() for entry in it}
+
+    def read_text(self, rel: str) -> str:
+        with open(self.join(rel), "rt") as fin:
+            return fin.read()
+
+    def join(self, rel: str) -> str:
+        return os.path.join(self._path, rel) if rel else self._path
+
+    def cache_key(self, rel: str) -> Optional[Tuple[str, Fingerprint]]:
+        fpath: str = self.join(rel)
+        fingerprint: Fingerprint = stat_signature([fpath])
+        return (fpath, fingerprint) if fingerprint else None
+
+
+class GitRevisionSource(ProjectSource):
+    """
+    Files of a project as they are at a given git revision, read directly from the git objects.
+    """
+
+    def __init__(self, path: str, revision: str, session: Optional[GitSession] = None):
+        self._path: str = os.path.abspath(path)
+        self._revision: str = revision
+        # find the root of the repository, the project might be in a subdirectory
+        toplevel: str = self._path
+        while not os.path.exists(os.path.join(toplevel, ".git")):
+            parent: str = os.path.dirname(toplevel)
+            if parent == toplevel:
+                raise DTProjectNotFound(f"The path '{self._path}' is not inside a git repository.")
+            toplevel = parent
+        rel: str = os.path.relpath(self._path, toplevel).replace(os.sep, "/")
+        self._prefix: str = "" if rel == "." else rel
+        self._session: GitSession = session or GitSession.get(toplevel)
+        header = self._session.resolve(f"{revision}^{{commit}}")
+        if header is None:
+            raise DTProjectNotFound(f"Revision '{revision}' not found in the repository at '{toplevel}'.")
+        self._sha: str = header[0]
+        # trees we already listed, by path relative to the project
+        self._trees: Dict[str, Optional[Dict[str, Tuple[str, str]]]] = {}
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def revision(self) -> str:
+        return self._revision
+
+    @property
+    def sha(self) -> str:
+        return self._sha
+
+    @property
+    def toplevel(self) -> str:
+        return self._session.path
+
+    @property
+    def branch(self) -> Optional[str]:
+        """
+        The name of the local branch the revision refers to, None if the revision is not a branch name.
+        """
+        header = self._session.resolve(f"refs/heads/{self._revision}")
+        return self._revision if header is not None and header[0] == self._sha else None
+
+    def isfile(self, rel: str) -> bool:
+        entry = self._entry(rel)
+        return entry is not None and entry[0].startswith(GIT_MODE_FILE_PREFIX)
+
+    def isdir(self, rel: str) -> bool:
+        if not rel.strip("/"):
+            return self._tree("") is not None
+        entry = self._entry(rel)
+        return entry is not None and entry[0] == GIT_MODE_TREE
+
+    def listdir(self, rel: str = "") -> Dict[str, bool]:
+        tree = self._tree(rel)
+        if tree is None:
+            raise FileNotFoundError(self.join(rel))
+        return {name: mode == GIT_MODE_TREE for name, (mode, _) in tree.items()}
+
+    def read_text(self, rel: str) -> str:
+        entry = self._entry(rel)
+        if entry is None or not entry[0].startswith(GIT_MODE_FILE_PREFIX):
+            raise FileNotFoundError(self.join(rel))
+        obj = self._session.read(entry[1])
+        if obj is None:
+            raise GitReaderError(f"Object '{entry[1]}' not found")
+        return obj[1].decode("utf-8")
+
+    def join(self, rel: str) -> str:
+        return f"{self._revision}:{posixpath.join(self._prefix, rel.strip('/'))}"
+
+    def cache_key(self, rel: str) -> Optional[Tuple[str, Fingerprint]]:
+        # objects are immutable, the hash of the blob is all we need
+        entry = self._entry(rel)
+        return (f"git:{entry[1]}", []) if entry is not None else None
+
+    def _entry(self, rel: str) -> Optional[Tuple[str, str]]:
+        parent, name = posixpath.split(rel.strip("/"))
+        tree = self._tree(parent)
+        return tree.get(name, None) if tree is not None else None
+
+    def _tree(self, rel: str) -> Optional[Dict[str, Tuple[str, str]]]:
+        rel = rel.strip("/")
+        if rel not in self._trees:
+            obj = self._session.read(f"{self._sha}:{posixpath.join(self._prefix, rel)}")
+            self._trees[rel] = self._parse_tree(obj[1]) if obj is not None and obj[0] == "tree" else None
+        return self._trees[rel]
+
+    def _parse_tree(self, content: bytes) -> Dict[str, Tuple[str, str]]:
+        # a tree is a sequence of entries '<mode> <name>\0<binary hash>'
+        hash_len: int = len(self._sha) // 2
+        entries: Dict[str, Tuple[str, str]] = {}
+        i: int = 0
+        while i < len(content):
+            space: int = content.index(b" ", i)
+            nul: int = content.index(b"\0", space)
+            mode: str = content[i:space].decode("ascii")
+            name: str = content[space + 1:nul].decode("utf-8")
+            sha: str = content[nul + 1:nul + 1 + hash_len].hex()
+            entries[name] = (mode, sha)
+            i = nul + 1 + hash_len
+        return entries
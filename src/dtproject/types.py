@@ -1,11 +1,11 @@
 import dataclasses
 from typing import List, Optional, TypeVar, Generic, Iterator, Dict
 
-import yaml
 from dataclass_wizard import YAMLWizard
 
 from .constants import *
 from .utils.misc import ddict
+from .utils.yaml_loader import safe_load
 
 T = TypeVar("T")
 EventName = str
@@ -37,11 +37,15 @@ class DictLayer(Layer, Generic[T], dict):
     def has(self, recipe: str) -> bool:
         return recipe in self
 
+    @classmethod
+    def from_yaml(cls, content: str) -> 'DictLayer':
+        d: Dict[str, dict] = safe_load(content)
+        return cls(given=True, **{n: cls.ITEM_CLASS(**r) for n, r in d.items()})
+
     @classmethod
     def from_yaml_file(cls, path: str) -> 'DictLayer':
         with open(path, "rt") as fin:
-            d: Dict[str, dict] = yaml.safe_load(fin)
-        return cls(given=True, **{n: cls.ITEM_CLASS(**r) for n, r in d.items()})
+            return cls.from_yaml(fin.read())
 
     @classmethod
     def empty(cls) -> 'DictLayer':
@@ -50,7 +54,12 @@ class DictLayer(Layer, Generic[T], dict):
 
 @dataclasses.dataclass
 class DataClassLayer(YAMLWizard, Layer):
-    pass
+
+    @classmethod
+    def from_yaml(cls, string_or_stream, *, decoder=None, **decoder_kwargs):
+        # this is also used by `from_yaml_file`
+        return super(DataClassLayer, cls).from_yaml(string_or_stream, decoder=decoder or safe_load,
+                                                    **decoder_kwargs)
 
 
 @dataclasses.dataclass
@@ -111,6 +120,8 @@ class Recipe:
     provider: str = DEFAULT_GIT_PROVIDER
     organization: str = DUCKIETOWN
     location: Optional[str] = None
+    # paths inside the repository the recipe needs besides its location (e.g., shared assets)
+    shared: Optional[List[str]] = None
 
     def copy(self) -> 'Recipe':
         return Recipe(**dataclasses.asdict(self))
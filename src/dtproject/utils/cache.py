@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+import time
+from typing import Optional, List, Any, Iterable
+
+from ..constants import DUCKIETOWN_HOME
+
+# a file modified within this many seconds from the moment we look at it cannot be trusted to be unchanged
+# when its stat signature matches, changes happening within the same filesystem timestamp granularity would
+# go unnoticed otherwise
+RACY_WINDOW_SECS: float = 2.0
+
+Fingerprint = List[list]
+
+
+def get_cache_dir(*parts: str) -> str:
+    default_cache_dir: str = os.path.join(DUCKIETOWN_HOME, "cache", "dtproject")
+    return os.path.join(os.environ.get("DTPROJECT_CACHE", default_cache_dir), *parts)
+
+
+def cache_enabled() -> bool:
+    return os.environ.get("DTPROJECT_DISABLE_CACHE", "0").lower() not in ["1", "true", "yes"]
+
+
+def stat_signature(fpaths: Iterable[str], root: Optional[str] = None) -> Fingerprint:
+    """
+    Returns:
+        A list of [path, inode, size, mtime] for each of the given paths that exist.
+        Paths are stored relative to `root` if given.
+    """
+    signature: Fingerprint = []
+    for fpath in fpaths:
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            continue
+        name: str = os.path.relpath(fpath, root) if root else fpath
+        # the size of a directory is meaningless
+        size: int = 0 if stat.S_ISDIR(st.st_mode) else st.st_size
+        signature.append([name, st.st_ino, size, st.st_mtime_ns])
+    return signature
+
+
+def is_racy(fingerprint: Fingerprint) -> bool:
+    """
+    Returns:
+        Whether any of the files in the given fingerprint changed too recently to be trusted.
+    """
+    newest: int = max([s[3] for s in fingerprint] or [0])
+    return time.time() - newest / 1e9 < RACY_WINDOW_SECS
+
+
+def atomic_write_json(fpath: str, data: Any):
+    """
+    Writes the given data to a temporary file next to `fpath` and then moves it in place,
+    concurrent readers either see the old content or the new one, never a partial file.
+    """
+    atomic_write_bytes(fpath, json.dumps(data).encode("utf-8"))
+
+
+def atomic_write_bytes(fpath: str, data: bytes):
+    """
+    Same as `atomic_write_json` for raw bytes.
+    """
+    fd, tmp_fpath = tempfile.mkstemp(dir=os.path.dirname(fpath), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            fout.write(data)
+        os.replace(tmp_fpath, fpath)
+    except BaseException:
+        if os.path.exists(tmp_fpath):
+            os.remove(tmp_fpath)
+        raise
+
+
+class FileCache:
+    """
+    On-disk cache of JSON values, one file per entry, validated by a fingerprint and bounded in size.
+
+    Entries are evicted in LRU order, the mtime of an entry file is bumped every time the entry is used.
+    Multiple processes can use the same cache concurrently, entries are replaced atomically and
+    a lost race simply means that the same value is computed more than once.
+    """
+
+    SUFFIX: str = ".json"
+
+    def __init__(self, name: str, max_entries: int = 512):
+        self._name: str = name
+        self._max_entries: int = max_entries
+
+    @property
+    def directory(self) -> str:
+        return get_cache_dir(self._name)
+
+    def get(self, key: str, fingerprint: Fingerprint) -> Optional[Any]:
+        if not cache_enabled():
+            return None
+        fpath: str = self._entry_path(key)
+        try:
+            with open(fpath, "rb") as fin:
+                entry: dict = self._decode(fin.read())
+            if entry["key"] != key or entry["fingerprint"] != fingerprint:
+                return None
+            # mark entry as recently used
+            os.utime(fpath, None)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry["value"]
+
+    def put(self, key: str, fingerprint: Fingerprint, value: Any):
+        if not cache_enabled() or is_racy(fingerprint):
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entry: dict = {"key": key, "fingerprint": fingerprint, "value": value}
+            atomic_write_bytes(self._entry_path(key), self._encode(entry))
+            self._evict()
+        except (OSError, ValueError):
+            # the cache is only an optimization (e.g., the cache directory might be read-only)
+            pass
+
+    def clear(self):
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        entries: List[os.DirEntry] = list(self._entries())
+        if len(entries) <= self._max_entries:
+            return
+
+        def _mtime(e: os.DirEntry) -> float:
+            try:
+                return e.stat().st_mtime
+            except FileNotFoundError:
+                return 0
+
+        entries.sort(key=_mtime)
+        for entry in entries[:len(entries) - self._max_entries]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                # another process evicted it first
+                pass
+
+    def _entries(self) -> Iterable[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [e for e in it if e.name.endswith(self.SUFFIX) and not e.name.startswith(".")]
+        except FileNotFoundError:
+            return []
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + self.SUFFIX)
+
+    def _encode(self, entry: dict) -> bytes:
+        return json.dumps(entry).encode("utf-8")
+
+    def _decode(self, data: bytes) -> dict:
+        return json.loads(data.decode("utf-8"))
+
+
+class PickleFileCache(FileCache):
+    """
+    Same as FileCache for values that JSON cannot represent (e.g., instances of dataclasses).
+
+    Only use this for values computed by this library, the cache directory is trusted as much as the code is.
+    """
+
+    SUFFIX: str = ".pickle"
+
+    def _encode(self, entry: dict) -> bytes:
+        try:
+            return pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(str(e))
+
+    def _decode(self, data: bytes) -> dict:
+        try:
+            return pickle.loads(data)
+        except (pickle.UnpicklingError, AttributeError, ImportError, EOFError) as e:
+            # e.g., a class that was renamed or moved in a newer version of this library
+            raise ValueError(str(e))
@@ -0,0 +1,929 @@
+import asyncio
+import atexit
+import os
+import re
+import subprocess
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Tuple, List, Iterable, Set
+
+from .cache import FileCache, cache_enabled, Fingerprint, stat_signature, is_racy
+from .misc import git_remote_url_to_https
+from .process import run, run_async, stream, CommandResult
+
+# git queries against a local repository should never take this long
+GIT_TIMEOUT_SECS: float = 60.0
+
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+
+class GitReaderError(Exception):
+    """
+    Raised by GitRepository when a question cannot be answered by reading the `.git` directory alone.
+    """
+    pass
+
+
+class GitRepository:
+    """
+    Read-only view of a git repository that answers simple questions (HEAD, refs, tags, config) by
+    reading the files inside the `.git` directory instead of spawning `git` processes.
+
+    Whenever the on-disk layout is not understood (e.g., reftable refs, config includes), a
+    GitReaderError is raised and the caller is expected to fall back to the git CLI.
+    """
+
+    def __init__(self, path: str):
+        self._path: str = os.path.abspath(path)
+        self._gitdir: str = self._find_gitdir(self._path)
+        # linked worktrees store shared data in a common directory
+        self._commondir: str = self._gitdir
+        commondir_fpath: str = os.path.join(self._gitdir, "commondir")
+        if os.path.isfile(commondir_fpath):
+            with open(commondir_fpath, "rt") as fin:
+                self._commondir = os.path.normpath(os.path.join(self._gitdir, fin.read().strip()))
+        # cached content
+        self._config: Optional[Dict[str, Dict[str, str]]] = None
+        self._packed_refs: Optional[Dict[str, Tuple[str, Optional[str]]]] = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def gitdir(self) -> str:
+        return self._gitdir
+
+    @property
+    def commondir(self) -> str:
+        return self._commondir
+
+    def head(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns:
+            A tuple (sha, branch). The SHA is None when the repository has no commits yet,
+            the branch is None when HEAD is detached.
+        """
+        with open(os.path.join(self._gitdir, "HEAD"), "rt") as fin:
+            content: str = fin.read().strip()
+        if content.startswith("ref:"):
+            ref: str = content[len("ref:"):].strip()
+            branch: str = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+            return self.resolve_ref(ref), branch
+        if SHA_PATTERN.match(content):
+            return content, None
+        raise GitReaderError(f"Unrecognized HEAD content '{content}'")
+
+    def state_paths(self) -> List[str]:
+        """
+        Returns:
+            The files and directories whose stat signature changes when the state of the repository does, i.e.,
+            HEAD, the index, the config, the current branch and the (loose and packed) refs.
+        """
+        gitdir, commondir = self._gitdir, self._commondir
+        fpaths: List[str] = [
+            os.path.join(gitdir, "HEAD"),
+            os.path.join(gitdir, "index"),
+            os.path.join(commondir, "packed-refs"),
+            os.path.join(commondir, "config"),
+        ]
+        try:
+            with open(os.path.join(gitdir, "HEAD"), "rt") as fin:
+                content: str = fin.read().strip()
+        except OSError:
+            content = ""
+        if content.startswith("ref:"):
+            ref: str = content[len("ref:"):].strip()
+            fpaths.extend(os.path.join(root, ref) for root in dict.fromkeys([gitdir, commondir]))
+        # refs are written with a rename, that updates the mtime of the directory containing them
+        for refs in ["heads", "tags"]:
+            fpaths.extend(root for root, _, _ in os.walk(os.path.join(commondir, "refs", refs)))
+        return fpaths
+
+    def resolve_ref(self, ref: str, _depth: int = 0) -> Optional[str]:
+        """
+        Resolves a full ref name (e.g., 'refs/heads/master') to a SHA. Returns None if the ref does not exist.
+        """
+        if _depth > 5:
+            raise GitReaderError(f"Too many levels of symbolic refs while resolving '{ref}'")
+        self._assert_files_backend()
+        # per-worktree refs take precedence, as in git
+        roots: Tuple[str, ...] = (self._gitdir,) if self._gitdir == self._commondir else \
+            (self._gitdir, self._commondir)
+        for root in roots:
+            ref_fpath: str = os.path.join(root, ref)
+            if os.path.isfile(ref_fpath):
+                with open(ref_fpath, "rt") as fin:
+                    content: str = fin.read().strip()
+                if content.startswith("ref:"):
+                    return self.resolve_ref(content[len("ref:"):].strip(), _depth + 1)
+                if not SHA_PATTERN.match(content):
+                    raise GitReaderError(f"Unrecognized content for ref '{ref}'")
+                return content
+        packed = self.packed_refs().get(ref, None)
+        return packed[0] if packed else None
+
+    def packed_refs(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Returns:
+            A dictionary mapping full ref names to a tuple (sha, peeled_sha) as found in `packed-refs`.
+            The peeled SHA is only known for annotated tags.
+        """
+        if self._packed_refs is not None:
+            return self._packed_refs
+        refs: Dict[str, Tuple[str, Optional[str]]] = {}
+        packed_fpath: str = os.path.join(self._commondir, "packed-refs")
+        if os.path.isfile(packed_fpath):
+            last: Optional[str] = None
+            with open(packed_fpath, "rt") as fin:
+                for line in fin:
+                    line = line.rstrip("\n")
+                    if not line or line.startswith("#"):
+                        continue
+                    if line.startswith("^"):
+                        # peeled value of the previous (annotated tag) entry
+                        if last is not None:
+                            refs[last] = (refs[last][0], line[1:])
+                        continue
+                    sha, _, name = line.partition(" ")
+                    refs[name] = (sha, None)
+                    last = name
+        self._packed_refs = refs
+        return refs
+
+    def refs(self, prefix: str = "refs/") -> Dict[str, str]:
+        """
+        Returns:
+            A dictionary mapping full ref names starting with `prefix` to their SHA.
+            Loose refs take precedence over packed ones.
+        """
+        self._assert_files_backend()
+        refs: Dict[str, str] = {
+            name: sha for name, (sha, _) in self.packed_refs().items() if name.startswith(prefix)
+        }
+        refs_dir: str = os.path.join(self._commondir, prefix.rstrip("/"))
+        for root, _, files in os.walk(refs_dir):
+            for fname in files:
+                if fname.endswith(".lock"):
+                    continue
+                name: str = os.path.relpath(os.path.join(root, fname), self._commondir).replace(os.sep, "/")
+                sha: Optional[str] = self.resolve_ref(name)
+                if sha:
+                    refs[name] = sha
+        return refs
+
+    def tags(self) -> Dict[str, Tuple[str, str]]:
+        """
+        Returns:
+            A dictionary mapping tag names to a tuple (sha, commit_sha), where `sha` is the object the tag
+            points to (different from `commit_sha` for annotated tags) and `commit_sha` is the peeled commit.
+        """
+        packed = self.packed_refs()
+        tags: Dict[str, Tuple[str, Optional[str]]] = {}
+        for name, sha in self.refs("refs/tags/").items():
+            packed_sha, peeled = packed.get(name, (None, None))
+            if packed_sha == sha and peeled:
+                tags[name[len("refs/tags/"):]] = (sha, peeled)
+                continue
+            tags[name[len("refs/tags/"):]] = (sha, self._peel_loose(sha))
+        # objects we could not peel are likely packed, ask git about them over a single session
+        unpeeled: List[str] = sorted({sha for sha, peeled in tags.values() if peeled is None})
+        if unpeeled:
+            session: GitSession = GitSession.get(self._path)
+            peeled_map: Dict[str, str] = {}
+            for sha in unpeeled:
+                header: Optional[Tuple[str, str, int]] = session.resolve(f"{sha}^{{}}")
+                if header is None:
+                    raise GitReaderError(f"Object '{sha}' not found")
+                peeled_map[sha] = header[0]
+            tags = {name: (sha, peeled or peeled_map[sha]) for name, (sha, peeled) in tags.items()}
+        # noinspection PyTypeChecker
+        return tags
+
+    def config(self) -> Dict[str, Dict[str, str]]:
+        """
+        Returns:
+            The repository configuration as a dictionary mapping sections (e.g., 'remote "origin"') to
+            key-value pairs. Only the last value is kept for multi-valued keys.
+        """
+        if self._config is None:
+            self._config = self._parse_config(os.path.join(self._commondir, "config"))
+        return self._config
+
+    def remote_url(self, remote: str = "origin") -> Optional[str]:
+        return self.config().get(f'remote "{remote}"', {}).get("url", None)
+
+    def _peel_loose(self, sha: str) -> Optional[str]:
+        # follow annotated tags stored as loose objects until we get to a non-tag object
+        for _ in range(5):
+            obj_fpath: str = os.path.join(self._commondir, "objects", sha[:2], sha[2:])
+            if not os.path.isfile(obj_fpath):
+                return None
+            with open(obj_fpath, "rb") as fin:
+                # the header and the first line of a tag object fit well within the first chunk
+                data: bytes = zlib.decompressobj().decompress(fin.read(4096), 1024)
+            header, _, body = data.partition(b"\0")
+            if not header.startswith(b"tag "):
+                return sha
+            first_line: bytes = body.split(b"\n", 1)[0]
+            if not first_line.startswith(b"object "):
+                raise GitReaderError(f"Malformed tag object '{sha}'")
+            sha = first_line[len(b"object "):].decode("ascii")
+        return None
+
+    def _assert_files_backend(self):
+        if os.path.isdir(os.path.join(self._commondir, "reftable")):
+            raise GitReaderError("Repositories using the 'reftable' backend are not supported")
+
+    @staticmethod
+    def _find_gitdir(path: str) -> str:
+        dotgit: str = os.path.join(path, ".git")
+        if os.path.isdir(dotgit):
+            return dotgit
+        if os.path.isfile(dotgit):
+            # worktrees and submodules use a '.git' file pointing to the actual git directory
+            with open(dotgit, "rt") as fin:
+                content: str = fin.read().strip()
+            if content.startswith("gitdir:"):
+                return os.path.normpath(os.path.join(path, content[len("gitdir:"):].strip()))
+        raise GitReaderError(f"No git directory found in '{path}'")
+
+    @staticmethod
+    def _parse_config(fpath: str) -> Dict[str, Dict[str, str]]:
+        config: Dict[str, Dict[str, str]] = {}
+        if not os.path.isfile(fpath):
+            return config
+        section: Optional[Dict[str, str]] = None
+        with open(fpath, "rt") as fin:
+            lines: List[str] = fin.read().splitlines()
+        i: int = 0
+        while i < len(lines):
+            line: str = lines[i].strip()
+            i += 1
+            # join continuation lines
+            while line.endswith("\\") and i < len(lines):
+                line = line[:-1] + lines[i].strip()
+                i += 1
+            if not line or line[0] in "#;":
+                continue
+            if line.startswith("["):
+                header, _, rest = line[1:].partition("]")
+                # anything after the header is a key-value pair on the same line
+                line = rest.strip()
+                header = header.strip()
+                if '"' in header:
+                    name, _, sub = header.partition(" ")
+                    sub = sub.strip()[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+                    header = f'{name.lower()} "{sub}"'
+                elif "." in header:
+                    # deprecated [section.subsection] syntax
+                    name, _, sub = header.partition(".")
+                    header = f'{name.lower()} "{sub}"'
+                else:
+                    header = header.lower()
+                if header.startswith("include"):
+                    raise GitReaderError("Git configurations using includes are not supported")
+                section = config.setdefault(header, {})
+                if not line or line[0] in "#;":
+                    continue
+            if section is None:
+                raise GitReaderError(f"Malformed git configuration file '{fpath}'")
+            key, eq, value = line.partition("=")
+            section[key.strip().lower()] = GitRepository._parse_config_value(value) if eq else "true"
+        return config
+
+    @staticmethod
+    def _parse_config_value(value: str) -> str:
+        out: List[str] = []
+        quoted: bool = False
+        escape: bool = False
+        for c in value.strip():
+            if escape:
+                out.append({"n": "\n", "t": "\t", "b": "\b"}.get(c, c))
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                quoted = not quoted
+            elif c in "#;" and not quoted:
+                break
+            else:
+                out.append(c)
+        return "".join(out).strip()
+
+
+READER_ERRORS = (GitReaderError, OSError, UnicodeDecodeError, zlib.error)
+
+
+class GitSession:
+    """
+    Long-lived `git cat-file --batch-check` and `git cat-file --batch` processes attached to a repository.
+
+    Revisions are resolved and objects are read by writing to the standard input of those processes, repeated
+    queries against the same repository cost a round-trip over a pipe instead of a new process each.
+    Sessions are pooled per repository (see `GitSession.get`) and they shut down their processes after
+    being idle for `IDLE_TIMEOUT_SECS` seconds, the processes are started again on the next query.
+    """
+
+    IDLE_TIMEOUT_SECS: float = 30.0
+
+    _pool: Dict[str, 'GitSession'] = {}
+    _pool_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, path: str, idle_timeout: Optional[float] = None):
+        self._path: str = os.path.abspath(path)
+        self._idle_timeout: float = idle_timeout if idle_timeout is not None else self.IDLE_TIMEOUT_SECS
+        self._lock: threading.RLock = threading.RLock()
+        self._procs: Dict[str, subprocess.Popen] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._last_used: float = 0.0
+        self.queries: int = 0
+
+    @classmethod
+    def get(cls, path: str) -> 'GitSession':
+        """
+        Returns:
+            The pooled session for the repository at the given path.
+        """
+        path = os.path.abspath(path)
+        with cls._pool_lock:
+            if path not in cls._pool:
+                cls._pool[path] = GitSession(path)
+            return cls._pool[path]
+
+    @classmethod
+    def close_all(cls):
+        with cls._pool_lock:
+            sessions: List[GitSession] = list(cls._pool.values())
+            cls._pool.clear()
+        for session in sessions:
+            session.close()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def is_running(self) -> bool:
+        return len(self._procs) > 0
+
+    def resolve(self, rev: str) -> Optional[Tuple[str, str, int]]:
+        """
+        Resolves a revision (e.g., 'HEAD', 'v1.0.0^{}', 'HEAD:README.md') without reading the object.
+
+        Returns:
+            A tuple (sha, type, size) or None if the revision does not exist.
+        """
+        with self._lock:
+            header: Optional[Tuple[str, str, int]] = self._query("--batch-check", rev)
+            self._touch()
+            return header
+
+    def read(self, rev: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Returns:
+            A tuple (type, content) for the object the given revision points to, None if it does not exist.
+        """
+        with self._lock:
+            header: Optional[Tuple[str, str, int]] = self._query("--batch", rev)
+            content: Optional[bytes] = None
+            if header is not None:
+                # the content is followed by a new line
+                content = self._procs["--batch"].stdout.read(header[2] + 1)[:-1]
+                if len(content) != header[2]:
+                    self._stop("--batch")
+                    raise GitReaderError(f"Unexpected end of stream while reading '{rev}'")
+            self._touch()
+            return (header[1], content) if header is not None else None
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            for mode in list(self._procs):
+                self._stop(mode)
+
+    def _query(self, mode: str, rev: str) -> Optional[Tuple[str, str, int]]:
+        if "\n" in rev:
+            raise ValueError("Revisions cannot contain new lines")
+        proc: subprocess.Popen = self._procs.get(mode, None)
+        if proc is None or proc.poll() is not None:
+            proc = subprocess.Popen(
+                ["git", "-C", self._path, "cat-file", mode],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            self._procs[mode] = proc
+        self.queries += 1
+        try:
+            proc.stdin.write(rev.encode("utf-8") + b"\n")
+            proc.stdin.flush()
+            line: str = proc.stdout.readline().decode("utf-8").rstrip("\n")
+        except (BrokenPipeError, OSError):
+            line = ""
+        if not line:
+            self._stop(mode)
+            raise GitReaderError(f"The git session for '{self._path}' terminated unexpectedly")
+        parts: List[str] = line.split(" ")
+        if len(parts) != 3 or not SHA_PATTERN.match(parts[0]):
+            # '<rev> missing' or '<rev> ambiguous'
+            return None
+        return parts[0], parts[1], int(parts[2])
+
+    def _stop(self, mode: str):
+        proc: Optional[subprocess.Popen] = self._procs.pop(mode, None)
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+    def _touch(self):
+        self._last_used = time.monotonic()
+        if self._timer is None:
+            self._arm(self._idle_timeout)
+
+    def _arm(self, delay: float):
+        self._timer = threading.Timer(delay, self._on_idle)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_idle(self):
+        with self._lock:
+            self._timer = None
+            idle: float = time.monotonic() - self._last_used
+            if idle < self._idle_timeout:
+                # used since the timer was armed
+                self._arm(self._idle_timeout - idle)
+                return
+            for mode in list(self._procs):
+                self._stop(mode)
+
+
+atexit.register(GitSession.close_all)
+
+
+class TagIndex:
+    """
+    Persistent index answering, for a given commit, "which tag is exactly at this commit" and
+    "which is the closest tag reachable from this commit" (as `git describe --tags` would).
+
+    The index is stored in the cache (one entry per git common directory) and is validated by the stat
+    signature of `packed-refs` and of the `refs/tags` directories, so that tags are only enumerated again
+    when they change.
+    """
+
+    _cache: FileCache = FileCache("tags")
+    # maximum number of commits for which we remember the closest tag
+    MAX_COMMITS: int = 256
+
+    def __init__(self, reader: GitRepository):
+        self._reader: GitRepository = reader
+        self._key: str = os.path.realpath(reader.commondir)
+        self._fingerprint: Optional[Fingerprint] = None
+        self._data: Optional[dict] = None
+        self._dirty: bool = False
+
+    def describe(self, sha: str) -> Tuple[str, str]:
+        """
+        Returns:
+            A tuple (exact_tag, closest_tag) for the given commit. Tags that cannot be found are 'ND'.
+        """
+        if sha == "ND":
+            return "ND", "ND"
+        data: dict = self._load()
+        # exact tag (this does not need to talk to git, unless there are many to choose from)
+        exact: List[str] = data["tags"].get(sha, [])
+        # closest tag (this needs to walk the history, we let git do it), with many tags on the same commit
+        # git picks the newest annotated one, we let git do that too
+        closest: Optional[str] = exact[0] if len(exact) == 1 else data["closest"].get(sha, None)
+        if closest is None:
+            closest = _describe_cli(self._reader.path, sha)[1] if data["tags"] else "ND"
+            data["closest"][sha] = closest
+            # keep the index bounded, oldest entries go first
+            while len(data["closest"]) > self.MAX_COMMITS:
+                del data["closest"][next(iter(data["closest"]))]
+            self._dirty = True
+        if self._dirty:
+            self._save()
+        return (closest if exact else "ND"), closest
+
+    def fingerprint(self) -> Fingerprint:
+        if self._fingerprint is None:
+            commondir: str = self._reader.commondir
+            # tags are written with a rename, that updates the mtime of the directory containing them
+            fpaths: List[str] = [os.path.join(commondir, "packed-refs")] + \
+                [root for root, _, _ in os.walk(os.path.join(commondir, "refs", "tags"))]
+            self._fingerprint = stat_signature(fpaths, root=commondir)
+        return self._fingerprint
+
+    def _load(self) -> dict:
+        if self._data is not None:
+            return self._data
+        fingerprint: Fingerprint = self.fingerprint()
+        data: Optional[dict] = self._cache.get(self._key, fingerprint)
+        if isinstance(data, dict) and "tags" in data and "closest" in data:
+            self._data = data
+            return data
+        # (re)build the index
+        tags: Dict[str, Tuple[str, str]] = self._reader.tags()
+        by_commit: Dict[str, List[str]] = {}
+        for name in sorted(tags):
+            by_commit.setdefault(tags[name][1], []).append(name)
+        self._data = {"tags": by_commit, "closest": {}}
+        self._dirty = True
+        return self._data
+
+    def _save(self):
+        self._dirty = False
+        # indices built right after the tags changed are not persisted
+        self._cache.put(self._key, self.fingerprint(), self._data)
+
+
+class RepositoryInfo:
+    """
+    Lazily computed information about the git repository at the given path.
+
+    Fields are computed on first access in groups that share the same source of information
+    (e.g., `head_version` and `closest_version` both need the list of tags) and then memoized.
+    """
+
+    GROUPS: Dict[str, Tuple[str, ...]] = {
+        "head": ("sha", "branch", "detached"),
+        "tags": ("head_version", "closest_version"),
+        "origin": ("name", "repository_url", "repository_page"),
+        "index": ("index_nmodified", "index_nadded"),
+    }
+    FIELDS: Dict[str, str] = {field: group for group, fields in GROUPS.items() for field in fields}
+    # groups that only depend on the content of the git directory can be persisted across processes,
+    # the state of the worktree cannot (editing a file does not touch the git directory)
+    CACHED_GROUPS: Tuple[str, ...] = ("head", "tags", "origin")
+
+    _cache: FileCache = FileCache("repo-info")
+
+    def __init__(self, path: str):
+        self._path: str = os.path.abspath(path)
+        self._reader: Optional[GitRepository] = None
+        self._fingerprint: Optional[Fingerprint] = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def reader(self) -> GitRepository:
+        if self._reader is None:
+            self._reader = GitRepository(self._path)
+        return self._reader
+
+    def fingerprint(self) -> Fingerprint:
+        """
+        Returns:
+            The stat signature of the files inside the git directory that the cached groups depend on.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = self._stat_gitdir()
+        return self._fingerprint
+
+    def refresh(self) -> Set[str]:
+        """
+        Computes again the fields that were already computed, if what they depend on changed since then.
+        Fields that depend on the git directory are only computed again if the git directory changed,
+        the state of the index is always computed again.
+
+        Returns:
+            The names of the fields whose value changed.
+        """
+        try:
+            fingerprint: Fingerprint = self._stat_gitdir()
+        except READER_ERRORS:
+            fingerprint = []
+        stale: bool = not fingerprint or fingerprint != self._fingerprint or is_racy(fingerprint)
+        groups: List[str] = [
+            group for group in self.GROUPS
+            if self.is_loaded(group) and (stale or group not in self.CACHED_GROUPS)
+        ]
+        old: dict = {field: self.__dict__.pop(field) for group in groups for field in self.GROUPS[group]}
+        if stale:
+            # the reader caches refs and config
+            self._reader = None
+            self._fingerprint = fingerprint
+        # groups are in order of dependency (e.g., tags need the sha)
+        for group in groups:
+            self._memoize(group, getattr(self, f"_load_{group}")())
+        return {field for field, value in old.items() if self.__dict__[field] != value}
+
+    def _stat_gitdir(self) -> Fingerprint:
+        return stat_signature(self.reader.state_paths())
+
+    def is_loaded(self, group: str) -> bool:
+        return all(field in self.__dict__ for field in self.GROUPS[group])
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            The fields computed so far, as plain values (e.g., to be sent to another process), see `restore`.
+        """
+        return {
+            field: self.__dict__[field]
+            for group in self.GROUPS if self.is_loaded(group)
+            for field in self.GROUPS[group]
+        }
+
+    def restore(self, values: dict):
+        """
+        Memoizes fields computed elsewhere (see `snapshot`), fields already computed here are kept.
+        """
+        for field, value in values.items():
+            if field in self.FIELDS:
+                self.__dict__.setdefault(field, value)
+
+    def as_dict(self) -> dict:
+        return {
+            "REPOSITORY": self.name,
+            "SHA": self.sha,
+            "BRANCH": self.branch,
+            "VERSION.HEAD": self.head_version,
+            "VERSION.CLOSEST": self.closest_version,
+            "ORIGIN.URL": self.repository_url,
+            "ORIGIN.HTTPS.URL": self.repository_page,
+            "INDEX_NUM_MODIFIED": self.index_nmodified,
+            "INDEX_NUM_ADDED": self.index_nadded,
+        }
+
+    def __getattr__(self, item):
+        # this is only called when the attribute was not computed yet
+        group: Optional[str] = self.FIELDS.get(item, None)
+        if group is None:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{item}'")
+        cached: bool = group in self.CACHED_GROUPS
+        if cached:
+            self._load_cache()
+            if item in self.__dict__:
+                return self.__dict__[item]
+        self._memoize(group, getattr(self, f"_load_{group}")())
+        return self.__dict__[item]
+
+    async def load_async(self):
+        """
+        Loads all the fields without blocking the event loop. Reads of the git directory (and of the persistent
+        cache) run in the default executor, git commands run as asyncio subprocesses, concurrently.
+        """
+        loop = asyncio.get_running_loop()
+        # the state of the index always needs a git command, start it right away
+        status = asyncio.ensure_future(_get_repo_status_cli_async(self._path)) \
+            if not self.is_loaded("index") else None
+        try:
+            # head, origin and whatever the reader can tell us about tags
+            await loop.run_in_executor(None, self._load_from_reader)
+            if not self.is_loaded("tags"):
+                head_tag, closest_tag = await _describe_cli_async(self._path, self.sha)
+                self._memoize("tags", {"head_version": head_tag, "closest_version": closest_tag})
+            if status is not None:
+                self._memoize("index", await status)
+        finally:
+            if status is not None and not status.done():
+                status.cancel()
+
+    def _memoize(self, group: str, values: dict):
+        # memoize the whole group (and whatever else came with it), values already computed are kept
+        for field, value in values.items():
+            self.__dict__.setdefault(field, value)
+        if group in self.CACHED_GROUPS:
+            self._save_cache()
+
+    def _load_from_reader(self):
+        # head and origin (these fall back to the CLI if needed)
+        _, _ = self.sha, self.name
+        if self.is_loaded("tags"):
+            return
+        try:
+            values: dict = self._read_tags()
+        except READER_ERRORS:
+            # left to the caller
+            return
+        self._memoize("tags", values)
+
+    def _load_cache(self):
+        """
+        Loads whatever the persistent cache knows about this repository (only the first time it is called).
+        """
+        if self._fingerprint is not None or not cache_enabled():
+            return
+        try:
+            values: Optional[dict] = self._cache.get(self.reader.gitdir, self.fingerprint())
+        except READER_ERRORS:
+            self._fingerprint = []
+            return
+        for field, value in (values or {}).items():
+            self.__dict__.setdefault(field, value)
+
+    def _save_cache(self):
+        if not self._fingerprint:
+            return
+        values: dict = {
+            field: self.__dict__[field]
+            for group in self.CACHED_GROUPS if self.is_loaded(group)
+            for field in self.GROUPS[group]
+        }
+        self._cache.put(self.reader.gitdir, self._fingerprint, values)
+
+    def _load_head(self) -> dict:
+        try:
+            sha, branch = self.reader.head()
+        except READER_ERRORS:
+            sha, branch = _get_repo_head_cli(self._path)
+        branch = branch or "HEAD"
+        return {"sha": sha or "ND", "branch": branch, "detached": branch == "HEAD"}
+
+    def _load_tags(self) -> dict:
+        try:
+            return self._read_tags()
+        except READER_ERRORS:
+            head_tag, closest_tag = _describe_cli(self._path, self.sha)
+        return {"head_version": head_tag, "closest_version": closest_tag}
+
+    def _read_tags(self) -> dict:
+        head_tag, closest_tag = TagIndex(self.reader).describe(self.sha)
+        return {"head_version": head_tag, "closest_version": closest_tag}
+
+    def _load_origin(self) -> dict:
+        try:
+            origin_url: Optional[str] = self.reader.remote_url("origin")
+        except READER_ERRORS:
+            origin_url = _get_repo_origin_cli(self._path)
+        repo_name: Optional[str] = None
+        if origin_url:
+            if origin_url.endswith(".git"):
+                origin_url = origin_url[:-4]
+            if origin_url.endswith("/"):
+                origin_url = origin_url[:-1]
+            repo_name = origin_url.split("/")[-1]
+        return {
+            "name": repo_name,
+            "repository_url": origin_url or "ND",
+            "repository_page": git_remote_url_to_https(origin_url) if origin_url else None,
+        }
+
+    def _load_index(self) -> dict:
+        # this also gives us the 'head' group for free
+        return _get_repo_status_cli(self._path)
+
+
+class RevisionInfo(RepositoryInfo):
+    """
+    Information about the git repository at the given path as it is at the given commit.
+
+    A commit has no worktree, so it is always clean. The branch is only known when the revision
+    was given as the name of a local branch.
+    """
+
+    # nothing to gain here, the head is given and the tag index is already persisted
+    CACHED_GROUPS: Tuple[str, ...] = ()
+
+    def __init__(self, path: str, sha: str, branch: Optional[str] = None):
+        super(RevisionInfo, self).__init__(path)
+        self._sha: str = sha
+        self._branch: Optional[str] = branch
+
+    def refresh(self) -> Set[str]:
+        # a commit never changes
+        return set()
+
+    def _load_head(self) -> dict:
+        return {"sha": self._sha, "branch": self._branch or "HEAD", "detached": self._branch is None}
+
+    def _load_index(self) -> dict:
+        return {"index_nmodified": 0, "index_nadded": 0}
+
+
+def get_repo_info(path: str) -> dict:
+    """
+    Collects information about the git repository at the given path.
+    Everything that can be read from the `.git` directory is read directly, the git CLI is used for
+    anything else (e.g., the state of the index) or whenever the repository layout is not supported.
+    """
+    return RepositoryInfo(path).as_dict()
+
+
+def git(path: str, *args: str, check: bool = False) -> CommandResult:
+    """
+    Runs a git command against the repository at the given path.
+    """
+    return run(["git", "-C", path, *args], timeout=GIT_TIMEOUT_SECS, check=check)
+
+
+def _get_repo_head_cli(path: str) -> Tuple[str, str]:
+    # get current SHA
+    res: CommandResult = git(path, "rev-parse", "--verify", "--quiet", "HEAD")
+    if res.returncode == 1:
+        # no commits yet
+        sha = "ND"
+    else:
+        sha = res.check().lines[0]
+    # get branch name
+    res = git(path, "branch", "--show-current")
+    if not res.ok or not res.lines:
+        # try an older syntax (e.g., Macs are still using an old version of 'git'), this also covers detached HEADs
+        res = git(path, "rev-parse", "--abbrev-ref", "HEAD")
+        if not res.ok:
+            raise RuntimeError("We could not retrieve the name of the branch for the repository at "
+                               f"'{path}'")
+    return sha, res.lines[0]
+
+
+def _describe_cli(path: str, sha: str) -> Tuple[str, str]:
+    """
+    Returns:
+        A tuple (exact_tag, closest_tag) as computed by `git describe`, tags that cannot be found are 'ND'.
+    """
+    if sha == "ND":
+        # there is no HEAD
+        return "ND", "ND"
+    return _parse_describe(git(path, *_describe_args(sha)))
+
+
+async def _describe_cli_async(path: str, sha: str) -> Tuple[str, str]:
+    if sha == "ND":
+        return "ND", "ND"
+    return _parse_describe(await run_async(["git", "-C", path, *_describe_args(sha)], timeout=GIT_TIMEOUT_SECS))
+
+
+def _describe_args(sha: str) -> List[str]:
+    return ["describe", "--tags", "--long", "--abbrev=40", sha]
+
+
+def _parse_describe(res: CommandResult) -> Tuple[str, str]:
+    if not res.ok:
+        # no tags reachable from this commit
+        return "ND", "ND"
+    # a long description looks like '<tag>-<distance>-g<sha>', the tag itself can contain dashes
+    tag, distance, _ = res.lines[0].rsplit("-", 2)
+    return (tag if distance == "0" else "ND"), tag
+
+
+def _get_repo_origin_cli(path: str) -> Optional[str]:
+    res: CommandResult = git(path, "config", "--get", "remote.origin.url")
+    if res.returncode == 1:
+        # the key does not exist
+        return None
+    return res.check().lines[0]
+
+
+def _get_repo_status_cli(path: str) -> dict:
+    """
+    Runs a single `git status --porcelain=v2 --branch` and parses its output as it is produced.
+    This gives us HEAD, branch and the state of the index/worktree with a single scan of the worktree.
+    """
+    cmd: List[str] = ["git", "-C", path, "status", "--porcelain=v2", "--branch"]
+    return _parse_repo_status(stream(cmd, timeout=GIT_TIMEOUT_SECS))
+
+
+async def _get_repo_status_cli_async(path: str) -> dict:
+    cmd: List[str] = ["git", "-C", path, "status", "--porcelain=v2", "--branch"]
+    res: CommandResult = await run_async(cmd, timeout=GIT_TIMEOUT_SECS, check=True)
+    return _parse_repo_status(res.stdout.split("\n"))
+
+
+def _parse_repo_status(lines: Iterable[str]) -> dict:
+    sha, branch = "ND", "HEAD"
+    nmodified, nadded = 0, 0
+    for line in lines:
+        if not line:
+            continue
+        kind: str = line[0]
+        if kind == "#":
+            _, key, value = line.split(" ", 2)
+            if key == "branch.oid" and value != "(initial)":
+                sha = value
+            elif key == "branch.head" and value != "(detached)":
+                branch = value
+            continue
+        if kind == "1":
+            fpath: str = line.split(" ", 8)[-1]
+        elif kind == "2":
+            fpath: str = line.split(" ", 9)[-1].split("\t")[0]
+        elif kind == "u":
+            fpath: str = line.split(" ", 10)[-1]
+        elif kind == "?":
+            fpath: str = line[2:]
+        else:
+            continue
+        # untracked files do not count as modified
+        if kind != "?":
+            nmodified += 1
+        # we are not counting files with .resolved extension
+        if not fpath.endswith(".resolved"):
+            nadded += 1
+    return {
+        "sha": sha,
+        "branch": branch,
+        "detached": branch == "HEAD",
+        "index_nmodified": nmodified,
+        "index_nadded": nadded,
+    }
@@ -0,0 +1,122 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+from typing import Optional, List, Tuple
+
+# event masks, see inotify(7)
+IN_MODIFY: int = 0x00000002
+IN_ATTRIB: int = 0x00000004
+IN_CLOSE_WRITE: int = 0x00000008
+IN_MOVED_FROM: int = 0x00000040
+IN_MOVED_TO: int = 0x00000080
+IN_CREATE: int = 0x00000100
+IN_DELETE: int = 0x00000200
+IN_DELETE_SELF: int = 0x00000400
+IN_MOVE_SELF: int = 0x00000800
+IN_Q_OVERFLOW: int = 0x00004000
+IN_IGNORED: int = 0x00008000
+IN_ONLYDIR: int = 0x01000000
+IN_ISDIR: int = 0x40000000
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+_EVENT_HEADER: struct.Struct = struct.Struct("iIII")
+
+
+class InotifyError(OSError):
+    pass
+
+
+def inotify_available() -> bool:
+    """
+    Returns:
+        Whether inotify can be used on this system.
+    """
+    try:
+        Inotify().close()
+    except (InotifyError, OSError, AttributeError):
+        return False
+    return True
+
+
+class Inotify:
+    """
+    Minimal wrapper around the inotify API of the Linux kernel, through the C library.
+
+    Raises:
+        InotifyError: if inotify is not available (e.g., not on Linux) or cannot be initialized
+    """
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise InotifyError("inotify is only available on Linux")
+        libc_name: Optional[str] = ctypes.util.find_library("c")
+        try:
+            self._libc = ctypes.CDLL(libc_name or "libc.so.6", use_errno=True)
+            self._libc.inotify_init1.argtypes = [ctypes.c_int]
+            self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        except (OSError, AttributeError) as e:
+            raise InotifyError(f"inotify not found in the C library: {e}")
+        fd: int = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno: int = ctypes.get_errno()
+            raise InotifyError(errno, f"inotify_init1: {os.strerror(errno)}")
+        self._fd: Optional[int] = fd
+
+    @property
+    def fd(self) -> int:
+        return self._fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """
+        Returns:
+            The watch descriptor, watching the same inode twice returns the same descriptor.
+        """
+        wd: int = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno: int = ctypes.get_errno()
+            raise InotifyError(errno, f"inotify_add_watch: {os.strerror(errno)}", path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        # the watch might be gone already (e.g., the directory was deleted)
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self, timeout: Optional[float] = None) -> List[Tuple[int, int, str]]:
+        """
+        Waits at most `timeout` seconds (forever if None) for events.
+
+        Returns:
+            A list of events (wd, mask, name), empty on timeout.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data: bytes = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events: List[Tuple[int, int, str]] = []
+        i: int = 0
+        while i + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, i)
+            i += _EVENT_HEADER.size
+            name: str = os.fsdecode(data[i:i + length].rstrip(b"\0"))
+            i += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
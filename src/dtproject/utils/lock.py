@@ -0,0 +1,145 @@
+import collections
+import dataclasses
+import os
+import threading
+import time
+from typing import Optional, Deque, Dict
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, locks only work across threads there
+    fcntl = None
+
+# number of recent acquisitions we keep track of
+HISTORY_SIZE: int = 256
+
+
+@dataclasses.dataclass
+class LockRecord:
+    path: str
+    # seconds spent waiting for the lock
+    wait: float
+
+
+class LockStats:
+    """
+    Keeps track of the locks acquired through this module and of the time spent waiting for them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions: int = 0
+        self.total_wait: float = 0.0
+        self.history: Deque[LockRecord] = collections.deque(maxlen=HISTORY_SIZE)
+
+    def record(self, path: str, wait: float):
+        with self._lock:
+            self.acquisitions += 1
+            self.total_wait += wait
+            self.history.append(LockRecord(path, wait))
+
+    def by_path(self) -> Dict[str, float]:
+        """
+        Returns:
+            Total time spent waiting in the recent history, grouped by lock file.
+        """
+        waits: Dict[str, float] = collections.defaultdict(float)
+        with self._lock:
+            for record in self.history:
+                waits[record.path] += record.wait
+        return dict(waits)
+
+    def reset(self):
+        with self._lock:
+            self.acquisitions = 0
+            self.total_wait = 0.0
+            self.history.clear()
+
+
+stats: LockStats = LockStats()
+
+# fallback for systems without fcntl
+_thread_locks: Dict[str, threading.Lock] = collections.defaultdict(threading.Lock)
+
+
+class FileLock:
+    """
+    Exclusive lock on the given file, shared across processes (through `flock`) and threads.
+    Locks are not reentrant, the lock file is created if it does not exist and never deleted.
+
+    Args:
+        fpath: path to the lock file
+        timeout: seconds to wait for the lock before raising TimeoutError, None to wait forever
+    """
+
+    POLL_INTERVAL_SECS: float = 0.05
+
+    def __init__(self, fpath: str, timeout: Optional[float] = None):
+        self._fpath: str = os.path.abspath(fpath)
+        self._timeout: Optional[float] = timeout
+        self._fd: Optional[int] = None
+        self._wait: float = 0.0
+
+    @property
+    def path(self) -> str:
+        return self._fpath
+
+    @property
+    def wait(self) -> float:
+        """
+        Seconds spent waiting for the lock the last time it was acquired.
+        """
+        return self._wait
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> float:
+        """
+        Returns:
+            The number of seconds spent waiting for the lock.
+        """
+        os.makedirs(os.path.dirname(self._fpath), exist_ok=True)
+        fd: int = os.open(self._fpath, os.O_RDWR | os.O_CREAT | getattr(os, "O_CLOEXEC", 0), 0o644)
+        stime: float = time.monotonic()
+        try:
+            if fcntl is None:
+                if not _thread_locks[self._fpath].acquire(timeout=-1 if self._timeout is None else self._timeout):
+                    raise TimeoutError(f"Timed out waiting for the lock '{self._fpath}'")
+            elif self._timeout is None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() - stime >= self._timeout:
+                            raise TimeoutError(f"Timed out waiting for the lock '{self._fpath}'")
+                        time.sleep(self.POLL_INTERVAL_SECS)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._wait = time.monotonic() - stime
+        stats.record(self._fpath, self._wait)
+        return self._wait
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is None:
+            _thread_locks[self._fpath].release()
+        # closing the file releases the lock
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
@@ -1,9 +1,9 @@
 import os
 import re
-import subprocess
-from typing import List
+from typing import List, Optional
 
 from ..constants import DOCKER_LABEL_DOMAIN, CANONICAL_ARCH
+from .process import run
 
 
 class ddict(dict):
@@ -26,9 +26,12 @@ class ddict(dict):
         return self.__getitem__(__key)
 
 
-def run_cmd(cmd):
-    cmd = " ".join(cmd)
-    return [line for line in subprocess.check_output(cmd, shell=True).decode("utf-8").split("\n") if line]
+def run_cmd(cmd: List[str], timeout: Optional[float] = None) -> List[str]:
+    """
+    Runs the given command (without a shell) and returns the non-empty lines of its output.
+    Raises subprocess.CalledProcessError if the command fails.
+    """
+    return run(cmd, timeout=timeout, check=True).lines
 
 
 def dtlabel(key, value=None):
@@ -75,9 +78,12 @@ def load_dependencies_file(fpath: str, comments: bool = False) -> List[str]:
         return []
     # load deps
     with open(fpath, "rt") as fin:
-        deps: List[str] = fin.readlines()
-    # remove new line chars
-    deps = list(map(lambda s: s.strip(), deps))
+        return parse_dependencies(fin.read(), comments=comments)
+
+
+def parse_dependencies(content: str, comments: bool = False) -> List[str]:
+    # one dependency per line, remove new line chars
+    deps: List[str] = list(map(lambda s: s.strip(), content.splitlines()))
     # filter deps from comments
     if not comments:
         # remove empty lines
@@ -0,0 +1,232 @@
+import asyncio
+import collections
+import dataclasses
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, Optional, Iterator, Deque, Dict
+
+# number of recent calls we keep track of
+HISTORY_SIZE: int = 256
+
+
+class CommandError(subprocess.CalledProcessError):
+    """
+    Same as subprocess.CalledProcessError, the error output of the command is part of the message.
+    """
+
+    def __str__(self) -> str:
+        message: str = super(CommandError, self).__str__()
+        stderr = self.stderr.decode("utf-8", "replace") if isinstance(self.stderr, bytes) else self.stderr
+        return f"{message} {stderr.strip()}" if stderr and stderr.strip() else message
+
+
+@dataclasses.dataclass
+class CommandResult:
+    args: List[str]
+    returncode: int
+    stdout: str
+    stderr: str
+    # wall time in seconds
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+    @property
+    def lines(self) -> List[str]:
+        return [line for line in self.stdout.split("\n") if line]
+
+    def check(self) -> 'CommandResult':
+        if self.returncode != 0:
+            raise CommandError(self.returncode, self.args, self.stdout, self.stderr)
+        return self
+
+
+@dataclasses.dataclass
+class CommandRecord:
+    args: List[str]
+    returncode: Optional[int]
+    duration: float
+
+
+class CommandStats:
+    """
+    Keeps track of the commands executed through this module and of the time spent waiting for them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: int = 0
+        self.total_time: float = 0.0
+        self.history: Deque[CommandRecord] = collections.deque(maxlen=HISTORY_SIZE)
+
+    def record(self, args: List[str], returncode: Optional[int], duration: float):
+        with self._lock:
+            self.calls += 1
+            self.total_time += duration
+            self.history.append(CommandRecord(list(args), returncode, duration))
+
+    def by_command(self) -> Dict[str, float]:
+        """
+        Returns:
+            Total time spent in the recent history, grouped by command (e.g., 'git status').
+        """
+        times: Dict[str, float] = collections.defaultdict(float)
+        with self._lock:
+            for record in self.history:
+                times[" ".join(_command_name(record.args))] += record.duration
+        return dict(times)
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.total_time = 0.0
+            self.history.clear()
+
+
+stats: CommandStats = CommandStats()
+
+
+def run(
+    args: List[str],
+    *,
+    cwd: Optional[str] = None,
+    timeout: Optional[float] = None,
+    check: bool = False,
+    input: Optional[str] = None,
+) -> CommandResult:
+    """
+    Executes the given command directly (no shell involved) and collects its output.
+
+    Args:
+        args: the command and its arguments
+        cwd: working directory for the command
+        timeout: seconds after which the command is killed and subprocess.TimeoutExpired is raised
+        check: raise subprocess.CalledProcessError if the command fails
+        input: text to send to the standard input of the command
+
+    Returns:
+        A CommandResult carrying return code, stdout, stderr and wall time of the call.
+    """
+    stime: float = time.monotonic()
+    returncode: Optional[int] = None
+    duration: float = 0.0
+    try:
+        proc = subprocess.run(
+            args,
+            cwd=cwd,
+            timeout=timeout,
+            input=input.encode("utf-8") if input is not None else None,
+            stdin=subprocess.DEVNULL if input is None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        returncode = proc.returncode
+    finally:
+        duration = time.monotonic() - stime
+        stats.record(args, returncode, duration)
+    result = CommandResult(
+        args=list(args),
+        returncode=proc.returncode,
+        stdout=proc.stdout.decode("utf-8"),
+        stderr=proc.stderr.decode("utf-8"),
+        duration=duration,
+    )
+    return result.check() if check else result
+
+
+async def run_async(
+    args: List[str],
+    *,
+    cwd: Optional[str] = None,
+    timeout: Optional[float] = None,
+    check: bool = False,
+) -> CommandResult:
+    """
+    Same as `run` for asyncio, the command runs as an asyncio subprocess so that the event loop is
+    free to do other things (e.g., run other commands) while we wait.
+    """
+    stime: float = time.monotonic()
+    returncode: Optional[int] = None
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *args, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise subprocess.TimeoutExpired(args, timeout)
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+        returncode = proc.returncode
+    finally:
+        duration: float = time.monotonic() - stime
+        stats.record(args, returncode, duration)
+    result = CommandResult(
+        args=list(args),
+        returncode=returncode,
+        stdout=stdout.decode("utf-8"),
+        stderr=stderr.decode("utf-8"),
+        duration=duration,
+    )
+    return result.check() if check else result
+
+
+def stream(args: List[str], *, cwd: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[str]:
+    """
+    Executes the given command directly (no shell involved) and yields the lines of its output as they are
+    produced. Raises subprocess.CalledProcessError if the command fails, once its output is exhausted.
+    """
+    stime: float = time.monotonic()
+    # stderr goes to a file so that a chatty command cannot block on a full pipe while we read stdout
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(args, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=stderr_file)
+        expired = threading.Event()
+
+        def _kill():
+            expired.set()
+            proc.kill()
+
+        timer: Optional[threading.Timer] = threading.Timer(timeout, _kill) if timeout is not None else None
+        if timer is not None:
+            timer.start()
+        returncode: Optional[int] = None
+        try:
+            with proc.stdout:
+                for line in proc.stdout:
+                    yield line.decode("utf-8").rstrip("\n")
+            returncode = proc.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if returncode is None:
+                # the consumer stopped early
+                proc.kill()
+                proc.wait()
+            stats.record(args, returncode, time.monotonic() - stime)
+        stderr_file.seek(0)
+        stderr: str = stderr_file.read().decode("utf-8")
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(args, timeout, stderr=stderr)
+    if returncode != 0:
+        raise CommandError(returncode, args, stderr=stderr)
+
+
+def _command_name(args: List[str]) -> List[str]:
+    # 'git -C <path> status ...' -> ['git', 'status']
+    name: List[str] = [args[0]] if args else []
+    rest: List[str] = list(args[1:])
+    while rest and rest[0].startswith("-"):
+        option: str = rest.pop(0)
+        # options taking a value
+        if option in ["-C", "-c"] and rest:
+            rest.pop(0)
+    return name + rest[:1]
@@ -0,0 +1,23 @@
+from typing import Union, TextIO, Any, Type
+
+import yaml
+
+# use the libyaml bindings when PyYAML was built with them, they are an order of magnitude faster
+try:
+    from yaml import CSafeLoader as SafeLoader
+    LIBYAML: bool = True
+except ImportError:
+    from yaml import SafeLoader
+    LIBYAML: bool = False
+
+
+def safe_load(stream: Union[str, bytes, TextIO], loader: Type[yaml.SafeLoader] = SafeLoader) -> Any:
+    """
+    Same as `yaml.safe_load` but backed by libyaml when available.
+    """
+    return yaml.load(stream, Loader=loader)
+
+
+def safe_load_file(fpath: str, loader: Type[yaml.SafeLoader] = SafeLoader) -> Any:
+    with open(fpath, "rt") as fin:
+        return safe_load(fin, loader=loader)
@@ -0,0 +1,358 @@
+import dataclasses
+import os
+import time
+import zlib
+from typing import Optional, Dict, List, Set, Tuple, Union, Iterable, Iterator
+
+from .dtproject import DTProject
+from .utils.cache import RACY_WINDOW_SECS
+from .utils.git import GitRepository, READER_ERRORS
+from .utils.inotify import Inotify, inotify_available, IN_CLOSE_WRITE, IN_MOVED_TO, IN_MOVED_FROM, \
+    IN_CREATE, IN_DELETE, IN_ATTRIB, IN_DELETE_SELF, IN_MOVE_SELF, IN_ONLYDIR, IN_IGNORED, IN_Q_OVERFLOW
+
+# kinds of events
+# - a layer was added, removed or modified (name: the layer, '.dtproject' for projects v1 to v3)
+LAYER_CHANGED: str = "layer"
+# - a dependencies file was added, removed or modified (name: the file, e.g., 'dependencies-apt.txt')
+DEPENDENCIES_CHANGED: str = "dependencies"
+# - the Dockerfile was added, removed or modified
+DOCKERFILE_CHANGED: str = "dockerfile"
+# - a launcher was added, removed or modified (name: the file inside 'launchers/')
+LAUNCHERS_CHANGED: str = "launchers"
+# - HEAD points somewhere else, i.e., a different branch or a different commit when detached
+#   (name: the branch, None if detached)
+BRANCH_CHANGED: str = "branch"
+# - the git index was written (e.g., files were staged or committed)
+INDEX_CHANGED: str = "index"
+
+
+@dataclasses.dataclass(frozen=True)
+class ProjectEvent:
+    """
+    Something changed in a watched project.
+
+    Attributes:
+        path: absolute path to the project
+        kind: what changed, one of the *_CHANGED constants in this module
+        name: which one changed, for kinds that have more than one (e.g., the name of the layer)
+    """
+    path: str
+    kind: str
+    name: Optional[str] = None
+
+
+# path to the file, inode, size, mtime, and digest of the content for files that changed too recently for
+# their stat to be trusted
+_Entry = Tuple[str, int, int, int, Optional[int]]
+
+
+class ProjectWatcher:
+    """
+    Watches a set of projects and reports what changed in them as typed events (see ProjectEvent).
+
+    Watched files are the layers (`dtproject/*.yaml`), `.dtproject`, the dependencies files
+    (`dependencies-*.txt`), the `Dockerfile`, the files inside `launchers/`, and the git HEAD and index.
+
+    On Linux, the inotify backend only looks at the projects the kernel reported activity for, anywhere
+    else (or with `backend='polling'`) all projects are scanned every `interval` seconds. In both cases
+    events are computed by comparing the stat of the watched files against the previous scan.
+
+    Args:
+        projects: projects (or paths to projects) to watch
+        backend: either 'inotify' or 'polling', defaults to 'inotify' when available
+        interval: seconds between two scans of all projects, only used by the polling backend
+
+    A watcher is not thread-safe, it is meant to be consumed from a single thread.
+    """
+
+    def __init__(self, projects: Iterable[Union[DTProject, str]] = (), *, backend: Optional[str] = None,
+                 interval: float = 1.0):
+        if backend is None:
+            backend = "inotify" if inotify_available() else "polling"
+        if backend == "inotify":
+            self._backend: Union[_InotifyBackend, _PollingBackend] = _InotifyBackend()
+        elif backend == "polling":
+            self._backend = _PollingBackend(interval)
+        else:
+            raise ValueError(f"Unknown watcher backend '{backend}', use either 'inotify' or 'polling'.")
+        self.projects: Dict[str, Optional[DTProject]] = {}
+        self._snapshots: Dict[str, Dict[str, _Entry]] = {}
+        self._heads: Dict[str, Optional[str]] = {}
+        for project in projects:
+            self.add(project)
+
+    @property
+    def backend(self) -> str:
+        return self._backend.name
+
+    def add(self, project: Union[DTProject, str]):
+        """
+        Starts watching the given project (or path to a project).
+        """
+        path: str = os.path.abspath(project.path if isinstance(project, DTProject) else project)
+        self.projects[path] = project if isinstance(project, DTProject) else None
+        gitdir: Optional[str] = _gitdir(path)
+        # start watching before taking the snapshot, so that nothing happening in between goes unnoticed
+        self._backend.watch(path, gitdir)
+        self._snapshots[path] = _snapshot(path, gitdir)
+        self._heads[path] = _read_head(gitdir)
+
+    def remove(self, project: Union[DTProject, str]):
+        """
+        Stops watching the given project (or path to a project).
+        """
+        path: str = os.path.abspath(project.path if isinstance(project, DTProject) else project)
+        self._backend.unwatch(path)
+        self.projects.pop(path, None)
+        self._snapshots.pop(path, None)
+        self._heads.pop(path, None)
+
+    def poll(self, timeout: Optional[float] = 0) -> List[ProjectEvent]:
+        """
+        Waits at most `timeout` seconds (forever if None) for something to change.
+
+        Returns:
+            The events since the last call, empty if nothing changed before the timeout.
+        """
+        deadline: Optional[float] = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining: Optional[float] = None if deadline is None else max(0.0, deadline - time.monotonic())
+            events: List[ProjectEvent] = self._scan(self._backend.wait(set(self._snapshots), remaining))
+            if events or (deadline is not None and time.monotonic() >= deadline):
+                return events
+
+    def __iter__(self) -> Iterator[ProjectEvent]:
+        while True:
+            for event in self.poll(None):
+                yield event
+
+    def close(self):
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _scan(self, paths: Set[str]) -> List[ProjectEvent]:
+        events: List[ProjectEvent] = []
+        for path in sorted(paths):
+            if path not in self._snapshots:
+                continue
+            gitdir: Optional[str] = _gitdir(path)
+            # directories might have been created since the last time (e.g., 'launchers/', '.git/')
+            self._backend.watch(path, gitdir)
+            snapshot: Dict[str, _Entry] = _snapshot(path, gitdir)
+            for rel in sorted(_diff(self._snapshots[path], snapshot)):
+                event: Optional[ProjectEvent] = self._event(path, gitdir, rel)
+                if event is not None:
+                    events.append(event)
+            self._snapshots[path] = snapshot
+        return events
+
+    def _event(self, path: str, gitdir: Optional[str], rel: str) -> Optional[ProjectEvent]:
+        if rel == ".git/HEAD":
+            head: Optional[str] = _read_head(gitdir)
+            if head == self._heads[path]:
+                return None
+            self._heads[path] = head
+            branch: Optional[str] = None
+            if head is not None and head.startswith("ref: refs/heads/"):
+                branch = head[len("ref: refs/heads/"):]
+            return ProjectEvent(path, BRANCH_CHANGED, branch)
+        if rel == ".git/index":
+            return ProjectEvent(path, INDEX_CHANGED)
+        if rel == ".dtproject":
+            return ProjectEvent(path, LAYER_CHANGED, rel)
+        if rel == "Dockerfile":
+            return ProjectEvent(path, DOCKERFILE_CHANGED)
+        if rel.startswith("dependencies-"):
+            return ProjectEvent(path, DEPENDENCIES_CHANGED, rel)
+        if rel.startswith("dtproject/"):
+            return ProjectEvent(path, LAYER_CHANGED, rel[len("dtproject/"):-len(".yaml")])
+        if rel.startswith("launchers/"):
+            return ProjectEvent(path, LAUNCHERS_CHANGED, rel[len("launchers/"):])
+        return None
+
+
+class _PollingBackend:
+    name: str = "polling"
+
+    def __init__(self, interval: float):
+        self._interval: float = interval
+        self._next: float = 0.0
+
+    def watch(self, path: str, gitdir: Optional[str]):
+        pass
+
+    def unwatch(self, path: str):
+        pass
+
+    def wait(self, paths: Set[str], timeout: Optional[float]) -> Set[str]:
+        # everything is due for a scan every `interval` seconds
+        delay: float = max(0.0, self._next - time.monotonic())
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(delay)
+        self._next = time.monotonic() + self._interval
+        return paths
+
+    def close(self):
+        pass
+
+
+class _InotifyBackend:
+    name: str = "inotify"
+
+    MASK: int = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ATTRIB | \
+        IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    def __init__(self):
+        self._inotify: Inotify = Inotify()
+        # watch descriptor -> (directory, role) -> projects
+        self._watches: Dict[int, Dict[Tuple[str, str], Set[str]]] = {}
+        # project -> watch descriptors
+        self._projects: Dict[str, Set[int]] = {}
+
+    def watch(self, path: str, gitdir: Optional[str]):
+        dirs: List[Tuple[str, str]] = [
+            (path, "root"),
+            (os.path.join(path, "dtproject"), "dtproject"),
+            (os.path.join(path, "launchers"), "launchers"),
+        ]
+        if gitdir is not None:
+            dirs.append((gitdir, "git"))
+        for d, role in dirs:
+            try:
+                # watching the same directory again returns the same descriptor
+                wd: int = self._inotify.add_watch(d, self.MASK)
+            except OSError:
+                # not there (yet)
+                continue
+            self._watches.setdefault(wd, {}).setdefault((d, role), set()).add(path)
+            self._projects.setdefault(path, set()).add(wd)
+
+    def unwatch(self, path: str):
+        for wd in self._projects.pop(path, set()):
+            targets: Dict[Tuple[str, str], Set[str]] = self._watches.get(wd, {})
+            for projects in targets.values():
+                projects.discard(path)
+            if not any(targets.values()):
+                self._watches.pop(wd, None)
+                self._inotify.rm_watch(wd)
+
+    def wait(self, paths: Set[str], timeout: Optional[float]) -> Set[str]:
+        dirty: Set[str] = set()
+        for wd, mask, name in self._inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                # events were lost
+                return paths
+            if mask & IN_IGNORED:
+                # the directory is gone, it is watched again if it comes back
+                for projects in self._watches.pop(wd, {}).values():
+                    for path in projects:
+                        self._projects.get(path, set()).discard(wd)
+                        dirty.add(path)
+                continue
+            for (_, role), projects in self._watches.get(wd, {}).items():
+                if self._relevant(role, name):
+                    dirty.update(projects)
+        return dirty & paths
+
+    @staticmethod
+    def _relevant(role: str, name: str) -> bool:
+        if not name:
+            # the watched directory itself
+            return True
+        if role == "git":
+            return name in ("HEAD", "index")
+        if role == "root":
+            return name in (".dtproject", "Dockerfile", "dtproject", "launchers", ".git") or \
+                (name.startswith("dependencies-") and name.endswith(".txt"))
+        return True
+
+    def close(self):
+        self._inotify.close()
+
+
+def _gitdir(path: str) -> Optional[str]:
+    try:
+        return GitRepository(path).gitdir
+    except READER_ERRORS:
+        return None
+
+
+def _read_head(gitdir: Optional[str]) -> Optional[str]:
+    if gitdir is None:
+        return None
+    try:
+        with open(os.path.join(gitdir, "HEAD"), "rt") as fin:
+            return fin.read().strip()
+    except OSError:
+        return None
+
+
+def _watched_files(path: str, gitdir: Optional[str]) -> Dict[str, str]:
+    """
+    Returns:
+        The files to watch in the given project, by their path relative to the project.
+    """
+    def _is_root_file(name: str) -> bool:
+        return name in (".dtproject", "Dockerfile") or (name.startswith("dependencies-") and name.endswith(".txt"))
+
+    files: Dict[str, str] = {}
+    for reldir, match in [
+        ("", _is_root_file),
+        ("dtproject", lambda name: name.endswith(".yaml") and not name.startswith(".")),
+        # editors create hidden swap files
+        ("launchers", lambda name: not name.startswith(".")),
+    ]:
+        try:
+            with os.scandir(os.path.join(path, reldir)) as it:
+                for entry in it:
+                    if match(entry.name) and entry.is_file():
+                        files[f"{reldir}/{entry.name}" if reldir else entry.name] = entry.path
+        except OSError:
+            continue
+    if gitdir is not None:
+        files[".git/HEAD"] = os.path.join(gitdir, "HEAD")
+        files[".git/index"] = os.path.join(gitdir, "index")
+    return files
+
+
+def _digest(fpath: str) -> Optional[int]:
+    try:
+        with open(fpath, "rb") as fin:
+            return zlib.crc32(fin.read())
+    except OSError:
+        return None
+
+
+def _snapshot(path: str, gitdir: Optional[str]) -> Dict[str, _Entry]:
+    snapshot: Dict[str, _Entry] = {}
+    now: float = time.time()
+    for rel, fpath in _watched_files(path, gitdir).items():
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            continue
+        # a file modified within the racy window might change again without changing its stat
+        digest: Optional[int] = _digest(fpath) if now - st.st_mtime_ns / 1e9 < RACY_WINDOW_SECS else None
+        snapshot[rel] = (fpath, st.st_ino, st.st_size, st.st_mtime_ns, digest)
+    return snapshot
+
+
+def _diff(old: Dict[str, _Entry], new: Dict[str, _Entry]) -> Set[str]:
+    changed: Set[str] = set(old) ^ set(new)
+    for rel in set(old) & set(new):
+        if old[rel][1:4] != new[rel][1:4]:
+            changed.add(rel)
+        elif old[rel][4] is not None:
+            # same stat, but we could not trust it last time
+            digest: Optional[int] = new[rel][4] if new[rel][4] is not None else _digest(new[rel][0])
+            if digest != old[rel][4]:
+                changed.add(rel)
+    return changed
@@ -21,8 +21,31 @@ def get_project_path(name: str) -> str:
     return d
 
 
+def get_project_dir(name: str) -> str:
+    # test projects are given by name, copies of them (e.g., in a temporary directory) by path
+    return name if os.path.isabs(name) else get_project_path(name)
+
+
+def copy_project(name: str, destination: str) -> str:
+    """
+    Copies the given test project into the directory `destination` and returns the path to the copy.
+    Nothing in the copy looks recently modified, see `backdate`.
+    """
+    path: str = os.path.join(destination, name)
+    shutil.copytree(get_project_path(name), path)
+    backdate(path)
+    return path
+
+
+def backdate(path: str):
+    # files modified too recently are never trusted, pretend nothing changed in a while
+    for root, dirs, files in os.walk(path):
+        for f in [root] + [os.path.join(root, f) for f in files]:
+            os.utime(f, (0, 0))
+
+
 def add_git_to_project(name: str, remote: Optional[str] = None, branch: Optional[str] = None):
-    path: str = get_project_path(name)
+    path: str = get_project_dir(name)
     subprocess.check_output(["git", "init"], cwd=path, stderr=subprocess.PIPE)
     # add remote
     if remote:
@@ -39,6 +62,26 @@ def remove_git_from_project(name: str):
         shutil.rmtree(gitd)
 
 
+def git_commit(name: str, message: str = "commit"):
+    path: str = get_project_dir(name)
+    subprocess.check_output(["git", "add", "-A"], cwd=path)
+    subprocess.check_output(
+        ["git", "-c", "user.name=tester", "-c", "user.email=test@duckietown.com", "commit",
+         "--allow-empty", "--no-gpg-sign", "-m", message],
+        cwd=path
+    )
+
+
+def git_tag(name: str, tag: str, annotated: bool = False):
+    path: str = get_project_dir(name)
+    extra = ["-a", "-m", tag] if annotated else []
+    subprocess.check_output(
+        ["git", "-c", "user.name=tester", "-c", "user.email=test@duckietown.com", "tag", "--no-sign"] +
+        extra + [tag],
+        cwd=path
+    )
+
+
 def add_layer_to_project(name: str, layer: str, content: dict):
     path: str = get_project_path(name)
     layer_fpath = os.path.join(path, "dtproject", f"{layer}.yaml")
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from dtproject import DTProject
+from dtproject.utils.git import RepositoryInfo, GitReaderError
+from dtproject.utils.process import stats
+
+from . import get_project_path, git_repository, skip_if_code_mounted, git_commit, git_tag
+
+FIELDS = ["sha", "distro", "head_version", "closest_version", "version_name", "url"]
+
+
+class TestAsync(unittest.TestCase):
+
+    def setUp(self):
+        self._env = mock.patch.dict(os.environ, {"DTPROJECT_DISABLE_CACHE": "1"})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+
+    def _fields(self, p: DTProject) -> dict:
+        return {**{f: getattr(p, f) for f in FIELDS}, "clean": p.is_clean(), "detached": p.is_detached()}
+
+    def test_async_no_git(self):
+        pnames = ["basic_v1", "basic_v2", "basic_v3", "basic_v4", "custom_v4"]
+
+        async def _load_all():
+            return await asyncio.gather(*[DTProject.load_async(get_project_path(p)) for p in pnames])
+
+        projects = asyncio.run(_load_all())
+        for pname, p in zip(pnames, projects):
+            expected = DTProject(get_project_path(pname))
+            self.assertIs(type(p), type(expected))
+            self.assertEqual(p.name, expected.name)
+            self.assertEqual(p.version, expected.version)
+        self.assertTrue(all(projects[3].layers.is_loaded(layer) for layer in DTProject.KNOWN_LAYERS))
+
+    @skip_if_code_mounted
+    def test_async_git(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, remote="git@github.com:duckietown/basic_git_v4", branch="ente"):
+            git_commit(pname)
+            git_tag(pname, "v1.0.0")
+            git_commit(pname)
+            # an untracked file
+            with open(os.path.join(pdir, "untracked.txt"), "wt") as fout:
+                fout.write("new")
+            try:
+                expected = self._fields(DTProject(pdir))
+                stats.reset()
+                p = asyncio.run(DTProject.load_async(pdir))
+                self.assertTrue(all(p._repository.is_loaded(g) for g in RepositoryInfo.GROUPS))
+                self.assertEqual(self._fields(p), expected)
+                self.assertIn("git status", stats.by_command())
+                # when the reader cannot help, tags come from an (async) git describe
+                with mock.patch.object(RepositoryInfo, "_read_tags", side_effect=GitReaderError):
+                    stats.reset()
+                    p = asyncio.run(DTProject.load_async(pdir))
+                    self.assertEqual(self._fields(p), expected)
+                    self.assertIn("git describe", stats.by_command())
+            finally:
+                os.remove(os.path.join(pdir, "untracked.txt"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from dtproject import DTProject
+from dtproject.sources import FilesystemSource
+from dtproject.utils.cache import FileCache, PickleFileCache
+from dtproject.utils.git import RepositoryInfo
+
+from . import get_project_path, git_repository, skip_if_code_mounted, git_commit, backdate
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"DTPROJECT_CACHE": self._cache_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._cache_dir.cleanup()
+
+    def test_file_cache_fingerprint(self):
+        cache = FileCache("test")
+        fingerprint = [["file", 1, 2, 3]]
+        cache.put("key", fingerprint, {"a": 1})
+        self.assertEqual(cache.get("key", fingerprint), {"a": 1})
+        self.assertIsNone(cache.get("key", [["file", 1, 2, 4]]))
+        self.assertIsNone(cache.get("other", fingerprint))
+
+    def test_file_cache_racy(self):
+        cache = FileCache("test")
+        fpath = os.path.join(self._cache_dir.name, "file")
+        with open(fpath, "wt") as fout:
+            fout.write("changed just now")
+        fingerprint = [[fpath, 1, 2, os.stat(fpath).st_mtime_ns]]
+        cache.put("key", fingerprint, {"a": 1})
+        self.assertIsNone(cache.get("key", fingerprint))
+
+    def test_file_cache_lru(self):
+        cache = FileCache("test", max_entries=2)
+        fingerprint = [["file", 1, 2, 3]]
+        cache.put("a", fingerprint, 1)
+        cache.put("b", fingerprint, 2)
+        # make 'a' the least recently used entry and then use 'b'
+        # noinspection PyProtectedMember
+        os.utime(cache._entry_path("a"), (1, 1))
+        self.assertEqual(cache.get("b", fingerprint), 2)
+        cache.put("c", fingerprint, 3)
+        self.assertIsNone(cache.get("a", fingerprint))
+        self.assertEqual(cache.get("b", fingerprint), 2)
+        self.assertEqual(cache.get("c", fingerprint), 3)
+
+    @skip_if_code_mounted
+    def test_repo_info_cache(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, remote="git@github.com:does_not_matter/basic_git_v4", branch="ente"):
+            git_commit(pname)
+            backdate(os.path.join(pdir, ".git"))
+            info = RepositoryInfo(pdir)
+            expected = [info.sha, info.branch, info.closest_version, info.name]
+            # a new instance (e.g., another process) gets the same answers without reading the repository
+            info = RepositoryInfo(pdir)
+            with mock.patch.object(RepositoryInfo, "_load_head", side_effect=AssertionError), \
+                    mock.patch.object(RepositoryInfo, "_load_tags", side_effect=AssertionError), \
+                    mock.patch.object(RepositoryInfo, "_load_origin", side_effect=AssertionError):
+                self.assertEqual([info.sha, info.branch, info.closest_version, info.name], expected)
+            # the state of the index is never cached
+            self.assertFalse(info.is_loaded("index"))
+            # a new commit invalidates the cache
+            git_commit(pname)
+            info = RepositoryInfo(pdir)
+            sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=pdir).decode().strip()
+            self.assertNotEqual(expected[0], sha)
+            self.assertEqual(info.sha, sha)
+
+    def test_pickle_file_cache(self):
+        cache = PickleFileCache("test")
+        fingerprint = [["file", 1, 2, 3]]
+        cache.put("key", fingerprint, {"a": {1, 2}})
+        self.assertEqual(cache.get("key", fingerprint), {"a": {1, 2}})
+        # values that cannot be pickled are simply not cached
+        cache.put("lambda", fingerprint, lambda: 0)
+        self.assertIsNone(cache.get("lambda", fingerprint))
+
+    def test_layers_cache(self):
+        pdir = os.path.join(self._cache_dir.name, "project")
+        shutil.copytree(get_project_path("custom_v4"), pdir)
+        containers_fpath = os.path.join(pdir, "dtproject", "containers.yaml")
+        with open(containers_fpath, "wt") as fout:
+            yaml.safe_dump({"default": {"network": "host"}}, fout)
+        with open(os.path.join(pdir, "dtproject", "web.yaml"), "wt") as fout:
+            yaml.safe_dump({"url": "example.com"}, fout)
+        backdate(pdir)
+        p = DTProject(pdir)
+        expected = p.layers.as_dict()
+        self.assertEqual(p.containers["default"].service, {"network": "host"})
+        # a new project (e.g., in another process) does not parse anything
+        with mock.patch.object(FilesystemSource, "read_text", side_effect=AssertionError):
+            p = DTProject(pdir)
+            self.assertEqual(p.layers.as_dict(), expected)
+            self.assertEqual(p.containers["default"].service, {"network": "host"})
+        # editing a layer only invalidates that layer
+        with open(containers_fpath, "wt") as fout:
+            yaml.safe_dump({"default": {"network": "bridge"}}, fout)
+        os.utime(containers_fpath, (1, 1))
+        with mock.patch.object(FilesystemSource, "read_text", autospec=True,
+                               side_effect=FilesystemSource.read_text) as read_text:
+            p = DTProject(pdir)
+            self.assertEqual(p.layers.as_dict(), expected)
+            self.assertEqual(p.containers["default"].service, {"network": "bridge"})
+        self.assertEqual([c.args[1] for c in read_text.call_args_list], ["dtproject/containers.yaml"])
+        # the cache can be disabled
+        with mock.patch.dict(os.environ, {"DTPROJECT_DISABLE_CACHE": "1"}), \
+                mock.patch.object(FilesystemSource, "read_text", autospec=True,
+                                  side_effect=FilesystemSource.read_text) as read_text:
+            self.assertEqual(DTProject(pdir).layers.as_dict(), expected)
+        self.assertEqual(read_text.call_count, 8)
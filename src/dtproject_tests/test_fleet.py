@@ -0,0 +1,142 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from dtproject import DTProject
+from dtproject.exceptions import MalformedDTProject
+from dtproject.fleet import FleetLoader, find_projects, load_projects, iter_projects, ProjectHandle
+from dtproject.utils import process
+
+from . import get_project_path
+
+PROJECTS = ["basic_v1", "basic_v2", "basic_v3", "basic_v4", "custom_v4"]
+
+
+class TestFleet(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"DTPROJECT_CACHE": os.path.join(self._tmpdir.name, "cache")})
+        self._env.start()
+        self.root = os.path.join(self._tmpdir.name, "workspace")
+        for i, pname in enumerate(PROJECTS):
+            # some projects are nested in groups
+            shutil.copytree(get_project_path(pname), os.path.join(self.root, f"group{i % 2}", pname))
+        # a project missing a required layer
+        self.broken = os.path.join(self.root, "broken")
+        shutil.copytree(get_project_path("basic_v4"), self.broken)
+        os.remove(os.path.join(self.broken, "dtproject", "self.yaml"))
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmpdir.cleanup()
+
+    def test_find_projects(self):
+        found = sorted(os.path.basename(p) for p in find_projects(self.root))
+        self.assertEqual(found, sorted(PROJECTS + ["broken"]))
+
+    def test_iter_projects(self):
+        # projects where we do not look
+        for d in [".git", "node_modules", "html", "pdf", "venv", ".hidden", os.path.join("group0", "basic_v1", "packages")]:
+            shutil.copytree(get_project_path("basic_v4"), os.path.join(self.root, d, "hidden_v4"))
+        # ---
+        it = iter_projects(self.root)
+        first = next(it)
+        self.assertIsInstance(first, ProjectHandle)
+        self.assertEqual(first.name, "broken")
+        handles = [first] + list(it)
+        self.assertEqual(sorted(h.name for h in handles), sorted(PROJECTS + ["broken"]))
+        self.assertEqual([h.path for h in handles], sorted(h.path for h in handles))
+        markers = {h.name: h.marker for h in handles}
+        self.assertEqual(markers["basic_v3"], ".dtproject")
+        self.assertEqual(markers["custom_v4"], "dtproject")
+        # handles load projects
+        handle = next(h for h in handles if h.name == "basic_v4")
+        self.assertEqual(handle.load().name, DTProject(get_project_path("basic_v4")).name)
+        # pruning is configurable
+        found = [h.name for h in iter_projects(self.root, prune=[])]
+        self.assertEqual(found.count("hidden_v4"), 4)
+        # the root itself can be a project
+        self.assertEqual([h.path for h in iter_projects(self.broken)], [self.broken])
+        # generic names might be projects
+        built = os.path.join(self.root, "build", "out")
+        shutil.copytree(get_project_path("basic_v4"), built)
+        self.assertIn(built, [h.path for h in iter_projects(self.root)])
+
+    def test_iter_projects_ambiguous(self):
+        # a valid '.dtproject' takes precedence over 'dtproject/', as in DTProject
+        pdir = os.path.join(self.root, "group0", "basic_v3")
+        os.makedirs(os.path.join(pdir, "dtproject"))
+        handle = next(h for h in iter_projects(self.root) if h.path == pdir)
+        self.assertEqual(handle.marker, ".dtproject")
+        self.assertEqual(handle.load().type_version, "3")
+        # an invalid one does not
+        with open(os.path.join(pdir, ".dtproject"), "wt") as fout:
+            fout.write("- not a project")
+        handle = next(h for h in iter_projects(self.root) if h.path == pdir)
+        self.assertEqual(handle.marker, "dtproject")
+
+    def _check(self, loader: FleetLoader):
+        projects = {os.path.basename(p.path): p for p in loader}
+        self.assertEqual(set(projects), set(PROJECTS))
+        for pname, p in projects.items():
+            self.assertIsInstance(p, DTProject)
+            self.assertEqual(type(p), type(DTProject(get_project_path(pname))))
+        self.assertEqual(list(loader.errors), [self.broken])
+        self.assertIsInstance(loader.errors[self.broken], MalformedDTProject)
+
+    def test_fleet_threads(self):
+        self._check(FleetLoader(self.root, workers=4))
+
+    def test_fleet_processes(self):
+        self._check(FleetLoader(self.root, workers=2, processes=True))
+
+    def test_fleet_processes_snapshot(self):
+        for pdir in find_projects(self.root):
+            for args in [["init", "-q"], ["add", "-A"], ["commit", "-q", "--no-gpg-sign", "-m", "first"]]:
+                subprocess.check_call(["git", "-c", "user.name=tester", "-c", "user.email=test@duckietown.com",
+                                       *args], cwd=pdir)
+        with open(os.path.join(self.root, "group1", "basic_v2", "Dockerfile"), "at") as fout:
+            fout.write("\n# changed")
+        process.stats.reset()
+        projects = {os.path.basename(p.path): p for p in FleetLoader(self.root, workers=2, processes=True)}
+        # the state of the index comes from the workers, git does not run again here
+        self.assertFalse(projects["basic_v2"].is_clean())
+        self.assertTrue(projects["basic_v4"].is_clean())
+        self.assertEqual(process.stats.history, type(process.stats.history)())
+
+    def test_fleet_processes_no_cache(self):
+        # nothing to rebuild projects from, threads are used instead
+        with mock.patch.dict(os.environ, {"DTPROJECT_DISABLE_CACHE": "1"}), \
+                mock.patch("dtproject.fleet.ProcessPoolExecutor") as pool:
+            self._check(FleetLoader(self.root, workers=2, processes=True))
+        pool.assert_not_called()
+
+    def test_fleet_streaming(self):
+        consumed = []
+
+        def _paths():
+            # a slow discovery of many projects
+            for _ in range(10):
+                for pdir in find_projects(self.root):
+                    consumed.append(pdir)
+                    yield pdir
+
+        loader = FleetLoader(_paths(), workers=1, preload=False)
+        results = loader.results()
+        next(results)
+        # results come while discovery is still running, with a bounded number of projects in flight
+        self.assertLessEqual(len(consumed), loader.window)
+        self.assertEqual(len(list(results)), 10 * (len(PROJECTS) + 1) - 1)
+
+    def test_fleet_results(self):
+        results = load_projects(self.root, preload=False)
+        self.assertEqual(len(results), len(PROJECTS) + 1)
+        self.assertEqual([r.path for r in results if not r.ok], [self.broken])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,12 @@
-from . import get_project_path, git_repository, skip_if_code_mounted
+import os
+import subprocess
+import tempfile
+import time
+from unittest import mock
+
+from dtproject.utils.git import get_repo_info, _get_repo_head_cli, _describe_cli, \
+    _get_repo_origin_cli, TagIndex, GitRepository, GitSession
+from . import get_project_path, git_repository, skip_if_code_mounted, git_commit, git_tag, value
 
 from dtproject import DTProject
 import unittest
@@ -65,3 +73,199 @@ class TestGitProject(unittest.TestCase):
             # ---
             # v4+ does not use the remote to get a name for the project
             self.assertNotEqual(p.name, repo_name)
+
+    @skip_if_code_mounted
+    def test_git_project_tags(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            git_tag(pname, "v0.0.1")
+            git_commit(pname)
+            git_tag(pname, "v0.0.2", annotated=True)
+            p = DTProject(pdir)
+            # ---
+            sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=pdir).decode().strip()
+            self.assertEqual(p.sha, sha)
+            self.assertEqual(p.head_version, "v0.0.2")
+            self.assertEqual(p.closest_version, "v0.0.2")
+            self.assertFalse(p.is_detached())
+
+    @skip_if_code_mounted
+    def test_git_reader_matches_cli(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, remote="git@github.com:does_not_matter/basic_git_v4.git", branch="ente"):
+            git_commit(pname)
+            git_tag(pname, "v1.0.0", annotated=True)
+            git_commit(pname)
+            git_tag(pname, "v1.0.1")
+            git_tag(pname, "v1.0.1-rc", annotated=True)
+            for pack in [False, True]:
+                if pack:
+                    # move refs and objects into packed-refs and packfiles
+                    subprocess.check_output(["git", "gc", "--quiet"], cwd=pdir)
+                with value(get_repo_info(pdir)) as info:
+                    sha, branch = _get_repo_head_cli(pdir)
+                    head_tag, closest_tag = _describe_cli(pdir, sha)
+                    origin_url = _get_repo_origin_cli(pdir)
+                    self.assertEqual(info["SHA"], sha)
+                    self.assertEqual(info["BRANCH"], branch)
+                    self.assertEqual(info["VERSION.HEAD"], head_tag)
+                    self.assertEqual(head_tag, "v1.0.1-rc")
+                    self.assertEqual(info["VERSION.CLOSEST"], closest_tag)
+                    self.assertEqual(info["ORIGIN.URL"], origin_url[:-len(".git")])
+                    self.assertEqual(info["REPOSITORY"], "basic_git_v4")
+
+    @skip_if_code_mounted
+    def test_git_project_detached(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            git_commit(pname)
+            subprocess.check_output(["git", "checkout", "--quiet", "HEAD~1"], cwd=pdir)
+            p = DTProject(pdir)
+            # ---
+            self.assertTrue(p.is_detached())
+            self.assertEqual(p.version_name, "ND")
+
+    @skip_if_code_mounted
+    def test_git_project_lazy_info(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            p = DTProject(pdir)
+            # nothing is computed at construction time
+            # noinspection PyProtectedMember
+            repo = p._repository
+            for group in repo.GROUPS:
+                self.assertFalse(repo.is_loaded(group))
+            # fields are computed in groups
+            _ = p.sha
+            self.assertTrue(repo.is_loaded("head"))
+            self.assertFalse(repo.is_loaded("tags"))
+            self.assertFalse(repo.is_loaded("index"))
+            _ = p.closest_version
+            self.assertTrue(repo.is_loaded("tags"))
+            self.assertFalse(repo.is_loaded("index"))
+            self.assertTrue(p.is_clean())
+            self.assertTrue(repo.is_loaded("index"))
+
+    @skip_if_code_mounted
+    def test_git_project_status(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            # modify a tracked file and add an untracked one
+            with open(os.path.join(pdir, "README.md"), "at") as fout:
+                fout.write("\n")
+            with open(os.path.join(pdir, "untracked.txt"), "wt") as fout:
+                fout.write("\n")
+            try:
+                p = DTProject(pdir)
+                # noinspection PyProtectedMember
+                repo = p._repository
+                # the index group brings the head group with it
+                self.assertTrue(p.is_dirty())
+                self.assertTrue(repo.is_loaded("head"))
+                self.assertEqual(p.version_name, "ente")
+                self.assertEqual(repo.index_nmodified, 1)
+                self.assertEqual(repo.index_nadded, 2)
+            finally:
+                os.remove(os.path.join(pdir, "untracked.txt"))
+                subprocess.check_output(["git", "checkout", "--", "README.md"], cwd=pdir)
+
+    @skip_if_code_mounted
+    def test_git_project_closest_version(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            git_tag(pname, "v1.0.0", annotated=True)
+            git_commit(pname)
+            # a tag that is not reachable from HEAD
+            subprocess.check_output(["git", "checkout", "--quiet", "-b", "ente-other"], cwd=pdir)
+            git_commit(pname)
+            git_tag(pname, "v9.0.0")
+            subprocess.check_output(["git", "checkout", "--quiet", "ente"], cwd=pdir)
+            p = DTProject(pdir)
+            # ---
+            self.assertEqual(p.head_version, "ND")
+            self.assertEqual(p.closest_version, "v1.0.0")
+
+    @skip_if_code_mounted
+    def test_git_many_tags_same_commit(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            # git picks the newest annotated tag, whatever their names
+            for tag, date in [("aa-ann", None), ("bb-ann", None), ("cc-new", "2030-01-01T00:00:00"),
+                              ("dd-old", "2001-01-01T00:00:00"), ("zz-light", None)]:
+                with mock.patch.dict(os.environ, {"GIT_COMMITTER_DATE": date} if date else {}):
+                    git_tag(pname, tag, annotated=tag != "zz-light")
+            expected = subprocess.check_output(["git", "describe", "--tags", "--exact-match", "HEAD"],
+                                               cwd=pdir).decode().strip()
+            self.assertEqual(expected, "cc-new")
+            sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=pdir).decode().strip()
+            self.assertEqual(TagIndex(GitRepository(pdir)).describe(sha), (expected, expected))
+            info = get_repo_info(pdir)
+            self.assertEqual(info["VERSION.HEAD"], expected)
+            self.assertEqual(info["VERSION.CLOSEST"], expected)
+
+    @skip_if_code_mounted
+    def test_git_tag_index_persisted(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            git_tag(pname, "v1.0.0")
+            git_commit(pname)
+            sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=pdir).decode().strip()
+            with tempfile.TemporaryDirectory() as cache_dir, \
+                    mock.patch.dict(os.environ, {"DTPROJECT_CACHE": cache_dir, "DTPROJECT_DISABLE_CACHE": "0"}):
+                # an index built right after the tags changed is not persisted
+                self.assertEqual(TagIndex(GitRepository(pdir)).describe(sha), ("ND", "v1.0.0"))
+                self.assertEqual(os.listdir(cache_dir), [])
+                # tags that have not changed in a while are indexed, outside of the repository
+                os.utime(os.path.join(pdir, ".git", "refs", "tags"), (0, 0))
+                index = TagIndex(GitRepository(pdir))
+                self.assertEqual(index.describe(sha), ("ND", "v1.0.0"))
+                cached = TagIndex._cache.get(os.path.realpath(os.path.join(pdir, ".git")), index.fingerprint())
+                self.assertEqual(cached["closest"], {sha: "v1.0.0"})
+                self.assertEqual([f for f in os.listdir(os.path.join(pdir, ".git")) if "dtproject" in f], [])
+                # a new tag invalidates the index
+                git_tag(pname, "v1.0.1")
+                self.assertEqual(TagIndex(GitRepository(pdir)).describe(sha), ("v1.0.1", "v1.0.1"))
+
+    @skip_if_code_mounted
+    def test_git_session(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname, branch="ente"):
+            git_commit(pname)
+            git_tag(pname, "v1.0.0", annotated=True)
+            sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=pdir).decode().strip()
+            session = GitSession(pdir, idle_timeout=0.2)
+            try:
+                # ref resolution
+                self.assertEqual(session.resolve("HEAD")[:2], (sha, "commit"))
+                self.assertEqual(session.resolve("v1.0.0")[1], "tag")
+                self.assertEqual(session.resolve("v1.0.0^{}")[0], sha)
+                self.assertIsNone(session.resolve("does-not-exist"))
+                # blob reads
+                with open(os.path.join(pdir, "dtproject", "self.yaml"), "rb") as fin:
+                    self.assertEqual(session.read("HEAD:dtproject/self.yaml"), ("blob", fin.read()))
+                self.assertIsNone(session.read("HEAD:does-not-exist"))
+                # the same processes serve all the queries
+                self.assertTrue(session.is_running)
+                self.assertEqual(session.queries, 6)
+                # processes go away when the session is idle, and come back when needed
+                time.sleep(0.5)
+                self.assertFalse(session.is_running)
+                self.assertEqual(session.resolve("HEAD")[0], sha)
+            finally:
+                session.close()
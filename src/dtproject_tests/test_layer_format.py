@@ -1,6 +1,10 @@
+from unittest import mock
+
 from . import get_project_path
 
 from dtproject import DTProject
+from dtproject.dtproject import DTProjectV1, DTProjectV2, DTProjectV3, DTProjectV4
+from dtproject.sources import FilesystemSource
 import unittest
 
 
@@ -29,3 +33,19 @@ class TestLayerSelf(unittest.TestCase):
         p = DTProject(pd)
         # ---
         self.assertEqual(p.format.version, 4)
+
+    def test_format_detection_single_probe(self):
+        for pname in ["basic_v1", "basic_v2", "basic_v3", "basic_v4", "custom_v4"]:
+            pd = get_project_path(pname)
+            # the detector agrees with the checks of the single classes
+            expected = next(c for c in [DTProjectV1, DTProjectV2, DTProjectV3, DTProjectV4] if c.is_instance_of(pd))
+            with mock.patch.object(FilesystemSource, "read_text", autospec=True,
+                                   side_effect=FilesystemSource.read_text) as read_text, \
+                    mock.patch.object(FilesystemSource, "listdir", autospec=True,
+                                      side_effect=FilesystemSource.listdir) as listdir:
+                p = DTProject(pd)
+            # ---
+            self.assertIs(type(p), expected)
+            # the project root is listed once and '.dtproject' is parsed at most once
+            self.assertEqual([c.args[1:] for c in listdir.call_args_list].count(("",)), 1)
+            self.assertLessEqual([c.args[1] for c in read_text.call_args_list].count(".dtproject"), 1)
@@ -214,3 +214,34 @@ class TestLayerRecipes(unittest.TestCase):
                 with value("recipe2") as recipe:
                     p = DTProject(pd, recipe=recipe)
                     self.assertEqual(p.recipe_info, Recipe(**recipes[recipe]))
+
+    @skip_if_code_mounted
+    def test_layer_recipe_project_memoized(self):
+        pname = "basic_v4"
+        pd = get_project_path(pname)
+        recipes = {
+            "default": {
+                "repository": "my-recipes",
+                "branch": "my_branch",
+            }
+        }
+        with options_layer(pname, {"needs_recipe": True}):
+            with recipes_layer(pname, recipes):
+                p = DTProject(pd)
+                p.set_recipe_dir(get_project_path("custom_v4"))
+                self.assertEqual(p.recipe_loads, 0)
+                # the recipe project is built once
+                _ = p.dockerfile, p.vscode_dockerfile, p.vnc_dockerfile, p.recipe
+                self.assertEqual(p.recipe.path, get_project_path("custom_v4"))
+                self.assertEqual(p.recipe_loads, 1)
+                # same selection, same recipe
+                p.set_recipe_dir(get_project_path("custom_v4"))
+                self.assertIs(p.recipe, p.recipe)
+                self.assertEqual(p.recipe_loads, 1)
+                # a different selection invalidates it
+                p.set_recipe_dir(get_project_path("basic_v3"))
+                self.assertEqual(p.recipe.path, get_project_path("basic_v3"))
+                self.assertEqual(p.recipe_loads, 2)
+                p.set_recipe_version("other_branch")
+                _ = p.recipe
+                self.assertEqual(p.recipe_loads, 3)
@@ -1,10 +1,18 @@
+import glob
+import os
 from typing import Dict
+from unittest import mock
+
+import yaml
 
 from dtproject.constants import DUCKIETOWN, DEFAULT_DOCKER_REGISTRY
 
 from . import get_project_path, custom_layer, skip_if_code_mounted
 
 from dtproject import DTProject
+from dtproject.exceptions import MalformedDTProject
+from dtproject.utils import yaml_loader
+from dtproject.utils.yaml_loader import safe_load_file
 import unittest
 
 
@@ -12,6 +20,17 @@ class TestLayers(unittest.TestCase):
     def setUp(self):
         self.maxDiff = None
 
+    def test_layers_yaml_loader(self):
+        # the accelerated loader (if any) and the pure-Python one agree on all the layers we have
+        for fpath in glob.glob(os.path.join(get_project_path("custom_v4"), "..", "*", "dtproject", "*.yaml")):
+            self.assertEqual(safe_load_file(fpath), safe_load_file(fpath, loader=yaml.SafeLoader))
+        # projects load the same without libyaml
+        pd = get_project_path("custom_v4")
+        p = DTProject(pd)
+        with mock.patch.object(yaml_loader.safe_load, "__defaults__", (yaml.SafeLoader,)):
+            p_pure = DTProject(pd)
+        self.assertEqual(p.layers.as_dict(), p_pure.layers.as_dict())
+
     def test_layers_project_v1(self):
         pd = get_project_path("basic_v1")
         p = DTProject(pd)
@@ -39,6 +58,53 @@ class TestLayers(unittest.TestCase):
         # ---
         self.assertEqual(set(p.layers.as_dict().keys()), set(DTProject.KNOWN_LAYERS))
 
+    def test_layers_lazy(self):
+        pd = get_project_path("custom_v4")
+        p = DTProject(pd)
+        # needed to validate the project
+        self.assertTrue(p.layers.is_loaded("options"))
+        self.assertTrue(p.layers.is_loaded("recipes"))
+        # everything else is parsed on first access
+        for layer in ["format", "self", "distro", "base", "hooks", "containers", "devcontainers"]:
+            self.assertFalse(p.layers.is_loaded(layer))
+        _ = p.name
+        self.assertTrue(p.layers.is_loaded("self"))
+        self.assertFalse(p.layers.is_loaded("hooks"))
+        _ = p.hooks
+        self.assertTrue(p.layers.is_loaded("hooks"))
+        # accessing everything gives the same result
+        self.assertEqual(p.layers, DTProject(pd).layers)
+
+    @skip_if_code_mounted
+    def test_layers_class_reused(self):
+        pname = "basic_v4"
+        pd = get_project_path(pname)
+        p1, p2 = DTProject(pd), DTProject(get_project_path("custom_v4"))
+        # same (no) custom layers, same class
+        self.assertIs(type(p1.layers), type(p2.layers))
+        with custom_layer(pname, "web", {"url": "example.com"}):
+            p3, p4 = DTProject(pd), DTProject(pd)
+            self.assertIsNot(type(p1.layers), type(p3.layers))
+            self.assertIs(type(p3.layers), type(p4.layers))
+            self.assertEqual(p3.layers.web, {"url": "example.com"})
+
+    @skip_if_code_mounted
+    def test_layers_lazy_malformed(self):
+        pname = "basic_v4"
+        pd = get_project_path(pname)
+        layer_fpath: str = os.path.join(pd, "dtproject", "broken.yaml")
+        with open(layer_fpath, "wt") as fout:
+            fout.write("key: [value\n")
+        try:
+            # the project loads
+            p = DTProject(pd)
+            self.assertEqual(p.name, "lib-dtproject-tests-project-basic-v4")
+            # the malformed layer fails when accessed
+            with self.assertRaises(MalformedDTProject):
+                _ = p.layers.broken
+        finally:
+            os.remove(layer_fpath)
+
     @skip_if_code_mounted
     def test_custom_layers(self):
         pname = "basic_v4"
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from dtproject.utils.lock import FileLock, stats
+
+
+class TestLock(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self._tmpdir.name, "locks", "recipes.lock")
+        stats.reset()
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_lock_threads(self):
+        order = []
+        lock = FileLock(self.fpath)
+        self.assertEqual(lock.acquire(), lock.wait)
+        self.assertTrue(lock.locked)
+
+        def _other():
+            with FileLock(self.fpath) as other:
+                order.append(("other", other.wait))
+
+        thread = threading.Thread(target=_other)
+        thread.start()
+        time.sleep(0.3)
+        order.append(("main", 0.0))
+        lock.release()
+        thread.join()
+        self.assertFalse(lock.locked)
+        self.assertEqual([name for name, _ in order], ["main", "other"])
+        self.assertGreater(order[1][1], 0.2)
+        # waits are recorded
+        self.assertEqual(stats.acquisitions, 2)
+        self.assertGreater(stats.by_path()[self.fpath], 0.2)
+
+    def test_lock_timeout(self):
+        with FileLock(self.fpath):
+            with self.assertRaises(TimeoutError):
+                FileLock(self.fpath, timeout=0.1).acquire()
+        # the lock is free again
+        with FileLock(self.fpath, timeout=0.1) as lock:
+            self.assertLess(lock.wait, 0.1)
+
+    def test_lock_processes(self):
+        code = (
+            "import sys, time\n"
+            "from dtproject.utils.lock import FileLock\n"
+            "with FileLock(sys.argv[1]):\n"
+            "    print('locked', flush=True)\n"
+            "    time.sleep(0.5)\n"
+        )
+        proc = subprocess.Popen([sys.executable, "-c", code, self.fpath], stdout=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        try:
+            self.assertEqual(proc.stdout.readline().strip(), b"locked")
+            with FileLock(self.fpath) as lock:
+                self.assertGreater(lock.wait, 0.2)
+        finally:
+            proc.wait()
+            proc.stdout.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+import unittest
+
+from dtproject.utils.misc import run_cmd
+from dtproject.utils.process import run, stream, stats, CommandResult
+
+
+def python(code: str):
+    return [sys.executable, "-c", code]
+
+
+class TestProcess(unittest.TestCase):
+
+    def test_run_no_shell(self):
+        # arguments are passed as they are, no shell quoting or expansion happens
+        res: CommandResult = run(python("import sys; print(sys.argv[1])") + ["$HOME 'quoted' *"])
+        self.assertTrue(res.ok)
+        self.assertEqual(res.lines, ["$HOME 'quoted' *"])
+
+    def test_run_structured_result(self):
+        res: CommandResult = run(python("import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"))
+        self.assertFalse(res.ok)
+        self.assertEqual(res.returncode, 3)
+        self.assertEqual(res.stdout, "out\n")
+        self.assertEqual(res.stderr, "err\n")
+        self.assertGreater(res.duration, 0)
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            res.check()
+        self.assertEqual(ctx.exception.returncode, 3)
+        # the reason of the failure is part of the message
+        self.assertIn("err", str(ctx.exception))
+
+    def test_run_timeout(self):
+        with self.assertRaises(subprocess.TimeoutExpired):
+            run(python("import time; time.sleep(5)"), timeout=0.2)
+
+    def test_run_cmd(self):
+        self.assertEqual(run_cmd(python("print('a'); print(); print('b')")), ["a", "b"])
+        with self.assertRaises(subprocess.CalledProcessError):
+            run_cmd(python("import sys; sys.exit(1)"))
+
+    def test_stream(self):
+        lines = stream(python("print('a'); print('b')"))
+        self.assertEqual(list(lines), ["a", "b"])
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(stream(python("import sys; print('a'); sys.exit(2)")))
+        with self.assertRaises(subprocess.TimeoutExpired):
+            list(stream(python("import time; time.sleep(5)"), timeout=0.2))
+
+    def test_stats(self):
+        calls = stats.calls
+        run(python("pass"))
+        self.assertEqual(stats.calls, calls + 1)
+        self.assertEqual(stats.history[-1].args, python("pass"))
+        self.assertEqual(stats.history[-1].returncode, 0)
+        self.assertIn(sys.executable, stats.by_command())
@@ -0,0 +1,395 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from typing import List
+from unittest import mock
+
+from dtproject import DTProject
+from dtproject.recipe import clone_recipe, pull_recipe, update_recipe, recipe_needs_update, get_recipe_lock, \
+    recipe_project_exists, revalidate_recipe, read_update_check_flag, get_recipe_repo_dir, get_recipe_project_dir, \
+    get_recipe_remote_url, get_recipe_store_dir, get_clone_strategy, get_sparse_checkout, CLONE_STRATEGIES, \
+    CloneStrategy
+from dtproject import recipe as recipe_module
+from dtproject.types import Recipe
+from dtproject.utils import lock, process
+
+from . import get_project_path
+
+
+def git(cwd: str, *args: str) -> List[str]:
+    out = subprocess.check_output(
+        ["git", "-c", "user.name=tester", "-c", "user.email=test@duckietown.com", *args],
+        cwd=cwd, stderr=subprocess.PIPE
+    )
+    return out.decode("utf-8").splitlines()
+
+
+class TestRecipeClone(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {
+            "DUCKIETOWN_RECIPES": os.path.join(self._tmpdir.name, "recipes"),
+            "DTPROJECT_DISABLE_CACHE": "1",
+        })
+        self._env.start()
+        # a local bare repository stands in for the provider
+        self.remotes = os.path.join(self._tmpdir.name, "remotes")
+        self.remote = os.path.join(self.remotes, "duckietown", "recipes")
+        git(self._tmpdir.name, "init", "-q", "--bare", "-b", "ente", self.remote)
+        git(self.remote, "config", "uploadpack.allowFilter", "true")
+        # a working copy we push from
+        self.work = os.path.join(self._tmpdir.name, "work")
+        git(self._tmpdir.name, "clone", "-q", self.remote, self.work)
+        git(self.work, "checkout", "-q", "-b", "ente")
+        shutil.copytree(get_project_path("basic_v4"), os.path.join(self.work, "recipe"))
+        shutil.copytree(get_project_path("basic_v3"), os.path.join(self.work, "other"))
+        for d in ["shared", "unrelated"]:
+            os.makedirs(os.path.join(self.work, d))
+            with open(os.path.join(self.work, d, "README.md"), "wt") as fout:
+                fout.write(d)
+        for i in range(3):
+            self._commit(f"commit {i}")
+        self.recipe = Recipe(repository="recipes", branch="ente", provider=f"file://{self.remotes}",
+                             organization="duckietown", location="recipe")
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmpdir.cleanup()
+
+    def _commit(self, message: str) -> str:
+        with open(os.path.join(self.work, "recipe", "CHANGELOG"), "at") as fout:
+            fout.write(f"{message}\n")
+        git(self.work, "add", "-A")
+        git(self.work, "commit", "-q", "--no-gpg-sign", "-m", message)
+        git(self.work, "push", "-q", "origin", "HEAD")
+        return git(self.work, "rev-parse", "HEAD")[0]
+
+    def _count(self) -> int:
+        return int(git(get_recipe_repo_dir(self.recipe), "rev-list", "--count", "HEAD")[0])
+
+    def _shallow(self) -> bool:
+        return git(get_recipe_repo_dir(self.recipe), "rev-parse", "--is-shallow-repository")[0] == "true"
+
+    def test_remote_url(self):
+        self.assertEqual(get_recipe_remote_url(self.recipe), f"file://{self.remote}")
+        github = Recipe(repository="recipes", branch="ente")
+        self.assertEqual(get_recipe_remote_url(github), "https://github.com/duckietown/recipes")
+
+    def test_clone_strategy_policy(self):
+        self.assertEqual(get_clone_strategy(), CLONE_STRATEGIES["shallow"])
+        with mock.patch.dict(os.environ, {"DTPROJECT_RECIPES_CLONE": "partial"}):
+            self.assertEqual(get_clone_strategy(), CLONE_STRATEGIES["partial"])
+        with mock.patch.dict(os.environ, {"DTPROJECT_RECIPES_CLONE": "everything"}):
+            with self.assertRaises(ValueError):
+                get_clone_strategy()
+
+    def test_clone_shallow(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        self.assertEqual(DTProject(get_recipe_project_dir(self.recipe)).name, "lib-dtproject-tests-project-basic-v4")
+        self.assertEqual(self._count(), 1)
+        self.assertTrue(self._shallow())
+        # only the recipe branch is downloaded
+        store_dir = get_recipe_store_dir(self.recipe)
+        self.assertEqual(git(store_dir, "for-each-ref", "--format=%(refname)"), ["refs/heads/ente"])
+
+    def test_clone_partial(self):
+        with mock.patch.dict(os.environ, {"DTPROJECT_RECIPES_CLONE": "partial"}):
+            self.assertTrue(clone_recipe(self.recipe))
+        self.assertEqual(self._count(), 3)
+        self.assertFalse(self._shallow())
+        repo_dir = get_recipe_repo_dir(self.recipe)
+        self.assertEqual(git(repo_dir, "config", "remote.origin.partialclonefilter")[0], "blob:none")
+
+    def test_clone_full(self):
+        self.assertTrue(clone_recipe(self.recipe, CLONE_STRATEGIES["full"]))
+        self.assertEqual(self._count(), 3)
+        self.assertFalse(self._shallow())
+
+    def test_clone_missing_branch(self):
+        recipe = self.recipe.copy()
+        recipe.branch = "daffy"
+        self.assertFalse(clone_recipe(recipe))
+
+    def _exists(self, *rel: str) -> bool:
+        return os.path.exists(os.path.join(get_recipe_repo_dir(self.recipe), *rel))
+
+    def test_clone_sparse(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        self.assertTrue(self._exists("recipe", "dtproject", "self.yaml"))
+        self.assertFalse(self._exists("other"))
+        self.assertFalse(self._exists("shared"))
+        self.assertFalse(self._exists("unrelated"))
+        self.assertEqual(get_sparse_checkout(get_recipe_repo_dir(self.recipe)), ["recipe"])
+
+    def test_clone_sparse_shared(self):
+        self.recipe.shared = ["/shared/"]
+        self.assertTrue(clone_recipe(self.recipe))
+        self.assertTrue(self._exists("recipe"))
+        self.assertTrue(self._exists("shared", "README.md"))
+        self.assertFalse(self._exists("unrelated"))
+
+    def test_clone_sparse_extend(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        other = self.recipe.copy()
+        other.location = "other"
+        # same repository and branch, the sparse checkout is extended in place
+        self.assertTrue(clone_recipe(other))
+        self.assertEqual(DTProject(get_recipe_project_dir(other)).type_version, "3")
+        self.assertTrue(self._exists("recipe"))
+        self.assertFalse(self._exists("unrelated"))
+        self.assertEqual(get_sparse_checkout(get_recipe_repo_dir(self.recipe)), ["other", "recipe"])
+        # updates keep the sparse checkout
+        with open(os.path.join(self.work, "unrelated", "README.md"), "at") as fout:
+            fout.write("more")
+        sha = self._commit("new commit")
+        pull_recipe(self.recipe)
+        self.assertEqual(git(get_recipe_repo_dir(self.recipe), "rev-parse", "HEAD")[0], sha)
+        self.assertFalse(self._exists("unrelated"))
+
+    def test_clone_whole_old_git(self):
+        self.recipe.location = None
+        self.assertTrue(clone_recipe(self.recipe))
+        real_git = recipe_module.git
+
+        def _git(path, *args):
+            # some versions of git succeed listing the paths of a repository that is not sparse
+            if args[:2] == ("sparse-checkout", "list"):
+                return process.CommandResult(["git", *args], 0, "", "", 0.0)
+            return real_git(path, *args)
+
+        with mock.patch("dtproject.recipe.git", side_effect=_git):
+            self.assertIsNone(get_sparse_checkout(get_recipe_repo_dir(self.recipe)))
+            self.assertTrue(recipe_project_exists(self.recipe))
+
+    def test_clone_sparse_then_whole(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        whole = self.recipe.copy()
+        whole.location = None
+        # the root of the repository is there, but only partially
+        self.assertFalse(recipe_project_exists(whole))
+        self.assertTrue(clone_recipe(whole))
+        self.assertTrue(recipe_project_exists(whole))
+        self.assertTrue(self._exists("unrelated", "README.md"))
+        self.assertIsNone(get_sparse_checkout(get_recipe_repo_dir(whole)))
+        self.assertTrue(recipe_project_exists(self.recipe))
+
+    def _push_branch(self, branch: str) -> str:
+        git(self.work, "checkout", "-q", "-b", branch)
+        return self._commit(f"commit on {branch}")
+
+    def test_clone_branches(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        sha = self._push_branch("daffy")
+        daffy = self.recipe.copy()
+        daffy.branch = "daffy"
+        self.assertTrue(clone_recipe(daffy))
+        # the layout does not change
+        daffy_dir = os.path.join(self._tmpdir.name, "recipes", "recipes", "daffy")
+        self.assertEqual(get_recipe_repo_dir(daffy), daffy_dir)
+        self.assertEqual(DTProject(get_recipe_project_dir(daffy)).name, "lib-dtproject-tests-project-basic-v4")
+        self.assertEqual(git(daffy_dir, "rev-parse", "HEAD")[0], sha)
+        # both branches share the same objects
+        store_dir = get_recipe_store_dir(self.recipe)
+        for recipe in [self.recipe, daffy]:
+            repo_dir = get_recipe_repo_dir(recipe)
+            self.assertTrue(os.path.isfile(os.path.join(repo_dir, ".git")))
+            common_dir = git(repo_dir, "rev-parse", "--path-format=absolute", "--git-common-dir")[0]
+            self.assertEqual(os.path.realpath(common_dir), os.path.realpath(store_dir))
+        self.assertEqual(git(store_dir, "for-each-ref", "--format=%(refname)"),
+                         ["refs/heads/daffy", "refs/heads/ente"])
+        # each branch has its own sparse checkout
+        other = daffy.copy()
+        other.location = "other"
+        self.assertTrue(clone_recipe(other))
+        self.assertEqual(get_sparse_checkout(get_recipe_repo_dir(daffy)), ["other", "recipe"])
+        self.assertEqual(get_sparse_checkout(get_recipe_repo_dir(self.recipe)), ["recipe"])
+        # updates happen per branch
+        sha = self._commit("new commit on daffy")
+        pull_recipe(daffy)
+        self.assertEqual(git(daffy_dir, "rev-parse", "HEAD")[0], sha)
+        self.assertNotEqual(git(get_recipe_repo_dir(self.recipe), "rev-parse", "HEAD")[0], sha)
+
+    def test_clone_branch_again(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        # the directory of a branch is deleted by hand
+        shutil.rmtree(get_recipe_repo_dir(self.recipe))
+        self.assertTrue(clone_recipe(self.recipe))
+        self.assertTrue(self._exists("recipe", "dtproject", "self.yaml"))
+
+    def _concurrently(self, fcn, num: int = 4) -> list:
+        results = []
+        # everybody is waiting on the lock before it is released
+        with get_recipe_lock(self.recipe):
+            threads = [threading.Thread(target=lambda: results.append(fcn(self.recipe))) for _ in range(num)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.3)
+        for thread in threads:
+            thread.join()
+        return results
+
+    @staticmethod
+    def _runs(*args: str) -> int:
+        return sum(1 for record in process.stats.history if record.args[1:len(args) + 1] == list(args))
+
+    def test_clone_single_flight(self):
+        process.stats.reset()
+        lock.stats.reset()
+        self.assertEqual(self._concurrently(clone_recipe), [True] * 4)
+        self.assertEqual(self._runs("clone"), 1)
+        self.assertTrue(self._exists("recipe", "dtproject", "self.yaml"))
+        # lock waits are exposed
+        lock_fpath = os.path.join(self._tmpdir.name, "recipes", "recipes", ".lock")
+        self.assertGreater(lock.stats.by_path()[lock_fpath], 4 * 0.2)
+
+    def test_update_single_flight(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        sha = self._commit("new commit")
+        with self._due(sha) as get:
+            process.stats.reset()
+            self.assertEqual(self._concurrently(update_recipe), [True] * 4)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(self._runs("-C", get_recipe_repo_dir(self.recipe), "fetch"), 1)
+        self.assertEqual(git(get_recipe_repo_dir(self.recipe), "rev-parse", "HEAD")[0], sha)
+        # nothing to do
+        self.assertFalse(update_recipe(self.recipe))
+
+    def _due(self, sha: str):
+        # the first check only takes note of the current commit, the next one is due right away
+        self.assertFalse(recipe_needs_update(self.recipe))
+        os.utime(os.path.join(get_recipe_project_dir(self.recipe), ".updates-check"), (0, 0))
+        return mock.patch("dtproject.recipe.requests.get",
+                          return_value=mock.Mock(**{"json.return_value": {"commit": {"sha": sha}}}))
+
+    def test_update_failure(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        error = subprocess.CalledProcessError(128, ["git", "fetch"])
+        with self._due(self._commit("new commit")), \
+                mock.patch("dtproject.recipe.pull_recipe", side_effect=error) as pull, \
+                mock.patch("dtproject.recipe.time.sleep") as sleep:
+            flag_content = read_update_check_flag(get_recipe_project_dir(self.recipe))
+            # the failure reaches the caller, nothing looks updated
+            with self.assertRaises(subprocess.CalledProcessError):
+                update_recipe(self.recipe)
+        self.assertEqual(pull.call_count, 3)
+        # no waiting after the last trial
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(read_update_check_flag(get_recipe_project_dir(self.recipe)), flag_content)
+
+    def test_update_timeout(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        with self._due(self._commit("new commit")) as get:
+            self.assertTrue(recipe_needs_update(self.recipe))
+        self.assertIsNotNone(get.call_args[1].get("timeout"))
+
+    def test_update_background(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        repo_dir = get_recipe_repo_dir(self.recipe)
+        old_sha = git(repo_dir, "rev-parse", "HEAD")[0]
+        sha = self._commit("new commit")
+        # the check runs right here instead of in a detached process
+        with self._due(sha), mock.patch("dtproject.recipe._spawn_revalidation", side_effect=revalidate_recipe) as spawn:
+            # the cached recipe is used, the update is only downloaded
+            self.assertFalse(update_recipe(self.recipe, background=True))
+            self.assertEqual(spawn.call_count, 1)
+            self.assertEqual(git(repo_dir, "rev-parse", "HEAD")[0], old_sha)
+            self.assertEqual(read_update_check_flag(get_recipe_project_dir(self.recipe))["fetched"], sha)
+            # the next invocation checks it out, without going to the remote
+            process.stats.reset()
+            with mock.patch.dict(os.environ, {"DTPROJECT_RECIPES_BACKGROUND_UPDATE": "1"}):
+                self.assertTrue(update_recipe(self.recipe))
+            self.assertEqual(spawn.call_count, 1)
+        self.assertEqual(self._runs("-C", repo_dir, "fetch"), 0)
+        self.assertEqual(git(repo_dir, "rev-parse", "HEAD")[0], sha)
+        self.assertNotIn("fetched", read_update_check_flag(get_recipe_project_dir(self.recipe)))
+        self.assertFalse(update_recipe(self.recipe, background=True))
+
+    def test_update_background_checkout_failure(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        repo_dir = get_recipe_repo_dir(self.recipe)
+        sha = self._commit("new commit")
+        with self._due(sha):
+            revalidate_recipe(self.recipe)
+            error = subprocess.CalledProcessError(128, ["git", "reset"])
+            with mock.patch("dtproject.recipe._spawn_revalidation", side_effect=revalidate_recipe) as spawn:
+                with mock.patch("dtproject.recipe.checkout_recipe", side_effect=error):
+                    self.assertFalse(update_recipe(self.recipe, background=True))
+                    # the failure might persist, we do not retry before the next regular check
+                    self.assertFalse(update_recipe(self.recipe, background=True))
+                spawn.assert_not_called()
+                self.assertNotIn("fetched", read_update_check_flag(get_recipe_project_dir(self.recipe)))
+                # the next regular check sees the update again
+                os.utime(os.path.join(get_recipe_project_dir(self.recipe), ".updates-check"), (0, 0))
+                self.assertFalse(update_recipe(self.recipe, background=True))
+                spawn.assert_called_once()
+            self.assertEqual(read_update_check_flag(get_recipe_project_dir(self.recipe))["fetched"], sha)
+            self.assertTrue(update_recipe(self.recipe, background=True))
+        self.assertEqual(git(repo_dir, "rev-parse", "HEAD")[0], sha)
+
+    def test_update_foreground_after_checkout_failure(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        sha = self._commit("new commit")
+        with self._due(sha):
+            revalidate_recipe(self.recipe)
+            error = subprocess.CalledProcessError(128, ["git", "reset"])
+            with mock.patch("dtproject.recipe.checkout_recipe", side_effect=error), \
+                    mock.patch("dtproject.recipe._spawn_revalidation"):
+                self.assertFalse(update_recipe(self.recipe, background=True))
+            # the next time we check, we pull
+            os.utime(os.path.join(get_recipe_project_dir(self.recipe), ".updates-check"), (0, 0))
+            self.assertTrue(update_recipe(self.recipe, background=False))
+        self.assertEqual(git(get_recipe_repo_dir(self.recipe), "rev-parse", "HEAD")[0], sha)
+
+    def test_update_background_never_waits(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        repo_dir = get_recipe_repo_dir(self.recipe)
+        old_sha = git(repo_dir, "rev-parse", "HEAD")[0]
+        with self._due(self._commit("new commit")):
+            revalidate_recipe(self.recipe)
+        # somebody else is updating recipes
+        with get_recipe_lock(self.recipe), mock.patch("dtproject.recipe._spawn_revalidation") as spawn:
+            self.assertFalse(update_recipe(self.recipe, background=True))
+        spawn.assert_not_called()
+        self.assertEqual(git(repo_dir, "rev-parse", "HEAD")[0], old_sha)
+
+    def test_update_background_detached(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        with self._due("0" * 40), mock.patch("dtproject.recipe.subprocess.Popen") as popen:
+            self.assertFalse(update_recipe(self.recipe, background=True))
+            # the check is claimed, nobody starts another one
+            self.assertFalse(update_recipe(self.recipe, background=True))
+        self.assertEqual(popen.call_count, 1)
+        self.assertTrue(popen.call_args[1]["start_new_session"])
+
+    def test_clone_whole(self):
+        self.recipe.location = None
+        self.assertTrue(clone_recipe(self.recipe))
+        self.assertTrue(self._exists("unrelated"))
+        self.assertIsNone(get_sparse_checkout(get_recipe_repo_dir(self.recipe)))
+
+    def test_pull_shallow(self):
+        self.assertTrue(clone_recipe(self.recipe))
+        sha = self._commit("new commit")
+        pull_recipe(self.recipe)
+        repo_dir = get_recipe_repo_dir(self.recipe)
+        self.assertEqual(git(repo_dir, "rev-parse", "HEAD")[0], sha)
+        # still shallow, with the same depth
+        self.assertEqual(self._count(), 1)
+        with open(os.path.join(get_recipe_project_dir(self.recipe), "CHANGELOG"), "rt") as fin:
+            self.assertIn("new commit", fin.read())
+
+    def test_pull_full(self):
+        self.assertTrue(clone_recipe(self.recipe, CLONE_STRATEGIES["full"]))
+        sha = self._commit("new commit")
+        pull_recipe(self.recipe, CloneStrategy(depth=None, single_branch=False))
+        self.assertEqual(git(get_recipe_repo_dir(self.recipe), "rev-parse", "HEAD")[0], sha)
+        self.assertEqual(self._count(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from dtproject import DTProject
+from dtproject.exceptions import InconsistentDTProject
+
+from . import copy_project, add_git_to_project, git_commit
+
+
+class TestRefresh(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"DTPROJECT_DISABLE_CACHE": "1"})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmpdir.cleanup()
+
+    def _copy(self, pname: str) -> str:
+        return copy_project(pname, self._tmpdir.name)
+
+    @staticmethod
+    def _write(pdir: str, fname: str, content: str):
+        fpath = os.path.join(pdir, fname)
+        # files modified too recently are never trusted, this one gets an old mtime (but a different one)
+        mtime = os.stat(fpath).st_mtime + 1 if os.path.exists(fpath) else 1
+        with open(fpath, "wt") as fout:
+            fout.write(content)
+        os.utime(fpath, (mtime, mtime))
+        os.utime(os.path.dirname(fpath), (0, 0))
+
+    def test_refresh_layers(self):
+        pdir = self._copy("basic_v4")
+        p = DTProject(pdir)
+        _ = p.name
+        distro = p.layers.distro
+        self.assertFalse(p.refresh())
+        # a layer changes
+        with open(os.path.join(pdir, "dtproject", "self.yaml"), "rt") as fin:
+            content = fin.read()
+        self._write(pdir, os.path.join("dtproject", "self.yaml"),
+                    content.replace("name: lib-dtproject-tests-project-basic-v4", "name: renamed"))
+        changes = p.refresh()
+        self.assertEqual(changes, DTProject.Changes(layers={"self"}))
+        self.assertEqual(p.name, "renamed")
+        # parsed layers that did not change are reused
+        self.assertIs(p.layers.distro, distro)
+        self.assertFalse(p.refresh())
+        # a custom layer is added, then removed
+        self._write(pdir, os.path.join("dtproject", "web.yaml"), "url: example.com\n")
+        self.assertEqual(p.refresh().layers, {"web"})
+        self.assertEqual(p.layers.web["url"], "example.com")
+        os.remove(os.path.join(pdir, "dtproject", "web.yaml"))
+        self.assertEqual(p.refresh().layers, {"web"})
+        self.assertFalse(hasattr(p.layers, "web"))
+
+    def test_refresh_racy(self):
+        pdir = self._copy("basic_v4")
+        os.utime(os.path.join(pdir, "dtproject", "self.yaml"))
+        p = DTProject(pdir)
+        _ = p.name
+        # same signature, the content is checked
+        self.assertFalse(p.refresh())
+        with open(os.path.join(pdir, "dtproject", "self.yaml"), "rt") as fin:
+            content = fin.read()
+        stat = os.stat(os.path.join(pdir, "dtproject", "self.yaml"))
+        with open(os.path.join(pdir, "dtproject", "self.yaml"), "wt") as fout:
+            fout.write(content.replace("icon: square", "icon: circle"))
+        os.utime(os.path.join(pdir, "dtproject", "self.yaml"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(p.refresh().layers, {"self"})
+        self.assertEqual(p.icon, "circle")
+
+    def test_refresh_inconsistent(self):
+        pdir = self._copy("basic_v4")
+        p = DTProject(pdir)
+        self._write(pdir, os.path.join("dtproject", "options.yaml"), "needs_recipe: true\n")
+        with self.assertRaises(InconsistentDTProject):
+            p.refresh()
+        # nothing was replaced
+        self.assertFalse(p.needs_recipe)
+
+    def test_refresh_v3(self):
+        pdir = self._copy("basic_v3")
+        p = DTProject(pdir)
+        self.assertFalse(p.refresh())
+        self._write(pdir, ".dtproject", "VERSION=1.0.0\nTYPE=template-basic\nTYPE_VERSION=3\n")
+        self.assertEqual(p.refresh().layers, {".dtproject"})
+        self.assertEqual(p.version, "1.0.0")
+
+    def test_refresh_git(self):
+        pdir = self._copy("basic_v4")
+        add_git_to_project(pdir, branch="ente")
+        git_commit(pdir, "first")
+        p = DTProject(pdir)
+        sha, branch = p.sha, p._repository.branch
+        self.assertTrue(p.is_clean())
+        # only what was computed is computed again
+        self.assertFalse(p._repository.is_loaded("tags"))
+        self.assertFalse(p.refresh())
+        # the worktree changes
+        self._write(pdir, "README.md", "changed")
+        self.assertEqual(p.refresh().repository, {"index_nmodified", "index_nadded"})
+        self.assertFalse(p.is_clean())
+        # a commit on a new branch
+        subprocess.check_output(["git", "checkout", "-q", "-b", "daffy"], cwd=pdir)
+        git_commit(pdir, "second")
+        changes = p.refresh()
+        self.assertEqual(changes.repository, {"sha", "branch", "index_nmodified", "index_nadded"})
+        self.assertNotEqual(p.sha, sha)
+        self.assertEqual((branch, p._repository.branch), ("ente", "daffy"))
+        self.assertTrue(p.is_clean())
+        self.assertFalse(p._repository.is_loaded("tags"))
+
+
+if __name__ == '__main__':
+    unittest.main()
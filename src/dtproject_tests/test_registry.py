@@ -0,0 +1,116 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from dtproject import DTProject
+
+from . import copy_project, backdate, add_git_to_project, git_commit, git_tag
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"DTPROJECT_DISABLE_CACHE": "1"})
+        self._env.start()
+        DTProject.clear_registry()
+
+    def tearDown(self):
+        DTProject.clear_registry()
+        self._env.stop()
+        self._tmpdir.cleanup()
+
+    def _copy(self, pname: str) -> str:
+        return copy_project(pname, self._tmpdir.name)
+
+    def test_registry_hit(self):
+        pdir = self._copy("basic_v4")
+        p = DTProject.open(pdir)
+        self.assertIs(DTProject.open(pdir), p)
+        self.assertIs(DTProject.open(os.path.join(pdir, ".")), p)
+        # the constructor always returns a new instance
+        self.assertIsNot(DTProject(pdir), p)
+        # v1 to v3 projects
+        pdir = self._copy("basic_v3")
+        p = DTProject.open(pdir)
+        self.assertIs(DTProject.open(pdir), p)
+
+    def test_registry_invalidation(self):
+        pdir = self._copy("basic_v4")
+        p = DTProject.open(pdir)
+        # a layer changes
+        with open(os.path.join(pdir, "dtproject", "self.yaml"), "at") as fout:
+            fout.write("\n")
+        backdate(pdir)
+        os.utime(os.path.join(pdir, "dtproject", "self.yaml"), (1, 1))
+        p2 = DTProject.open(pdir)
+        self.assertIsNot(p2, p)
+        self.assertIs(DTProject.open(pdir), p2)
+        # a layer is added
+        with open(os.path.join(pdir, "dtproject", "web.yaml"), "wt") as fout:
+            fout.write("url: example.com\n")
+        backdate(pdir)
+        p3 = DTProject.open(pdir)
+        self.assertIsNot(p3, p2)
+        self.assertEqual(p3.layers.web["url"], "example.com")
+        # git HEAD changes
+        os.makedirs(os.path.join(pdir, ".git"))
+        with open(os.path.join(pdir, ".git", "HEAD"), "wt") as fout:
+            fout.write("ref: refs/heads/ente\n")
+        os.utime(os.path.join(pdir, ".git", "HEAD"), (0, 0))
+        self.assertIsNot(DTProject.open(pdir), p3)
+
+    def test_registry_git(self):
+        pdir = self._copy("basic_v4")
+        add_git_to_project(pdir)
+        git_commit(pdir, "first")
+        git_tag(pdir, "v1.0.0")
+        # backdating the files would make git rewrite the index, we trust recent changes instead
+        racy = mock.patch("dtproject.dtproject.is_racy", return_value=False)
+        racy.start()
+        self.addCleanup(racy.stop)
+        p = DTProject.open(pdir)
+        self.assertTrue(p.is_clean())
+        self.assertTrue(p.is_release())
+        self.assertIs(DTProject.open(pdir), p)
+        # a tracked file is edited, this does not change the fingerprint
+        with open(os.path.join(pdir, "Dockerfile"), "at") as fout:
+            fout.write("\n# changed\n")
+        self.assertFalse(DTProject.open(pdir).is_clean())
+        self.assertFalse(DTProject.open(pdir).is_release())
+        # a new commit moves the branch, a new tag is added
+        git_commit(pdir, "second")
+        git_tag(pdir, "v1.0.1")
+        p2 = DTProject.open(pdir)
+        self.assertIsNot(p2, p)
+        self.assertEqual(p2.head_version, "v1.0.1")
+        self.assertTrue(p2.is_release())
+        # the branch alone moves (e.g., a reset)
+        subprocess.check_output(["git", "reset", "-q", "--soft", "HEAD~1"], cwd=pdir)
+        p3 = DTProject.open(pdir)
+        self.assertIsNot(p3, p2)
+        self.assertEqual(p3.head_version, "v1.0.0")
+
+    def test_registry_racy(self):
+        pdir = self._copy("basic_v4")
+        os.utime(os.path.join(pdir, "dtproject", "self.yaml"))
+        # files that just changed might change again within the same mtime
+        self.assertIsNot(DTProject.open(pdir), DTProject.open(pdir))
+
+    def test_registry_bound(self):
+        pdirs = [self._copy(pname) for pname in ["basic_v2", "basic_v3", "basic_v4"]]
+        with mock.patch.object(DTProject, "REGISTRY_SIZE", 2):
+            p0 = DTProject.open(pdirs[0])
+            p1 = DTProject.open(pdirs[1])
+            # a hit makes p0 the most recently used
+            self.assertIs(DTProject.open(pdirs[0]), p0)
+            DTProject.open(pdirs[2])
+            self.assertEqual(len(DTProject._registry), 2)
+            self.assertIs(DTProject.open(pdirs[0]), p0)
+            self.assertIsNot(DTProject.open(pdirs[1]), p1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from dtproject import DTProject
+from dtproject.exceptions import DTProjectNotFound
+from dtproject.sources import GitRevisionSource
+from dtproject.types import LayerBase
+
+from . import get_project_path, git_repository, skip_if_code_mounted, git_commit, git_tag, base_layer
+
+
+class TestRevision(unittest.TestCase):
+
+    @skip_if_code_mounted
+    def test_revision_v4_layers(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname):
+            git_commit(pname, "first")
+            git_tag(pname, "v1.0.0")
+            base: LayerBase = LayerBase(repository="dt-other", tag="v2")
+            with base_layer(pname, base):
+                git_commit(pname, "second")
+                # the worktree sees the new base
+                p = DTProject(pdir)
+                self.assertEqual(p.base_info.repository, "dt-other")
+                self.assertIsNone(p.revision)
+                # the tag still sees the old one
+                p1 = DTProject.at_revision(pdir, "v1.0.0")
+                self.assertEqual(p1.revision, "v1.0.0")
+                self.assertEqual(p1.path, p.path)
+                self.assertEqual(p1.name, p.name)
+                self.assertEqual(p1.base_info.repository, "dt-commons")
+                self.assertIsNone(p1.base_info.tag)
+                self.assertEqual(p1.head_version, "v1.0.0")
+                self.assertTrue(p1.is_clean())
+                self.assertTrue(p1.is_detached())
+                # the branch tip sees the new base
+                p2 = DTProject.at_revision(pdir, "master")
+                self.assertEqual(p2.base_info, p.base_info)
+                self.assertEqual(p2.layers.as_dict(), p.layers.as_dict())
+                self.assertEqual(p2.sha, p.sha)
+                self.assertEqual(p2.version_name, "master")
+                self.assertEqual(p2.closest_version, "v1.0.0")
+                self.assertNotEqual(p1.sha, p2.sha)
+
+    @skip_if_code_mounted
+    def test_revision_v3_metadata_and_dependencies(self):
+        pname = "basic_v3"
+        pdir = get_project_path(pname)
+        with git_repository(pname):
+            git_commit(pname)
+            p = DTProject(pdir)
+            pr = DTProject.at_revision(pdir, "HEAD")
+            # ---
+            self.assertEqual(type(pr), type(p))
+            self.assertEqual(pr.type, p.type)
+            self.assertEqual(pr.type_version, p.type_version)
+            self.assertEqual(pr.version, p.version)
+            self.assertEqual(pr.apt_dependencies(), ["dep3", "dep3a"])
+            self.assertEqual(pr.py3_dependencies_dt(), ["dep3a"])
+            self.assertEqual(pr.py3_dependencies(), ["dep3b", "dep3c"])
+            self.assertEqual(pr.apt_dependencies(comments=True), p.apt_dependencies(comments=True))
+
+    @skip_if_code_mounted
+    def test_revision_iterate(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname):
+            tags = []
+            for i in range(3):
+                git_commit(pname, f"commit {i}")
+                git_tag(pname, f"v{i}.0.0")
+                tags.append(f"v{i}.0.0")
+            # ---
+            projects = list(DTProject.iter_revisions(pdir, tags))
+            self.assertEqual([rev for rev, _ in projects], tags)
+            self.assertEqual([p.head_version for _, p in projects], tags)
+            self.assertEqual(len({p.sha for _, p in projects}), 3)
+
+    @skip_if_code_mounted
+    def test_revision_not_found(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname):
+            git_commit(pname)
+            with self.assertRaises(DTProjectNotFound):
+                DTProject.at_revision(pdir, "does-not-exist")
+
+    @skip_if_code_mounted
+    def test_revision_source(self):
+        pname = "basic_v4"
+        pdir = get_project_path(pname)
+        with git_repository(pname):
+            git_commit(pname)
+            source = GitRevisionSource(pdir, "HEAD")
+            # ---
+            self.assertTrue(source.isdir(""))
+            self.assertTrue(source.isdir("dtproject"))
+            self.assertFalse(source.isfile("dtproject"))
+            self.assertTrue(source.isfile("dtproject/base.yaml"))
+            self.assertFalse(source.exists("dtproject/nope.yaml"))
+            self.assertEqual(source.listdir("")["dtproject"], True)
+            self.assertEqual(source.listdir("dtproject")["base.yaml"], False)
+            with open(f"{pdir}/dtproject/base.yaml", "rt") as fin:
+                self.assertEqual(source.read_text("dtproject/base.yaml"), fin.read())
+            self.assertEqual(source.join("dtproject/base.yaml"), "HEAD:dtproject/base.yaml")
+            with self.assertRaises(FileNotFoundError):
+                source.read_text("dtproject")
+
+    def test_revision_dotted_path(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # dots in directory names are part of the path inside the repository
+            pdir = os.path.join(tmpdir, ".config", "proj.")
+            shutil.copytree(get_project_path("basic_v4"), pdir)
+            for args in [["init", "-q"], ["add", "-A"], ["commit", "-q", "--no-gpg-sign", "-m", "first"]]:
+                subprocess.check_call(["git", "-c", "user.name=tester", "-c", "user.email=test@duckietown.com",
+                                       *args], cwd=tmpdir)
+            source = GitRevisionSource(pdir, "HEAD")
+            self.assertEqual(source.join("dtproject/base.yaml"), "HEAD:.config/proj./dtproject/base.yaml")
+            self.assertTrue(source.isfile("dtproject/base.yaml"))
+            self.assertEqual(DTProject.at_revision(pdir, "HEAD").name, DTProject(pdir).name)
+
+
+if __name__ == '__main__':
+    unittest.main()
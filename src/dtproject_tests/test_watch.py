@@ -0,0 +1,114 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from typing import List, Set
+from unittest import skipUnless
+
+from dtproject import DTProject
+from dtproject.utils.inotify import inotify_available
+from dtproject.watch import ProjectWatcher, ProjectEvent, LAYER_CHANGED, DEPENDENCIES_CHANGED, \
+    DOCKERFILE_CHANGED, LAUNCHERS_CHANGED, BRANCH_CHANGED, INDEX_CHANGED
+
+from . import get_project_path
+
+
+class _TestWatch:
+    BACKEND: str
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.pdir = os.path.join(self._tmpdir.name, "basic_v4")
+        shutil.copytree(get_project_path("basic_v4"), self.pdir)
+        self.watcher = ProjectWatcher([DTProject(self.pdir)], backend=self.BACKEND, interval=0.05)
+
+    def tearDown(self):
+        self.watcher.close()
+        self._tmpdir.cleanup()
+
+    def _write(self, rel: str, content: str):
+        with open(os.path.join(self.pdir, rel), "wt") as fout:
+            fout.write(content)
+
+    def _git(self, *args: str):
+        subprocess.check_output(["git", *args], cwd=self.pdir, stderr=subprocess.STDOUT)
+
+    def _wait_for(self, expected: Set[ProjectEvent], timeout: float = 5.0) -> List[ProjectEvent]:
+        events: List[ProjectEvent] = []
+        deadline: float = time.monotonic() + timeout
+        while not expected.issubset(events) and time.monotonic() < deadline:
+            events += self.watcher.poll(timeout=0.2)
+        self.assertTrue(expected.issubset(events), f"{expected} not in {events}")
+        return events
+
+    def test_watch_files(self):
+        self.assertEqual(self.watcher.backend, self.BACKEND)
+        self.assertEqual(self.watcher.poll(timeout=0.1), [])
+        self.assertIsInstance(self.watcher.projects[self.pdir], DTProject)
+        # layers
+        self._write(os.path.join("dtproject", "self.yaml"), "name: renamed\n")
+        self._write(os.path.join("dtproject", "web.yaml"), "url: example.com\n")
+        events = self._wait_for({
+            ProjectEvent(self.pdir, LAYER_CHANGED, "self"),
+            ProjectEvent(self.pdir, LAYER_CHANGED, "web"),
+        })
+        self.assertEqual(len(events), 2)
+        # dependencies, dockerfile, launchers
+        self._write("dependencies-apt.txt", "git\n")
+        self._write("Dockerfile", "FROM scratch\n")
+        os.makedirs(os.path.join(self.pdir, "launchers"), exist_ok=True)
+        self._write(os.path.join("launchers", "run.sh"), "#!/bin/bash\n")
+        self._wait_for({
+            ProjectEvent(self.pdir, DEPENDENCIES_CHANGED, "dependencies-apt.txt"),
+            ProjectEvent(self.pdir, DOCKERFILE_CHANGED),
+            ProjectEvent(self.pdir, LAUNCHERS_CHANGED, "run.sh"),
+        })
+        # files that are not watched
+        self._write("notes.txt", "nothing\n")
+        self.assertEqual(self.watcher.poll(timeout=0.2), [])
+        # removed projects are not watched anymore
+        self.watcher.remove(self.pdir)
+        self._write("Dockerfile", "FROM busybox\n")
+        self.assertEqual(self.watcher.poll(timeout=0.2), [])
+
+    def test_watch_racy(self):
+        fpath = os.path.join(self.pdir, "dtproject", "self.yaml")
+        self.watcher.remove(self.pdir)
+        self._write(os.path.join("dtproject", "self.yaml"), "name: first\n")
+        self.watcher.add(self.pdir)
+        # same size, same mtime
+        stat = os.stat(fpath)
+        self._write(os.path.join("dtproject", "self.yaml"), "name: other\n")
+        os.utime(fpath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self._wait_for({ProjectEvent(self.pdir, LAYER_CHANGED, "self")})
+
+    def test_watch_git(self):
+        self._git("init", "-q", "-b", "ente")
+        self._wait_for({ProjectEvent(self.pdir, BRANCH_CHANGED, "ente")})
+        self._git("add", "-A")
+        self._wait_for({ProjectEvent(self.pdir, INDEX_CHANGED)})
+        self._git("-c", "user.name=tester", "-c", "user.email=test@duckietown.com",
+                  "commit", "-q", "--no-gpg-sign", "-m", "first")
+        self._git("checkout", "-q", "-b", "daffy")
+        self._wait_for({ProjectEvent(self.pdir, BRANCH_CHANGED, "daffy")})
+        self._git("checkout", "-q", "--detach")
+        self._wait_for({ProjectEvent(self.pdir, BRANCH_CHANGED, None)})
+
+
+class TestWatchPolling(_TestWatch, unittest.TestCase):
+    BACKEND = "polling"
+
+    def test_watch_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            ProjectWatcher(backend="fsevents")
+
+
+@skipUnless(inotify_available(), "inotify not available")
+class TestWatchInotify(_TestWatch, unittest.TestCase):
+    BACKEND = "inotify"
+
+
+if __name__ == '__main__':
+    unittest.main()